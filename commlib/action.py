@@ -5,13 +5,13 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
 from functools import partial
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from commlib.compression import CompressionType
 from commlib.connection import BaseConnectionParameters
 from commlib.msg import ActionMessage, Message, PubSubMessage, RPCMessage
 from commlib.pubsub import BasePublisher, BaseSubscriber
-from commlib.serializer import JSONSerializer, Serializer
+from commlib.serializer import JSONSerializer, Serializer, get_serializer
 from commlib.utils import gen_random_id, gen_timestamp
 
 actions_logger = None
@@ -111,6 +111,7 @@ class GoalHandler:
         feedback_publisher: callable,
         on_goal: callable,
         on_cancel: callable,
+        executor: Optional[ThreadPoolExecutor] = None,
     ):
         """__init__.
 
@@ -120,6 +121,8 @@ class GoalHandler:
             feedback_publisher (callable): feedback_publisher
             on_goal (callable): on_goal callback function to bind
             on_cancel (callable): on_cancel callback function to bind
+            executor (Optional[ThreadPoolExecutor]): Executor to run the
+                goal on. The handler creates its own if not given.
         """
         self._msg_type = msg_type
         self.status = GoalStatus.ACCEPTED
@@ -133,7 +136,10 @@ class GoalHandler:
         self._on_cancel = on_cancel
         self._cancel_event = threading.Event()
 
-        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=2)
+        self._executor = executor
 
     @property
     def cancel_event(self):
@@ -193,9 +199,10 @@ class GoalHandler:
             self._goal_task.cancel()
             self._cancel_event.set()
             _ = self._goal_task.result()
-            # self._executor.shutdown(wait=False)
-            self._executor._threads.clear()
-            concurrent.futures.thread._threads_queues.clear()
+            if self._own_executor:
+                # self._executor.shutdown(wait=False)
+                self._executor._threads.clear()
+                concurrent.futures.thread._threads_queues.clear()
         except Exception as exc:
             print(exc)
             return 0
@@ -238,10 +245,16 @@ class BaseActionService:
         msg_type: ActionMessage = None,
         debug: bool = True,
         compression: CompressionType = CompressionType.NO_COMPRESSION,
+        serializer: Serializer = JSONSerializer,
         conn_params: BaseConnectionParameters = None,
         on_goal: callable = None,
         on_cancel: callable = None,
         on_getresult: callable = None,
+        trusted: bool = False,
+        validate_rate: float = 0.0,
+        framed: bool = False,
+        executor: Optional[ThreadPoolExecutor] = None,
+        connection: Any = None,
     ):
         """__init__.
 
@@ -249,18 +262,32 @@ class BaseActionService:
             action_name (str): The name (uri) of the action
             msg_type (ActionMessage): The type of the message
             debug (bool): Debug mode
+            serializer (Serializer): Serializer of the internal endpoints
             on_goal (callable): on_goal callback function
             on_cancel (callable): on_cancel callback function
             on_getresult (callable): on_getresult callback function
+            trusted (bool): Build received goals without validation
+            validate_rate (float): Fraction of goals to still validate in
+                trusted mode, to detect schema drift
+            framed (bool): Frame the payloads of the internal endpoints
+            executor (Optional[ThreadPoolExecutor]): Executor of goals and
+                of the internal endpoints
+            connection (Any): Broker connection of the internal endpoints
         """
         self._msg_type = msg_type
         self._debug = debug
         self._compression = compression
+        self._serializer = get_serializer(serializer)
         self._action_name = action_name
         self._on_goal = on_goal
         self._on_cancel = on_cancel
         self._on_getresult = on_getresult
         self._conn_params = conn_params
+        self._trusted = trusted
+        self._validate_rate = validate_rate
+        self._framed = framed
+        self._executor = executor
+        self._connection = connection
 
         self._status_topic = f"{self._action_name}.status"
         self._feedback_topic = f"{self._action_name}.feedback"
@@ -320,9 +347,12 @@ class BaseActionService:
                 self._feedback_pub,
                 self._on_goal,
                 self._on_cancel,
+                executor=self._executor,
             )
             if self._msg_type is not None:
-                self._current_goal.data = self._msg_type.Goal(**msg.goal_data)
+                self._current_goal.data = self._goal_rpc._build_msg(
+                    self._msg_type.Goal, msg.goal_data
+                )
             else:
                 self._current_goal.data = msg.goal_data
         elif self._current_goal.status in (
@@ -337,9 +367,12 @@ class BaseActionService:
                 self._feedback_pub,
                 self._on_goal,
                 self._on_cancel,
+                executor=self._executor,
             )
             if self._msg_type is not None:
-                self._current_goal.data = self._msg_type.Goal(**msg.goal_data)
+                self._current_goal.data = self._goal_rpc._build_msg(
+                    self._msg_type.Goal, msg.goal_data
+                )
             else:
                 self._current_goal.data = msg.goal_data
         elif self._current_goal.status == GoalStatus.ACCEPTED:
@@ -411,10 +444,14 @@ class BaseActionClient:
         msg_type: ActionMessage = None,
         debug: bool = False,
         compression: CompressionType = CompressionType.NO_COMPRESSION,
+        serializer: Serializer = JSONSerializer,
         conn_params: BaseConnectionParameters = None,
         on_feedback: callable = None,
         on_result: callable = None,
         on_goal_reached: callable = None,
+        framed: bool = False,
+        executor: Optional[ThreadPoolExecutor] = None,
+        connection: Any = None,
     ):
         """__init__.
 
@@ -422,15 +459,24 @@ class BaseActionClient:
             action_name (str): The name (uri) of the action
             msg_type (ActionMessage): The type of the message
             debug (bool): Debug mode
+            serializer (Serializer): Serializer of the internal endpoints
             on_feedback (callable): on_feedback
             on_result (callable): on_result
             on_goal_reached (callable): on_goal_reached
+            framed (bool): Frame the payloads of the internal endpoints
+            executor (Optional[ThreadPoolExecutor]): Executor of the
+                internal endpoints
+            connection (Any): Broker connection of the internal endpoints
         """
         self._debug = debug
         self._action_name = action_name
         self._msg_type = msg_type
         self._compression = compression
+        self._serializer = get_serializer(serializer)
         self._conn_params = conn_params
+        self._framed = framed
+        self._executor = executor
+        self._connection = connection
 
         self._status_topic = f"{self._action_name}.status"
         self._feedback_topic = f"{self._action_name}.feedback"
@@ -447,6 +493,7 @@ class BaseActionClient:
         self._goal_id = None
 
         self._status = _ActionStatusMessage()
+        self._status_cond = threading.Condition()
         self.on_feedback = on_feedback
         self.result = None
         self.on_result = on_result
@@ -527,26 +574,28 @@ class BaseActionClient:
             return self.result
         req = _ActionResultMessage.Request(goal_id=self._goal_id)
         if wait:
-            t_start = time.time()
-            t_elapsed = 0
-            while t_elapsed < wait_max_sec:
-                # If the goal has reached a final state
-                if self._status.status in (
-                    GoalStatus.ABORTED,
-                    GoalStatus.SUCCEDED,
-                    GoalStatus.CANCELED,
-                ):
-                    resp = self._result_client.call(req, timeout=timeout)
-                    if self._msg_type is None:
-                        res = resp.result
-                    else:
-                        res = self._msg_type.Result(**resp.result)
-                    self.result = res
-                    return res
-                time.sleep(0.001)
-                t_elapsed = time.time() - t_start
+            # Wait for the goal to reach a final state
+            with self._status_cond:
+                reached = self._status_cond.wait_for(
+                    self._goal_reached_final_state, timeout=wait_max_sec
+                )
+            if reached:
+                resp = self._result_client.call(req, timeout=timeout)
+                if self._msg_type is None:
+                    res = resp.result
+                else:
+                    res = self._msg_type.Result(**resp.result)
+                self.result = res
+                return res
         return None
 
+    def _goal_reached_final_state(self) -> bool:
+        return self._status.status in (
+            GoalStatus.ABORTED,
+            GoalStatus.SUCCEDED,
+            GoalStatus.CANCELED,
+        )
+
     def _on_status(self, msg: _ActionStatusMessage) -> None:
         """_on_status.
         Internal on_status event callback.
@@ -560,7 +609,9 @@ class BaseActionClient:
         # Check if the goal_id matches the one of the current goal.
         if msg.goal_id != self._goal_id:
             return
-        self._status = msg
+        with self._status_cond:
+            self._status = msg
+            self._status_cond.notify_all()
         # If it reaches a final state F
         if self._status.status in (
             GoalStatus.SUCCEDED,
@@ -1,4 +1,27 @@
+import abc
+import bz2
+import collections
+import enum
+import lzma
+import os
+import struct
+import threading
+import time
 import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 class CompressionType:
@@ -16,20 +39,849 @@ class CompressionType:
     DEFAULT_COMPRESSION = zlib.Z_DEFAULT_COMPRESSION
 
 
-def inflate_str(text: str, compression_type: int = CompressionType.DEFAULT_COMPRESSION):
+class CompressionCodecs(enum.IntEnum):
+    """CompressionCodecs.
+    Ids of compression codecs, as carried in frame headers.
+    """
+
+    NONE = 0
+    ZLIB = 1
+    LZMA = 2
+    BZ2 = 3
+    LZ4 = 4
+    ZSTD = 5
+    ZLIB_DICT = 6
+
+
+class CompressionCodec(abc.ABC):
+    """CompressionCodec Abstract Class.
+    Compression codecs are static classes, registered by CODEC_ID.
+    """
+
+    CODEC_ID: int = -1
+    DEFAULT_LEVEL: int = 0
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        """compress.
+
+        Args:
+            data (Union[bytes, memoryview]): data
+            level (int): Compression level. Codec default if not given.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        """decompress.
+
+        Args:
+            data (Union[bytes, memoryview]): data
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def compressor(cls, level: int = None) -> Any:
+        """compressor.
+        An incremental compressor (with compress() and flush() methods),
+        or None if the codec only compresses in one go.
+
+        Args:
+            level (int): Compression level. Codec default if not given.
+        """
+        return None
+
+    @classmethod
+    def compress_parts(
+        cls, parts: List[Union[bytes, memoryview]], level: int = None
+    ) -> List[bytes]:
+        """compress_parts.
+        Compress a payload given in parts. Codecs with an incremental
+        compressor do not join the parts first.
+
+        Args:
+            parts (List[Union[bytes, memoryview]]): Parts of the payload
+            level (int): Compression level. Codec default if not given.
+        """
+        _compressor = cls.compressor(level)
+        if _compressor is None:
+            data = parts[0] if len(parts) == 1 else b"".join(parts)
+            return [cls.compress(data, level)]
+        _out = [_compressor.compress(part) for part in parts]
+        _out.append(_compressor.flush())
+        return [chunk for chunk in _out if chunk]
+
+
+class ZlibCodec(CompressionCodec):
+    """zlib codec. Levels 0-9, or -1 for the zlib default."""
+
+    CODEC_ID: int = CompressionCodecs.ZLIB
+    DEFAULT_LEVEL: int = zlib.Z_DEFAULT_COMPRESSION
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        return zlib.compress(data, cls.DEFAULT_LEVEL if level is None else level)
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        return zlib.decompress(data)
+
+    @classmethod
+    def compressor(cls, level: int = None) -> Any:
+        return zlib.compressobj(cls.DEFAULT_LEVEL if level is None else level)
+
+
+class LzmaCodec(CompressionCodec):
+    """LZMA (xz) codec. Presets 0-9. Strong but slow compression."""
+
+    CODEC_ID: int = CompressionCodecs.LZMA
+    DEFAULT_LEVEL: int = 6
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        return lzma.compress(data, preset=cls.DEFAULT_LEVEL if level is None else level)
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        return lzma.decompress(data)
+
+    @classmethod
+    def compressor(cls, level: int = None) -> Any:
+        return lzma.LZMACompressor(preset=cls.DEFAULT_LEVEL if level is None else level)
+
+
+class Bz2Codec(CompressionCodec):
+    """bzip2 codec. Levels 1-9."""
+
+    CODEC_ID: int = CompressionCodecs.BZ2
+    DEFAULT_LEVEL: int = 9
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        return bz2.compress(data, cls.DEFAULT_LEVEL if level is None else level)
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        return bz2.decompress(data)
+
+    @classmethod
+    def compressor(cls, level: int = None) -> Any:
+        return bz2.BZ2Compressor(cls.DEFAULT_LEVEL if level is None else level)
+
+
+class Lz4Codec(CompressionCodec):
+    """LZ4 (frame format) codec. Levels 0-16. Requires the lz4 package."""
+
+    CODEC_ID: int = CompressionCodecs.LZ4
+    DEFAULT_LEVEL: int = 0
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        return lz4_frame.compress(
+            data, compression_level=cls.DEFAULT_LEVEL if level is None else level
+        )
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+class ZstdCodec(CompressionCodec):
+    """Zstandard codec. Levels 1-22. Requires the zstandard package."""
+
+    CODEC_ID: int = CompressionCodecs.ZSTD
+    DEFAULT_LEVEL: int = 3
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        return zstandard.ZstdCompressor(
+            level=cls.DEFAULT_LEVEL if level is None else level
+        ).compress(data)
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        # Streamed frames do not carry their content size
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+    @classmethod
+    def compressor(cls, level: int = None) -> Any:
+        return zstandard.ZstdCompressor(
+            level=cls.DEFAULT_LEVEL if level is None else level
+        ).compressobj()
+
+
+# Prefix of zlib streams compressed with a preset dictionary:
+#   dictionary id (I) | length of the inline dictionary, or 0 (I)
+_ZDICT_PREFIX = struct.Struct("<II")
+# Maximum number of inline dictionaries kept by receivers
+MAX_INLINE_ZDICTS = 64
+# Dictionaries registered with register_zdict(), kept for good
+_zdicts: Dict[int, bytes] = {}
+# Dictionaries received inline, least recently used first
+_inline_zdicts: Dict[int, bytes] = collections.OrderedDict()
+_zdicts_lock = threading.Lock()
+
+
+def register_zdict(zdict: bytes) -> int:
+    """register_zdict.
+    Register a preset zlib dictionary, for receivers to decompress messages
+    compressed with it. Dictionaries are identified by the CRC32 of their
+    content, so the same dictionary has the same id in every process.
+
+    Args:
+        zdict (bytes): The dictionary
+
+    Returns:
+        int: The dictionary id
+    """
+    zdict = bytes(zdict)
+    zdict_id = zlib.crc32(zdict)
+    with _zdicts_lock:
+        _zdicts[zdict_id] = zdict
+    return zdict_id
+
+
+def _add_inline_zdict(zdict_id: int, zdict: bytes) -> None:
+    with _zdicts_lock:
+        _inline_zdicts[zdict_id] = zdict
+        _inline_zdicts.move_to_end(zdict_id)
+        while len(_inline_zdicts) > MAX_INLINE_ZDICTS:
+            _inline_zdicts.popitem(last=False)
+
+
+def get_zdict(zdict_id: int) -> bytes:
+    """get_zdict.
+
+    Args:
+        zdict_id (int): The dictionary id
+    """
+    with _zdicts_lock:
+        zdict = _zdicts.get(zdict_id)
+        if zdict is None:
+            zdict = _inline_zdicts.get(zdict_id)
+            if zdict is not None:
+                _inline_zdicts.move_to_end(zdict_id)
+    if zdict is None:
+        raise ValueError(f"Unknown zlib dictionary <{zdict_id}>")
+    return zdict
+
+
+def train_zdict(samples: List[bytes], max_size: int = 4096) -> bytes:
+    """train_zdict.
+    Build a preset zlib dictionary from sample payloads: the distinct
+    samples, most recent last, up to max_size. zlib matches content near
+    the end of the dictionary at a lower cost, and for small messages of
+    the same few types, recent samples beat (measurably) dictionaries of
+    the most frequent substrings.
+
+    Args:
+        samples (List[bytes]): Sample payloads, oldest first
+        max_size (int): Maximum dictionary size. zlib uses at most 32KB.
+
+    Returns:
+        bytes: The dictionary
+    """
+    distinct = list(dict.fromkeys(bytes(sample) for sample in samples))
+    return b"".join(distinct)[-max_size:]
+
+
+class ZlibDictCodec(CompressionCodec):
+    """zlib codec with preset dictionaries. Compressed streams are prefixed
+    by the id of their dictionary, and optionally by the dictionary itself
+    (inline), which receivers then register. See DictionaryCompression.
+    """
+
+    CODEC_ID: int = CompressionCodecs.ZLIB_DICT
+    DEFAULT_LEVEL: int = zlib.Z_DEFAULT_COMPRESSION
+
+    @classmethod
+    def compress(cls, data: Union[bytes, memoryview], level: int = None) -> bytes:
+        raise ValueError("zlib dictionary compression requires a dictionary")
+
+    @classmethod
+    def compress_with_dict(
+        cls,
+        parts: List[Union[bytes, memoryview]],
+        zdict: bytes,
+        level: int = None,
+        inline: bool = False,
+    ) -> List[bytes]:
+        """compress_with_dict.
+
+        Args:
+            parts (List[Union[bytes, memoryview]]): Parts of the payload
+            zdict (bytes): The preset dictionary
+            level (int): Compression level. Codec default if not given.
+            inline (bool): Send the dictionary along with the payload
+        """
+        _compressor = zlib.compressobj(
+            cls.DEFAULT_LEVEL if level is None else level, zdict=zdict
+        )
+        _out = [_ZDICT_PREFIX.pack(zlib.crc32(zdict), len(zdict) if inline else 0)]
+        if inline:
+            _out.append(zdict)
+        _out.extend(_compressor.compress(part) for part in parts)
+        _out.append(_compressor.flush())
+        return [chunk for chunk in _out if chunk]
+
+    @classmethod
+    def decompress(cls, data: Union[bytes, memoryview]) -> bytes:
+        try:
+            zdict_id, zdict_len = _ZDICT_PREFIX.unpack_from(data, 0)
+        except struct.error as exc:
+            raise ValueError(f"Malformed zlib dictionary stream: {exc}")
+        offset = _ZDICT_PREFIX.size
+        if zdict_len > 0:
+            zdict = bytes(data[offset : offset + zdict_len])
+            offset += zdict_len
+            if zlib.crc32(zdict) != zdict_id:
+                raise ValueError(f"Corrupted inline zlib dictionary <{zdict_id}>")
+            _add_inline_zdict(zdict_id, zdict)
+        else:
+            zdict = get_zdict(zdict_id)
+        _decompressor = zlib.decompressobj(zdict=zdict)
+        return _decompressor.decompress(data[offset:]) + _decompressor.flush()
+
+
+_codecs: Dict[int, Type[CompressionCodec]] = {}
+
+
+def register_codec(codec: Type[CompressionCodec]) -> None:
+    """register_codec.
+    Register a compression codec under its CODEC_ID.
+
+    Args:
+        codec (Type[CompressionCodec]): The codec class
+    """
+    _codecs[int(codec.CODEC_ID)] = codec
+
+
+def get_codec(
+    codec: Union[Type[CompressionCodec], CompressionCodecs, str],
+) -> Type[CompressionCodec]:
+    """get_codec.
+    Resolve a compression codec by class, CompressionCodecs id or name
+    (e.g. "zlib", "zstd").
+
+    Args:
+        codec: The codec reference
+
+    Returns:
+        Type[CompressionCodec]: The codec
+    """
+    if isinstance(codec, type) and issubclass(codec, CompressionCodec):
+        return codec
+    if isinstance(codec, str):
+        try:
+            codec = CompressionCodecs[codec.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown compression codec <{codec}>")
+    if int(codec) not in _codecs:
+        raise ValueError(f"Compression codec <{codec}> is not available")
+    return _codecs[int(codec)]
+
+
+def resolve_compression(
+    compression: Any,
+) -> Tuple[Optional[Type[CompressionCodec]], Optional[int]]:
+    """resolve_compression.
+    Resolve the compression setting of an endpoint to a codec and a level.
+    Accepts a zlib level (CompressionType), a codec (class, CompressionCodecs
+    id or name) at its default level, or a (codec, level) tuple.
+
+    Args:
+        compression (Any): The compression setting
+
+    Returns:
+        Tuple[Optional[Type[CompressionCodec]], Optional[int]]: The codec
+            (None for no compression) and the level
+    """
+    if isinstance(compression, tuple):
+        codec, level = compression
+        codec = resolve_compression(codec)[0]
+        return codec, level if codec is not None else None
+    if compression is None or compression == CompressionCodecs.NONE:
+        return None, None
+    if isinstance(compression, int) and not isinstance(compression, CompressionCodecs):
+        return ZlibCodec, compression
+    codec = get_codec(compression)
+    if codec is ZlibDictCodec:
+        raise ValueError("Use DictionaryCompression for zlib dictionaries")
+    return codec, None
+
+
+def inflate(
+    data: Union[bytes, memoryview],
+    compression_type: int = CompressionType.DEFAULT_COMPRESSION,
+) -> bytes:
+    """inflate.
+    Compress bytes without any intermediate copy.
+
+    Args:
+        data (Union[bytes, memoryview]): data
+        compression_type (int): compression_type
+    """
+    return zlib.compress(data, compression_type)
+
+
+def inflate_str(
+    text: Union[str, bytes],
+    compression_type: int = CompressionType.DEFAULT_COMPRESSION,
+):
     """inflate_str.
 
     Args:
-        text (str): text
+        text (Union[str, bytes]): text, or bytes of binary serializers
         compression_type (int): compression_type
     """
-    return zlib.compress(text.encode(), compression_type)
+    if isinstance(text, str):
+        text = text.encode()
+    return inflate(text, compression_type)
 
 
-def deflate(data: bytes):
+def deflate(data: Union[bytes, memoryview]) -> bytes:
     """deflate.
 
     Args:
-        data (bytes): data
+        data (Union[bytes, memoryview]): data
     """
     return zlib.decompress(data)
+
+
+def inflate_parts(
+    parts: List[Union[bytes, memoryview]],
+    compression_type: int = CompressionType.DEFAULT_COMPRESSION,
+) -> List[bytes]:
+    """inflate_parts.
+    Compress a payload given in parts, without joining them first.
+    Produces the same stream as inflate() on the joined payload.
+
+    Args:
+        parts (List[Union[bytes, memoryview]]): Parts of the payload
+        compression_type (int): compression_type
+    """
+    return ZlibCodec.compress_parts(parts, compression_type)
+
+
+def decompress(data: Union[bytes, memoryview], codec: int) -> Union[bytes, memoryview]:
+    """decompress.
+    Decompress data compressed with the given codec.
+
+    Args:
+        data (Union[bytes, memoryview]): data
+        codec (int): The CompressionCodecs id
+    """
+    if codec == CompressionCodecs.NONE:
+        return data
+    return get_codec(codec).decompress(data)
+
+
+# Payloads of at least PARALLEL_MIN_SIZE bytes are compressed in chunks of
+# CHUNK_SIZE bytes, in parallel (zlib, lzma, bz2, lz4 and zstd release the
+# GIL). Chunked streams are: number of chunks (I) | compressed size of each
+# chunk (Q) | compressed chunks.
+CHUNK_SIZE = 1 << 20
+PARALLEL_MIN_SIZE = 4 << 20
+_CHUNKS_HEADER = struct.Struct("<I")
+_chunk_executor: Optional[ThreadPoolExecutor] = None
+_chunk_executor_lock = threading.Lock()
+
+
+def _get_chunk_executor() -> ThreadPoolExecutor:
+    global _chunk_executor
+    if _chunk_executor is None:
+        with _chunk_executor_lock:
+            if _chunk_executor is None:
+                _chunk_executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 2,
+                    thread_name_prefix="commlib-compression",
+                )
+    return _chunk_executor
+
+
+def _split_chunks(
+    parts: List[Union[bytes, memoryview]], chunk_size: int
+) -> List[List[memoryview]]:
+    chunks = []
+    chunk = []
+    room = chunk_size
+    for part in parts:
+        view = memoryview(part)
+        while len(view) > 0:
+            chunk.append(view[:room])
+            room -= len(chunk[-1])
+            view = view[len(chunk[-1]) :]
+            if room == 0:
+                chunks.append(chunk)
+                chunk = []
+                room = chunk_size
+    if len(chunk) > 0:
+        chunks.append(chunk)
+    return chunks
+
+
+def compress_chunked(
+    parts: List[Union[bytes, memoryview]],
+    codec: Type[CompressionCodec],
+    level: int = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> List[bytes]:
+    """compress_chunked.
+    Compress a payload in independent chunks, in parallel.
+
+    Args:
+        parts (List[Union[bytes, memoryview]]): Parts of the payload
+        codec (Type[CompressionCodec]): The codec
+        level (int): Compression level. Codec default if not given.
+        chunk_size (int): Size (bytes) of the chunks before compression
+
+    Returns:
+        List[bytes]: Parts of the chunked stream
+    """
+    chunks = _split_chunks(parts, chunk_size)
+    _executor = _get_chunk_executor()
+    futures = [_executor.submit(codec.compress_parts, chunk, level) for chunk in chunks]
+    compressed = [future.result() for future in futures]
+    sizes = [sum(len(out) for out in outs) for outs in compressed]
+    _out = [struct.pack(f"<I{len(sizes)}Q", len(sizes), *sizes)]
+    for outs in compressed:
+        _out.extend(outs)
+    return _out
+
+
+def decompress_chunked(
+    data: Union[bytes, memoryview], codec: Type[CompressionCodec]
+) -> bytes:
+    """decompress_chunked.
+    Decompress a stream built by compress_chunked(), in parallel.
+
+    Args:
+        data (Union[bytes, memoryview]): The chunked stream
+        codec (Type[CompressionCodec]): The codec
+    """
+    view = memoryview(data)
+    try:
+        (nchunks,) = _CHUNKS_HEADER.unpack_from(view, 0)
+        sizes = struct.unpack_from(f"<{nchunks}Q", view, _CHUNKS_HEADER.size)
+    except struct.error as exc:
+        raise ValueError(f"Malformed chunked stream: {exc}")
+    offset = _CHUNKS_HEADER.size + 8 * nchunks
+    if offset + sum(sizes) > len(view):
+        raise ValueError("Truncated chunked stream")
+    _executor = _get_chunk_executor()
+    futures = []
+    for size in sizes:
+        futures.append(_executor.submit(codec.decompress, view[offset : offset + size]))
+        offset += size
+    return b"".join(future.result() for future in futures)
+
+
+class CompressionStats(BaseModel):
+    """CompressionStats.
+    Statistics of an adaptive compression policy.
+    """
+
+    messages: int = 0
+    compressed: int = 0
+    skipped_small: int = 0
+    skipped_incompressible: int = 0
+    # Sizes of compressed messages, before and after compression
+    bytes_in: int = 0
+    bytes_out: int = 0
+    # CPU seconds spent on compression and compressibility checks
+    cpu_time: float = 0.0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+class CompressionPolicy(abc.ABC):
+    """CompressionPolicy Abstract Class.
+    Compression policies decide per message how to compress it, if at all.
+    Use as the compression of endpoints. Payloads are then always framed,
+    to tell receivers how each message is compressed.
+    """
+
+    def __init__(self):
+        self._stats = CompressionStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CompressionStats:
+        """A snapshot of the statistics of the policy."""
+        with self._lock:
+            return self._stats.model_copy()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = CompressionStats()
+
+    def compress(
+        self, parts: List[Union[bytes, memoryview]], topic: Optional[str] = None
+    ) -> Tuple[List[Any], int]:
+        """compress.
+        Compress the parts of a payload.
+
+        Args:
+            parts (List[Union[bytes, memoryview]]): Parts of the payload
+            topic (Optional[str]): Topic the payload is sent to
+
+        Returns:
+            Tuple[List[Any], int]: The parts to send, and the
+                CompressionCodecs id they are compressed with
+        """
+        raise NotImplementedError()
+
+
+class AdaptiveCompression(CompressionPolicy):
+    """AdaptiveCompression.
+    Compression policy that decides per message whether compression pays
+    off. Messages smaller than min_size are never compressed. For larger
+    messages, the decision is learned per topic, by compressing a sample of
+    the payload, and is re-evaluated every relearn_interval messages, or as
+    soon as a compressed message does not reach max_ratio.
+    """
+
+    def __init__(
+        self,
+        compression_type: Any = CompressionType.BEST_SPEED,
+        min_size: int = 512,
+        max_ratio: float = 0.9,
+        sample_size: int = 4096,
+        relearn_interval: int = 1000,
+        max_topics: int = 4096,
+    ):
+        """__init__.
+
+        Args:
+            compression_type (Any): Codec and level of compressed messages.
+                Anything accepted by resolve_compression() (a zlib level by
+                default).
+            min_size (int): Minimum payload size (bytes) to compress
+            max_ratio (float): Maximum compressed to raw size ratio, for
+                compression to be worth it
+            sample_size (int): Size (bytes) of the compressibility sample
+            relearn_interval (int): Messages after which the decision of a
+                topic is re-evaluated
+            max_topics (int): Maximum number of topics to keep decisions for
+        """
+        super().__init__()
+        self._compression_type = compression_type
+        self._codec, self._level = resolve_compression(compression_type)
+        if self._codec is None:
+            raise ValueError("Adaptive compression requires a compression codec")
+        self._min_size = min_size
+        self._max_ratio = max_ratio
+        self._sample_size = sample_size
+        self._relearn_interval = relearn_interval
+        self._max_topics = max_topics
+        # topic -> (compress, remaining messages until re-evaluation). Tuples
+        # are replaced under the lock, never mutated.
+        self._decisions: Dict[Optional[str], Tuple[bool, int]] = {}
+
+    @property
+    def compression_type(self) -> Any:
+        return self._compression_type
+
+    @property
+    def codec(self) -> Type[CompressionCodec]:
+        return self._codec
+
+    def compress(
+        self, parts: List[Union[bytes, memoryview]], topic: Optional[str] = None
+    ) -> Tuple[List[Any], int]:
+        """compress.
+        Compress the parts of a payload, if worth it.
+
+        Args:
+            parts (List[Union[bytes, memoryview]]): Parts of the payload
+            topic (Optional[str]): Topic the payload is sent to
+        """
+        size = sum(len(part) for part in parts)
+        if size < self._min_size:
+            with self._lock:
+                self._stats.messages += 1
+                self._stats.skipped_small += 1
+            return parts, CompressionCodecs.NONE
+        _t0 = time.thread_time()
+        with self._lock:
+            decision = self._decisions.get(topic)
+            if decision is not None:
+                decision = (decision[0], decision[1] - 1)
+                self._decisions[topic] = decision
+        learned = None
+        if decision is None or decision[1] <= 0:
+            learned = (self._sample_compressible(parts), self._relearn_interval)
+            decision = learned
+        out = None
+        if decision[0]:
+            out = self._codec.compress_parts(parts, self._level)
+            out_size = sum(len(chunk) for chunk in out)
+            if out_size > size * self._max_ratio:
+                # Not worth it. Send the smaller payload and learn.
+                learned = (False, decision[1])
+                if out_size >= size:
+                    out = None
+        _cpu_time = time.thread_time() - _t0
+        with self._lock:
+            if learned is not None:
+                if (
+                    topic not in self._decisions
+                    and len(self._decisions) >= self._max_topics
+                ):
+                    self._decisions.clear()
+                self._decisions[topic] = learned
+            self._stats.messages += 1
+            self._stats.cpu_time += _cpu_time
+            if out is None:
+                self._stats.skipped_incompressible += 1
+            else:
+                self._stats.compressed += 1
+                self._stats.bytes_in += size
+                self._stats.bytes_out += out_size
+        if out is None:
+            return parts, CompressionCodecs.NONE
+        return out, self._codec.CODEC_ID
+
+    def _sample_compressible(self, parts: List[Union[bytes, memoryview]]) -> bool:
+        # Sample the largest part, which dominates the payload size
+        sample = max(parts, key=len)[: self._sample_size]
+        return (
+            len(self._codec.compress(sample, self._level))
+            <= len(sample) * self._max_ratio
+        )
+
+
+class _DictionaryState:
+    __slots__ = ("samples", "zdict", "since_announce", "since_train")
+
+    def __init__(self, zdict: Optional[bytes] = None):
+        self.samples: List[bytes] = []
+        self.zdict = zdict
+        self.since_announce = 0
+        self.since_train = 0
+
+
+class DictionaryCompression(CompressionPolicy):
+    """DictionaryCompression.
+    Compression policy for small, repetitive messages. Compresses with zlib
+    and a preset dictionary, trained per topic from the first train_samples
+    messages (compressed with plain zlib meanwhile), or given upfront.
+    Subscribers get the dictionary inline, with the first message compressed
+    with it and then every announce_interval messages. Subscribers that join
+    in between can not decode messages until the next announcement, unless
+    the dictionary is registered on their side with register_zdict().
+    Receivers keep the last MAX_INLINE_ZDICTS dictionaries received inline.
+    """
+
+    def __init__(
+        self,
+        level: int = zlib.Z_DEFAULT_COMPRESSION,
+        train_samples: int = 100,
+        max_dict_size: int = 4096,
+        retrain_interval: int = 0,
+        announce_interval: int = 100,
+        per_topic: bool = True,
+        zdict: Optional[bytes] = None,
+    ):
+        """__init__.
+
+        Args:
+            level (int): zlib level
+            train_samples (int): Number of messages to train dictionaries on
+            max_dict_size (int): Maximum dictionary size (bytes)
+            retrain_interval (int): Messages after which a dictionary is
+                trained again, to follow changes of traffic. 0 to disable.
+            announce_interval (int): Send the dictionary inline every that
+                many messages
+            per_topic (bool): Train a dictionary per topic, or a single one
+                for all topics
+            zdict (Optional[bytes]): Preset dictionary to use for all
+                topics, instead of training one
+        """
+        super().__init__()
+        self._level = level
+        self._train_samples = train_samples
+        self._max_dict_size = max_dict_size
+        self._retrain_interval = retrain_interval
+        self._announce_interval = max(announce_interval, 1)
+        self._per_topic = per_topic
+        self._zdict = zdict
+        if zdict is not None:
+            register_zdict(zdict)
+        self._states: Dict[Optional[str], _DictionaryState] = {}
+
+    def dictionary(self, topic: Optional[str] = None) -> Optional[bytes]:
+        """dictionary.
+        The current dictionary of a topic, e.g. to distribute it to
+        subscribers out-of-band.
+
+        Args:
+            topic (Optional[str]): The topic
+        """
+        state = self._states.get(topic if self._per_topic else None)
+        return state.zdict if state is not None else self._zdict
+
+    def compress(
+        self, parts: List[Union[bytes, memoryview]], topic: Optional[str] = None
+    ) -> Tuple[List[Any], int]:
+        """compress.
+        Compress the parts of a payload with the dictionary of the topic.
+
+        Args:
+            parts (List[Union[bytes, memoryview]]): Parts of the payload
+            topic (Optional[str]): Topic the payload is sent to
+        """
+        _t0 = time.thread_time()
+        key = topic if self._per_topic else None
+        samples = None
+        inline = False
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _DictionaryState(self._zdict)
+            if state.zdict is None or (
+                self._retrain_interval > 0
+                and state.since_train >= self._retrain_interval
+            ):
+                state.samples.append(b"".join(parts))
+                if len(state.samples) >= self._train_samples:
+                    samples = state.samples
+                    state.samples = []
+        if samples is not None:
+            zdict = train_zdict(samples, self._max_dict_size)
+            with self._lock:
+                state.zdict = zdict
+                state.since_train = 0
+                state.since_announce = 0
+        with self._lock:
+            zdict = state.zdict
+            if zdict is not None:
+                inline = state.since_announce % self._announce_interval == 0
+                state.since_announce += 1
+                state.since_train += 1
+        if zdict is None:
+            out = ZlibCodec.compress_parts(parts, self._level)
+            codec = CompressionCodecs.ZLIB
+        else:
+            out = ZlibDictCodec.compress_with_dict(parts, zdict, self._level, inline)
+            codec = CompressionCodecs.ZLIB_DICT
+        _cpu_time = time.thread_time() - _t0
+        with self._lock:
+            self._stats.messages += 1
+            self._stats.compressed += 1
+            self._stats.bytes_in += sum(len(part) for part in parts)
+            self._stats.bytes_out += sum(len(chunk) for chunk in out)
+            self._stats.cpu_time += _cpu_time
+        return out, codec
+
+
+register_codec(ZlibCodec)
+register_codec(ZlibDictCodec)
+register_codec(LzmaCodec)
+register_codec(Bz2Codec)
+if lz4_frame is not None:
+    register_codec(Lz4Codec)
+if zstandard is not None:
+    register_codec(ZstdCodec)
@@ -1,9 +1,17 @@
 import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
 
 from commlib.compression import CompressionType
 from commlib.connection import BaseConnectionParameters
-from commlib.serializer import JSONSerializer, Serializer
+from commlib.framing import FrameCodec
+from commlib.msg import construct_message
+from commlib.serializer import JSONSerializer, Serializer, get_serializer
 from commlib.transports import BaseTransport
 
 e_logger = None
@@ -25,11 +33,50 @@ class BaseEndpoint:
         serializer: Serializer = JSONSerializer,
         conn_params: BaseConnectionParameters = None,
         compression: CompressionType = CompressionType.NO_COMPRESSION,
+        trusted: bool = False,
+        validate_rate: float = 0.0,
+        framed: bool = False,
+        executor: Optional[ThreadPoolExecutor] = None,
+        connection: Any = None,
     ):
+        """__init__.
+
+        Args:
+            debug (bool): debug
+            serializer (Serializer): serializer
+            conn_params (BaseConnectionParameters): conn_params
+            compression (CompressionType): compression. Either a zlib level,
+                a compression codec (class, id or name), a (codec, level)
+                tuple, or an AdaptiveCompression policy.
+            trusted (bool): Build received messages without validation.
+                Use only when producers are known to send valid messages.
+            validate_rate (float): Fraction (0.0 - 1.0) of messages to
+                still validate in trusted mode, to detect schema drift.
+            framed (bool): Prefix sent payloads with a frame header, which
+                describes their serializer and compression. Received
+                payloads are always decoded based on their frame header.
+            executor (Optional[ThreadPoolExecutor]): Executor to run
+                callbacks and requests on, e.g. shared by the endpoints of
+                a Node. The endpoint creates its own if not given.
+            connection (Any): Broker connection of the transport (the
+                Connection of the transport module), e.g. shared by the
+                endpoints of a Node. The endpoint opens its own if not
+                given, and never closes a connection it was given.
+        """
         self._debug = debug
-        self._serializer = serializer
+        self._serializer = get_serializer(serializer)
         self._compression = compression
         self._conn_params = conn_params
+        self._trusted = trusted
+        self._validate_rate = validate_rate
+        self._schema_drift = 0
+        self._schema_drift_lock = threading.Lock()
+        self._framed = framed
+        self._shared_executor = executor
+        self._connection = connection
+        self._codec = FrameCodec(
+            serializer=self._serializer, compression=compression, framed=framed
+        )
 
     @property
     def log(self):
@@ -39,6 +86,49 @@ class BaseEndpoint:
     def debug(self):
         return self._debug
 
+    def _get_executor(self, workers: int) -> ThreadPoolExecutor:
+        """_get_executor.
+        The shared executor of the endpoint, or a new one. The number of
+        workers only applies to a new executor.
+
+        Args:
+            workers (int): Number of workers of a new executor
+        """
+        if self._shared_executor is not None:
+            return self._shared_executor
+        return ThreadPoolExecutor(max_workers=workers)
+
+    @property
+    def schema_drift(self) -> int:
+        """Number of sampled messages that failed validation in trusted mode."""
+        return self._schema_drift
+
+    def _build_msg(self, msg_type: Type[BaseModel], data: Dict[str, Any]) -> Any:
+        """_build_msg.
+        Build a received message of the given type, validating it unless
+        the endpoint is trusted.
+
+        Args:
+            msg_type (Type[BaseModel]): The message type
+            data (Dict[str, Any]): The deserialized payload
+        """
+        if not self._trusted:
+            return msg_type(**data)
+        elif self._validate_rate > 0 and random.random() < self._validate_rate:
+            try:
+                return msg_type(**data)
+            except ValidationError:
+                # Messages are built on many threads (inbox, dispatch
+                # workers, executor)
+                with self._schema_drift_lock:
+                    self._schema_drift += 1
+                self.log.warning(
+                    f"Schema drift detected for message type <{msg_type.__name__}>",
+                    exc_info=True,
+                )
+                raise
+        return construct_message(msg_type, data)
+
 
 class EndpointType(Enum):
     """EndpointType.
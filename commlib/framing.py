@@ -0,0 +1,240 @@
+import struct
+from typing import Any, List, NamedTuple, Optional, Tuple, Union
+
+from commlib.compression import (
+    CHUNK_SIZE,
+    PARALLEL_MIN_SIZE,
+    CompressionCodecs,
+    CompressionPolicy,
+    CompressionType,
+    compress_chunked,
+    decompress,
+    decompress_chunked,
+    deflate,
+    get_codec,
+    resolve_compression,
+)
+from commlib.exceptions import SerializationError
+from commlib.serializer import JSONSerializer, Serializer, get_serializer
+
+# Frame header layout (8 bytes, keeps out-of-band buffers 8-byte aligned):
+#   magic (2s) | version (B) | codec (B) | compression (B) | flags (B)
+#   reserved (H)
+# The first magic byte (0xC1) is never used by msgpack, and can not start a
+# JSON, a CBOR map or a zlib payload.
+FRAME_MAGIC = b"\xc1C"
+FRAME_VERSION = 1
+_FRAME_HEADER = struct.Struct("<2sBBBBH")
+FRAME_HEADER_SIZE = _FRAME_HEADER.size
+
+# Frame flags
+FLAG_CHUNKED = 0x01  # Body compressed in independent chunks
+
+
+class FrameHeader(NamedTuple):
+    """FrameHeader.
+    Header of a framed payload.
+    """
+
+    version: int
+    codec: int
+    compression: int
+    flags: int = 0
+
+
+def is_framed(payload: Union[bytes, memoryview]) -> bool:
+    """is_framed.
+
+    Args:
+        payload (Union[bytes, memoryview]): A received payload
+    """
+    return bytes(payload[:2]) == FRAME_MAGIC
+
+
+def encode_frame_header(header: FrameHeader) -> bytes:
+    """encode_frame_header.
+
+    Args:
+        header (FrameHeader): The header
+    """
+    return _FRAME_HEADER.pack(
+        FRAME_MAGIC,
+        header.version,
+        header.codec,
+        header.compression,
+        header.flags,
+        0,
+    )
+
+
+def decode_frame(payload: Union[bytes, memoryview]) -> Tuple[FrameHeader, memoryview]:
+    """decode_frame.
+    Split a framed payload to its header and body. The body is a view
+    on the payload.
+
+    Args:
+        payload (Union[bytes, memoryview]): The framed payload
+    """
+    try:
+        magic, version, codec, compression, flags, _ = _FRAME_HEADER.unpack_from(
+            payload, 0
+        )
+    except struct.error as exc:
+        raise SerializationError(f"Malformed frame: {exc}")
+    if magic != FRAME_MAGIC:
+        raise SerializationError("Payload is not framed")
+    if version > FRAME_VERSION:
+        raise SerializationError(f"Unsupported frame version <{version}>")
+    header = FrameHeader(version, codec, compression, flags)
+    return header, memoryview(payload)[FRAME_HEADER_SIZE:]
+
+
+def _is_zlib_stream(payload: Union[bytes, memoryview]) -> bool:
+    # zlib streams start with 0x78 (deflate, 32K window) and a header
+    # checksum: (CMF * 256 + FLG) must be a multiple of 31.
+    return (
+        len(payload) > 1
+        and payload[0] == 0x78
+        and (payload[0] * 256 + payload[1]) % 31 == 0
+    )
+
+
+class FrameCodec:
+    """FrameCodec.
+    Encodes messages to payloads (serialize, compress, frame) and decodes
+    received payloads. Received payloads are decoded based on their frame
+    header, regardless of the local serializer and compression. Unframed
+    payloads, from senders that do not frame messages, are decoded with the
+    local serializer, and are decompressed if they are zlib streams.
+    """
+
+    def __init__(
+        self,
+        serializer: Serializer = JSONSerializer,
+        compression: Union[CompressionType, CompressionPolicy] = (
+            CompressionType.NO_COMPRESSION
+        ),
+        framed: bool = False,
+        chunk_size: int = CHUNK_SIZE,
+        parallel_min_size: int = PARALLEL_MIN_SIZE,
+    ):
+        """__init__.
+
+        Args:
+            serializer (Serializer): Serializer of sent messages, and of
+                received unframed payloads
+            compression (Union[CompressionType, CompressionPolicy]):
+                Compression of sent messages. Either a zlib level, a codec
+                (or a (codec, level) tuple, see resolve_compression()), or
+                a CompressionPolicy. Codecs other than zlib and compression
+                policies imply framed payloads.
+            framed (bool): Prefix sent payloads with a frame header.
+                Receivers of framed payloads must be able to decode frames.
+            chunk_size (int): Size (bytes) of the chunks of large payloads
+            parallel_min_size (int): Framed payloads of at least that size
+                are compressed (and decompressed) in chunks, in parallel
+        """
+        self._serializer = get_serializer(serializer)
+        self._compression = compression
+        self._chunk_size = chunk_size
+        self._parallel_min_size = parallel_min_size
+        self._policy = isinstance(compression, CompressionPolicy)
+        if self._policy:
+            self._compression_codec, self._level = None, None
+        else:
+            self._compression_codec, self._level = resolve_compression(compression)
+        self._framed = (
+            framed
+            or self._policy
+            or (
+                self._compression_codec is not None
+                and self._compression_codec.CODEC_ID != CompressionCodecs.ZLIB
+            )
+        )
+
+    @property
+    def serializer(self) -> Serializer:
+        return self._serializer
+
+    @property
+    def compression(self) -> Union[CompressionType, CompressionPolicy]:
+        return self._compression
+
+    @property
+    def framed(self) -> bool:
+        return self._framed
+
+    def encode(self, data: Any, topic: Optional[str] = None) -> bytes:
+        """encode.
+        Encode a message to a payload.
+
+        Args:
+            data (Any): The message
+            topic (Optional[str]): Topic (or queue) the message is sent to
+        """
+        return self._join(self.encode_parts(data, topic))
+
+    def encode_parts(self, data: Any, topic: Optional[str] = None) -> List[Any]:
+        """encode_parts.
+        Encode a message to the (bytes-like) parts of its payload.
+
+        Args:
+            data (Any): The message
+            topic (Optional[str]): Topic (or queue) the message is sent to
+        """
+        parts = self._serializer.serialize_parts(data)
+        compression = CompressionCodecs.NONE
+        flags = 0
+        if self._policy:
+            parts, compression = self._compression.compress(parts, topic)
+        elif self._compression_codec is not None:
+            if (
+                self._framed
+                and sum(len(part) for part in parts) >= self._parallel_min_size
+            ):
+                parts = compress_chunked(
+                    parts, self._compression_codec, self._level, self._chunk_size
+                )
+                flags |= FLAG_CHUNKED
+            else:
+                parts = self._compression_codec.compress_parts(parts, self._level)
+            compression = self._compression_codec.CODEC_ID
+        if self._framed:
+            header = FrameHeader(
+                FRAME_VERSION, self._serializer.SERIALIZATION_TYPE, compression, flags
+            )
+            parts.insert(0, encode_frame_header(header))
+        return parts
+
+    def decode(self, payload: Union[bytes, memoryview]) -> Any:
+        """decode.
+        Decode a received payload.
+
+        Args:
+            payload (Union[bytes, memoryview]): The payload
+        """
+        if is_framed(payload):
+            header, body = decode_frame(payload)
+            serializer = get_serializer(header.codec)
+            try:
+                if header.flags & FLAG_CHUNKED:
+                    body = decompress_chunked(body, get_codec(header.compression))
+                else:
+                    body = decompress(body, header.compression)
+            except Exception as exc:
+                # zlib.error, lzma.LZMAError, OSError (bz2), ... on corrupted
+                # bodies
+                raise SerializationError(f"Cannot decompress payload: {exc}")
+            return serializer.deserialize_bytes(body)
+        if _is_zlib_stream(payload):
+            try:
+                payload = deflate(payload)
+            except Exception as exc:
+                raise SerializationError(f"Cannot decompress payload: {exc}")
+        return self._serializer.deserialize_bytes(payload)
+
+    @staticmethod
+    def _join(parts: List[Any]) -> bytes:
+        if len(parts) == 1:
+            return bytes(parts[0])
+        return b"".join(parts)
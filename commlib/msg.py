@@ -1,13 +1,32 @@
 import abc
 import base64
 from os import path
-from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import core_schema
+from typing_extensions import Annotated
 
 from commlib.utils import gen_timestamp
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 Primitives = [str, int, float, bool, bytes]
 
 
@@ -104,3 +123,171 @@ class FileObject(BaseModel):
             b64 = base64.b64encode(fdata)
             self.data = b64.decode()
             self.filename = path.basename(filepath)
+
+
+def _validate_ndarray(value: Any) -> Any:
+    if np is None:
+        raise ValueError("NDArray fields require numpy to be installed")
+    if isinstance(value, np.ndarray):
+        return value
+    return np.asarray(value)
+
+
+class NDArray:
+    """NDArray.
+    Message field type for numpy arrays. Binary transports carry arrays
+    out-of-band, as raw buffers next to the message body, and receivers
+    rebuild them with numpy.frombuffer on top of the received payload,
+    without copying. Such arrays are read-only.
+    Requires numpy.
+    """
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: Any):
+        return core_schema.no_info_plain_validator_function(_validate_ndarray)
+
+
+_field_adapters: Dict[Type[BaseModel], Dict[str, TypeAdapter]] = {}
+
+
+def _field_adapter(msg_type: Type[BaseModel], name: str) -> TypeAdapter:
+    adapters = _field_adapters.setdefault(msg_type, {})
+    adapter = adapters.get(name)
+    if adapter is None:
+        field = msg_type.model_fields[name]
+        annotation = field.annotation
+        if field.metadata:
+            annotation = Annotated[(annotation, *field.metadata)]
+        adapter = TypeAdapter(annotation)
+        adapters[name] = adapter
+    return adapter
+
+
+class LazyMessage:
+    """LazyMessage.
+    Read-only view of a received message. Fields are validated against the
+    message type on first access and cached, so callbacks only pay for the
+    fields they read. If a projection is given, only those fields of the
+    payload are kept and accessible. Other attributes of the message type,
+    e.g. model_dump(), dict() or json(), are forwarded to the message built
+    from the whole (projected) payload.
+    """
+
+    def __init__(
+        self,
+        msg_type: Type[BaseModel],
+        data: Dict[str, Any],
+        projection: Optional[Iterable[str]] = None,
+    ):
+        """__init__.
+
+        Args:
+            msg_type (Type[BaseModel]): The message type
+            data (Dict[str, Any]): The deserialized payload
+            projection (Optional[Iterable[str]]): Fields to keep
+        """
+        if projection is not None:
+            projection = frozenset(projection)
+            data = {k: v for k, v in data.items() if k in projection}
+        self._msg_type = msg_type
+        self._data = data
+        self._projection = projection
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for fields not validated yet
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._msg_type.model_fields:
+            if hasattr(self._msg_type, name):
+                return getattr(self._get_message(), name)
+            raise AttributeError(name)
+        if self._projection is not None and name not in self._projection:
+            raise AttributeError(f"Field <{name}> is not part of the projection")
+        if name in self._data:
+            value = _field_adapter(self._msg_type, name).validate_python(
+                self._data[name]
+            )
+        else:
+            field = self._msg_type.model_fields[name]
+            if field.is_required():
+                raise ValueError(f"Field <{name}> is missing from message")
+            value = field.get_default(call_default_factory=True)
+        # Cache as a plain attribute. Next accesses bypass __getattr__.
+        self.__dict__[name] = value
+        return value
+
+    def to_message(self) -> BaseModel:
+        """to_message.
+        Validate the whole payload and return the message instance.
+        """
+        return self._msg_type(**self._data)
+
+    def _get_message(self) -> BaseModel:
+        # Built once, for the methods of the message type
+        message = self.__dict__.get("_message")
+        if message is None:
+            message = self.__dict__["_message"] = self.to_message()
+        return message
+
+    def __repr__(self) -> str:
+        return f"LazyMessage({self._msg_type.__name__}, fields={list(self._data)})"
+
+
+def model_type_of(annotation: Any) -> Optional[Type[BaseModel]]:
+    """model_type_of.
+    Return the model class of Model and Optional[Model] field annotations,
+    or None for any other annotation.
+
+    Args:
+        annotation (Any): Field annotation
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return model_type_of(args[0])
+    return None
+
+
+# (field name, is list of models, model type) of the nested model fields
+_construct_plans: Dict[Type[BaseModel], List[Tuple[str, bool, Any]]] = {}
+
+
+def _construct_plan(msg_type: Type[BaseModel]) -> List[Tuple[str, bool, Any]]:
+    plan = _construct_plans.get(msg_type)
+    if plan is None:
+        plan = []
+        for name, field in msg_type.model_fields.items():
+            model = model_type_of(field.annotation)
+            if model is not None:
+                plan.append((name, False, model))
+            elif get_origin(field.annotation) in (list, List):
+                args = get_args(field.annotation)
+                model = model_type_of(args[0]) if args else None
+                if model is not None:
+                    plan.append((name, True, model))
+        _construct_plans[msg_type] = plan
+    return plan
+
+
+def construct_message(msg_type: Type[BaseModel], data: Dict[str, Any]) -> BaseModel:
+    """construct_message.
+    Build a message from trusted data, without validation. Nested messages
+    are constructed recursively.
+
+    Args:
+        msg_type (Type[BaseModel]): The message type
+        data (Dict[str, Any]): The deserialized payload
+    """
+    for name, is_list, model in _construct_plan(msg_type):
+        val = data.get(name)
+        if val is None:
+            continue
+        elif is_list:
+            data[name] = [
+                construct_message(model, v) if isinstance(v, dict) else v for v in val
+            ]
+        elif isinstance(val, dict):
+            data[name] = construct_message(model, val)
+    return msg_type.model_construct(**data)
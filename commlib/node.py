@@ -1,6 +1,7 @@
 import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import IntEnum
 from functools import wraps
 from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
@@ -11,6 +12,7 @@ from commlib.compression import CompressionType
 from commlib.endpoints import TransportType
 from commlib.msg import HeartbeatMessage, RPCMessage
 from commlib.pubsub import BasePublisher
+from commlib.serializer import JSONSerializer, Serializer
 from commlib.utils import gen_random_id
 
 n_logger: logging.Logger = None
@@ -176,8 +178,14 @@ class Node:
         heartbeat_interval: Optional[float] = 10.0,
         heartbeat_uri: Optional[str] = None,
         compression: CompressionType = CompressionType.NO_COMPRESSION,
+        serializer: Serializer = JSONSerializer,
+        trusted: Optional[bool] = False,
+        validate_rate: Optional[float] = 0.0,
+        framed: Optional[bool] = False,
         ctrl_services: Optional[bool] = False,
         workers_rpc: Optional[int] = 5,
+        executor_workers: Optional[int] = 16,
+        shared_connection: Optional[bool] = True,
     ):
         """__init__.
 
@@ -193,7 +201,33 @@ class Node:
                 in seconds
             heartbeat_uri (Optional[str]): The Topic URI to publish heartbeat
                 messages
+            compression (CompressionType): Default compression of endpoints.
+                An AdaptiveCompression policy given here is shared by all
+                endpoints of the Node.
+            serializer (Serializer): Default serializer of endpoints. Accepts
+                a Serializer or a SerializationTypes id/name (e.g. "msgpack").
+                Endpoints can override it by passing their own serializer.
+            trusted (Optional[bool]): Default trusted mode of subscribers,
+                RPC services and action services. Received messages are
+                built without validation.
+            validate_rate (Optional[float]): Fraction of received messages
+                to validate in trusted mode, to detect schema drift.
+            framed (Optional[bool]): Default framing of endpoints. Framed
+                payloads carry their serializer and compression in a
+                header, so that receivers can decode them without sharing
+                the configuration of the sender.
             ctrl_services (Optional[bool]): Enable/Disable control interfaces
+            workers_rpc (Optional[int]): Number of workers of RPC services
+                created with isolated=True. Other RPC services run on the
+                shared executor.
+            executor_workers (Optional[int]): Size of the executor shared by
+                the endpoints of the Node, to run callbacks, requests and
+                goals. Endpoints created with isolated=True get their own.
+                It is shut down when the Node is stopped.
+            shared_connection (Optional[bool]): Multiplex the endpoints of
+                the Node over one broker connection (MQTT, Redis and AMQP
+                transports), instead of one connection per endpoint.
+                Endpoints created with isolated=True get their own.
         """
         if node_name == "" or node_name is None:
             node_name = gen_random_id()
@@ -212,6 +246,16 @@ class Node:
             else f"{self._namespace}.heartbeat"
         )
         self._compression = compression
+        self._serializer = serializer
+        self._trusted = trusted
+        self._validate_rate = validate_rate
+        self._framed = framed
+        self._executor = ThreadPoolExecutor(
+            max_workers=executor_workers, thread_name_prefix=node_name
+        )
+        self._shared_connection = shared_connection
+        self._connection = None
+        self._state_cond = threading.Condition()
         self.state = NodeState.IDLE
 
         self._publishers = []
@@ -249,6 +293,39 @@ class Node:
     def log(self) -> logging.Logger:
         return self.logger()
 
+    @property
+    def state(self) -> NodeState:
+        return self._state
+
+    @state.setter
+    def state(self, state: NodeState) -> None:
+        # Wakes up run_forever() on state changes
+        with self._state_cond:
+            self._state = state
+            self._state_cond.notify_all()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Executor shared by the endpoints of the Node."""
+        return self._executor
+
+    @property
+    def connection(self) -> Any:
+        """Broker connection shared by the endpoints of the Node, if any."""
+        return self._connection
+
+    def _get_connection(self) -> Any:
+        # Transports without a Connection (e.g. kafka, mock) do not share
+        if not self._shared_connection or not hasattr(
+            self._transport_module, "Connection"
+        ):
+            return None
+        if self._connection is None:
+            self._connection = self._transport_module.Connection(self._conn_params)
+            if self.state == NodeState.RUNNING:
+                self._connection.start()
+        return self._connection
+
     def _init_heartbeat_thread(self) -> None:
         hb_pub = self.create_publisher(
             topic=self._heartbeat_uri, msg_type=HeartbeatMessage
@@ -330,6 +407,8 @@ class Node:
         if self._has_ctrl_services:
             self.create_start_service()
             self.create_stop_service()
+        if self._connection is not None:
+            self._connection.start()
         for c in self._subscribers:
             c.run()
         for c in self._publishers:
@@ -352,13 +431,16 @@ class Node:
         the main thread from exiting.
         Also starts the heartbeat thread (if enabled).
 
+        Blocks until the state of the Node is set to NodeState.EXITED.
+
         Args:
-            sleep_rate (float): Rate to sleep between wait-state iterations.
+            sleep_rate (float): Unused. Kept for backward compatibility,
+                the Node is woken up on state changes.
         """
         if self.state != NodeState.RUNNING:
             self.run()
-        while self.state != NodeState.EXITED:
-            time.sleep(sleep_rate)
+        with self._state_cond:
+            self._state_cond.wait_for(lambda: self._state == NodeState.EXITED)
         self.stop()
 
     def stop(self):
@@ -374,14 +456,60 @@ class Node:
             c.stop()
         for c in self._action_clients:
             c.stop()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self._executor.shutdown(wait=False)
+
+    def _endpoint_kwargs(
+        self, kwargs: Dict[str, Any], receiver: bool = False
+    ) -> Dict[str, Any]:
+        """_endpoint_kwargs.
+        Apply Node-level defaults to endpoint arguments, unless explicitly
+        given for the endpoint.
+
+        Args:
+            kwargs (Dict[str, Any]): Endpoint keyword arguments
+            receiver (bool): Whether the endpoint builds received messages
+                (Subscribers, RPC and Action services)
+        """
+        # Latency-critical endpoints can opt out of the shared executor
+        # and connection
+        if not kwargs.pop("isolated", False):
+            kwargs.setdefault("executor", self._executor)
+            if "connection" not in kwargs:
+                connection = self._get_connection()
+                if connection is not None:
+                    kwargs["connection"] = connection
+        kwargs.setdefault("compression", self._compression)
+        kwargs.setdefault("serializer", self._serializer)
+        kwargs.setdefault("framed", self._framed)
+        if receiver:
+            kwargs.setdefault("trusted", self._trusted)
+            kwargs.setdefault("validate_rate", self._validate_rate)
+        return kwargs
+
+    def _check_workers(self, kwargs: Dict[str, Any]) -> None:
+        """_check_workers.
+        Warn that the workers of an RPC endpoint are ignored, unless it is
+        isolated from the shared executor.
+
+        Args:
+            kwargs (Dict[str, Any]): Endpoint keyword arguments
+        """
+        if "workers" in kwargs and not kwargs.get("isolated", False):
+            self.logger().warning(
+                f"workers={kwargs['workers']} is ignored, the endpoint runs "
+                f"on the executor of Node <{self._node_name}>. "
+                "Create it with isolated=True for its own workers."
+            )
 
     def create_publisher(self, *args, **kwargs):
         """Creates a new Publisher Endpoint."""
         pub = self._transport_module.Publisher(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs),
         )
         self._publishers.append(pub)
         return pub
@@ -390,9 +518,8 @@ class Node:
         """Creates a new Publisher Endpoint."""
         pub = self._transport_module.MPublisher(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs),
         )
         self._publishers.append(pub)
         return pub
@@ -401,9 +528,8 @@ class Node:
         """Creates a new Publisher Endpoint."""
         sub = self._transport_module.Subscriber(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs, receiver=True),
         )
         self._subscribers.append(sub)
         return sub
@@ -412,9 +538,8 @@ class Node:
         """Creates a new Publisher Endpoint."""
         sub = self._transport_module.PSubscriber(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs, receiver=True),
         )
         self._subscribers.append(sub)
         return sub
@@ -435,23 +560,23 @@ class Node:
 
     def create_rpc(self, *args, **kwargs):
         """Creates a new Publisher Endpoint."""
+        self._check_workers(kwargs)
+        kwargs.setdefault("workers", self._workers_rpc)
         rpc = self._transport_module.RPCService(
             conn_params=self._conn_params,
-            compression=self._compression,
-            workers=self._workers_rpc,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs, receiver=True),
         )
         self._rpc_services.append(rpc)
         return rpc
 
     def create_rpc_client(self, *args, **kwargs):
         """Creates a new Publisher Endpoint."""
+        self._check_workers(kwargs)
         client = self._transport_module.RPCClient(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs),
         )
         self._rpc_clients.append(client)
         return client
@@ -460,9 +585,8 @@ class Node:
         """Creates a new ActionService Endpoint."""
         action = self._transport_module.ActionService(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs, receiver=True),
         )
         self._action_services.append(action)
         return action
@@ -471,9 +595,8 @@ class Node:
         """Creates a new ActionClient Endpoint."""
         aclient = self._transport_module.ActionClient(
             conn_params=self._conn_params,
-            compression=self._compression,
             *args,
-            **kwargs,
+            **self._endpoint_kwargs(kwargs),
         )
         self._action_clients.append(aclient)
         return aclient
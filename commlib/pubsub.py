@@ -1,17 +1,494 @@
+import enum
+import functools
 import logging
+import sys
 import threading
+import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+from pydantic import BaseModel
+
+from commlib.compression import CompressionPolicy, CompressionStats
 from commlib.connection import BaseConnectionParameters
 from commlib.endpoints import BaseEndpoint
-from commlib.msg import PubSubMessage
+from commlib.msg import LazyMessage, PubSubMessage
 from commlib.serializer import JSONSerializer, Serializer
 from commlib.utils import gen_random_id
 
 pubsub_logger = None
 
 
+class BatchStats(BaseModel):
+    """BatchStats.
+    Statistics of a micro-batching publisher.
+    """
+
+    batches: int = 0
+    messages: int = 0
+    # Batches sent because they were full, or because max_delay_ms expired
+    flushed_full: int = 0
+    flushed_delay: int = 0
+    failed: int = 0
+    # Number of delivered batches per batch size
+    batch_sizes: Dict[int, int] = {}
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.messages / self.batches if self.batches else 0.0
+
+
+class MicroBatcher:
+    """MicroBatcher.
+    Gathers messages published from any thread, and flushes them from a
+    background thread once max_batch messages are pending, or max_delay_ms
+    after the oldest pending message was added.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], None],
+        max_batch: int = 100,
+        max_delay_ms: float = 5.0,
+        name: str = "",
+    ):
+        """__init__.
+
+        Args:
+            flush (Callable[[List[Any]], None]): Sends a batch
+            max_batch (int): Maximum number of messages per batch
+            max_delay_ms (float): Maximum time (ms) a message waits for its
+                batch to fill
+            name (str): Name of the sender thread
+        """
+        self._flush = flush
+        self._max_batch = max_batch
+        self._max_delay = max_delay_ms / 1000.0
+        # (deadline, message) pairs, oldest first
+        self._pending: List[Tuple[float, Any]] = []
+        self._cond = threading.Condition()
+        self._stats = BatchStats()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name=f"batcher-{name}", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def stats(self) -> BatchStats:
+        with self._cond:
+            return self._stats.model_copy(deep=True)
+
+    def add(self, item: Any) -> None:
+        """add.
+        Add a message to the pending batch.
+
+        Args:
+            item (Any): The message
+        """
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Publisher is stopped")
+            self._pending.append((time.monotonic() + self._max_delay, item))
+            if len(self._pending) == 1 or len(self._pending) >= self._max_batch:
+                self._cond.notify()
+
+    def stop(self) -> None:
+        """stop.
+        Flush pending messages and stop the sender thread.
+        """
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running:
+                    if len(self._pending) >= self._max_batch:
+                        break
+                    if len(self._pending) > 0:
+                        timeout = self._pending[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        self._cond.wait(timeout)
+                    else:
+                        self._cond.wait()
+                full = len(self._pending) >= self._max_batch
+                batch = [item for _, item in self._pending[: self._max_batch]]
+                del self._pending[: self._max_batch]
+                running = self._running
+            if len(batch) > 0:
+                self._send(batch, full)
+            elif not running:
+                return
+
+    def _send(self, batch: List[Any], full: bool) -> None:
+        try:
+            self._flush(batch)
+        except Exception:
+            BasePublisher.logger().error(
+                f"Failed to flush a batch of {len(batch)} messages", exc_info=True
+            )
+            with self._cond:
+                self._stats.failed += 1
+            return
+        with self._cond:
+            self._stats.batches += 1
+            self._stats.messages += len(batch)
+            if full:
+                self._stats.flushed_full += 1
+            else:
+                self._stats.flushed_delay += 1
+            n = len(batch)
+            self._stats.batch_sizes[n] = self._stats.batch_sizes.get(n, 0) + 1
+
+
+class InboxPolicy(str, enum.Enum):
+    """InboxPolicy.
+    What a full subscriber inbox does with a new message.
+
+    - BLOCK: Wait for room, blocking the transport thread (backpressure)
+    - DROP_OLDEST: Drop the oldest queued message
+    - DROP_NEWEST: Drop the new message
+    - KEEP_LATEST: Drop all queued messages
+    """
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    KEEP_LATEST = "keep_latest"
+
+
+class InboxStats(BaseModel):
+    """InboxStats.
+    Statistics of a subscriber inbox.
+    """
+
+    depth: int = 0
+    max_depth: int = 0
+    received: int = 0
+    delivered: int = 0
+    dropped: int = 0
+
+
+class Inbox:
+    """Inbox.
+    Bounded queue between a transport thread, which receives messages, and
+    a worker thread, which handles them. Queued items are calls, e.g. to
+    decode a raw message and pass it to the callback of a subscriber.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        policy: InboxPolicy = InboxPolicy.BLOCK,
+        name: str = "",
+    ):
+        """__init__.
+
+        Args:
+            maxsize (int): Maximum number of queued messages
+            policy (InboxPolicy): What to do with new messages when full
+            name (str): Name of the worker thread
+        """
+        self._maxsize = max(1, maxsize)
+        self._policy = InboxPolicy(policy)
+        self._queue = self._make_queue()
+        self._cond = threading.Condition()
+        self._stats = InboxStats()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name=f"inbox-{name}", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def policy(self) -> InboxPolicy:
+        return self._policy
+
+    @property
+    def stats(self) -> InboxStats:
+        with self._cond:
+            self._stats.depth = len(self._queue)
+            return self._stats.model_copy()
+
+    def put(self, fn: Callable, *args) -> bool:
+        """put.
+        Queue a call to fn(*args).
+
+        Args:
+            fn (Callable): Handler of the message
+            args: Arguments of the handler (the raw message)
+
+        Returns:
+            bool: False if the message was dropped
+        """
+        with self._cond:
+            self._stats.received += 1
+            if len(self._queue) >= self._maxsize:
+                if self._policy == InboxPolicy.BLOCK:
+                    while self._running and len(self._queue) >= self._maxsize:
+                        self._cond.wait()
+                elif self._policy == InboxPolicy.DROP_OLDEST:
+                    self._queue.popleft()
+                    self._stats.dropped += 1
+                elif self._policy == InboxPolicy.DROP_NEWEST:
+                    self._stats.dropped += 1
+                    return False
+                else:
+                    self._stats.dropped += len(self._queue)
+                    self._queue.clear()
+            if not self._running:
+                return False
+            self._queue.append((fn, args))
+            self._stats.max_depth = max(self._stats.max_depth, len(self._queue))
+            self._cond.notify_all()
+        return True
+
+    def _make_queue(self) -> Any:
+        return deque()
+
+    def _pop(self) -> Tuple[Callable, Tuple]:
+        return self._queue.popleft()
+
+    def stop(self) -> None:
+        """stop.
+        Stop the worker thread. Queued messages are discarded.
+        """
+        with self._cond:
+            self._running = False
+            self._queue.clear()
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and len(self._queue) == 0:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                fn, args = self._pop()
+                self._stats.delivered += 1
+                # Wake up blocked producers
+                self._cond.notify_all()
+            try:
+                fn(*args)
+            except Exception:
+                BaseSubscriber.logger().error(
+                    "Exception caught in inbox handler", exc_info=True
+                )
+
+
+class ConflatingInbox(Inbox):
+    """ConflatingInbox.
+    Inbox which keeps only the latest message per key. A newer message
+    replaces the queued one, at its position in the queue. Messages are
+    handled (decoded) only once the worker is ready for them, so a slow
+    consumer always gets the latest message.
+    """
+
+    def __init__(self, key: Callable, name: str = ""):
+        """__init__.
+
+        Args:
+            key (Callable): Returns the key of a (raw) message
+            name (str): Name of the worker thread
+        """
+        self._key = key
+        super().__init__(1, InboxPolicy.KEEP_LATEST, name=name)
+
+    def put(self, fn: Callable, *args) -> bool:
+        """put.
+        Queue a call to fn(*args), replacing the queued call with the same
+        key.
+
+        Args:
+            fn (Callable): Handler of the message
+            args: Arguments of the handler (the raw message)
+
+        Returns:
+            bool: True
+        """
+        key = self._key(*args)
+        with self._cond:
+            self._stats.received += 1
+            if not self._running:
+                return False
+            if key in self._queue:
+                self._stats.dropped += 1
+            self._queue[key] = (fn, args)
+            self._stats.max_depth = max(self._stats.max_depth, len(self._queue))
+            self._cond.notify_all()
+        return True
+
+    def _make_queue(self) -> Any:
+        return {}
+
+    def _pop(self) -> Tuple[Callable, Tuple]:
+        return self._queue.pop(next(iter(self._queue)))
+
+
+class DispatchPolicy(str, enum.Enum):
+    """DispatchPolicy.
+    Where subscriber callbacks run.
+
+    - INLINE: On the thread which received the message
+    - POOLED: On a pool of workers, in any order
+    - ORDERED: On a pool of workers. Messages with the same key run on the
+      same worker, in order.
+    """
+
+    INLINE = "inline"
+    POOLED = "pooled"
+    ORDERED = "pooled-ordered-by-key"
+
+
+class Dispatcher:
+    """Dispatcher.
+    Runs callbacks according to a dispatch policy, on its own pool of
+    workers or on a shared executor. In ordered mode, messages are queued in
+    one of `workers` lanes by key, and each lane is drained by at most one
+    worker at a time. At most two callbacks per worker are pending, further
+    dispatches wait (backpressure to the inbox or transport thread).
+    """
+
+    def __init__(
+        self,
+        policy: DispatchPolicy = DispatchPolicy.INLINE,
+        workers: int = 2,
+        key: Optional[Union[str, Callable]] = None,
+        name: str = "",
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        """__init__.
+
+        Args:
+            policy (DispatchPolicy): The dispatch policy
+            workers (int): Number of workers (or lanes, in ordered mode)
+            key (Optional[Union[str, Callable]]): Key of messages in ordered
+                mode. Either a field name or a function of the callback
+                arguments. The topic (second callback argument, if any) by
+                default.
+            name (str): Prefix of the names of worker threads
+            executor (Optional[ThreadPoolExecutor]): Shared executor to run
+                callbacks on. A pool of `workers` threads is created if not
+                given.
+        """
+        self._policy = DispatchPolicy(policy)
+        self._workers = max(1, workers)
+        self._key = key
+        self._pool = None
+        self._own_pool = False
+        self._slots = None
+        self._running = True
+        if self._policy != DispatchPolicy.INLINE:
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix=f"dispatch-{name}"
+                )
+                self._own_pool = True
+            self._pool = executor
+            self._slots = threading.BoundedSemaphore(2 * self._workers)
+        self._lanes = [deque() for _ in range(self._workers)]
+        self._draining = [False] * self._workers
+        self._lock = threading.Lock()
+
+    @property
+    def policy(self) -> DispatchPolicy:
+        return self._policy
+
+    def wrap(self, callback: Optional[Callable]) -> Optional[Callable]:
+        """wrap.
+        Wrap a callback, to dispatch its calls.
+
+        Args:
+            callback (Optional[Callable]): The callback
+        """
+        if callback is None or self._policy == DispatchPolicy.INLINE:
+            return callback
+        return functools.partial(self.dispatch, callback)
+
+    def dispatch(self, callback: Callable, *args) -> None:
+        """dispatch.
+        Call callback(*args) according to the dispatch policy.
+
+        Args:
+            callback (Callable): The callback
+            args: Arguments of the callback
+        """
+        if self._policy == DispatchPolicy.INLINE:
+            callback(*args)
+            return
+        if not self._running:
+            return
+        self._slots.acquire()
+        try:
+            if self._policy == DispatchPolicy.POOLED:
+                self._pool.submit(self._run, callback, args)
+                return
+            lane = hash(self._get_key(args)) % self._workers
+            with self._lock:
+                self._lanes[lane].append((callback, args))
+                if self._draining[lane]:
+                    return
+                self._draining[lane] = True
+            self._pool.submit(self._drain, lane)
+        except RuntimeError:
+            # The executor is shut down
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        """shutdown.
+        Stop dispatching. Pending callbacks are discarded. A shared executor
+        is left running.
+        """
+        self._running = False
+        with self._lock:
+            for lane in self._lanes:
+                lane.clear()
+        if self._own_pool:
+            if sys.version_info >= (3, 9):
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                # Callbacks still queued in the pool are skipped by _run()
+                self._pool.shutdown(wait=False)
+
+    def _get_key(self, args: Tuple) -> Any:
+        if self._key is None:
+            return args[1] if len(args) > 1 else None
+        elif callable(self._key):
+            return self._key(*args)
+        elif isinstance(args[0], dict):
+            return args[0].get(self._key)
+        return getattr(args[0], self._key, None)
+
+    def _drain(self, lane: int) -> None:
+        while True:
+            with self._lock:
+                if len(self._lanes[lane]) == 0 or not self._running:
+                    self._draining[lane] = False
+                    return
+                callback, args = self._lanes[lane].popleft()
+            self._run(callback, args)
+
+    def _run(self, callback: Callable, args: Tuple) -> None:
+        try:
+            if self._running:
+                callback(*args)
+        except Exception:
+            BaseSubscriber.logger().error(
+                "Exception caught in subscriber callback", exc_info=True
+            )
+        finally:
+            self._slots.release()
+
+
 class BasePublisher(BaseEndpoint):
     """BasePublisher."""
 
@@ -22,23 +499,55 @@ class BasePublisher(BaseEndpoint):
             pubsub_logger = logging.getLogger(__name__)
         return pubsub_logger
 
-    def __init__(self, topic: str, msg_type: PubSubMessage = None, *args, **kwargs):
+    def __init__(
+        self,
+        topic: str,
+        msg_type: PubSubMessage = None,
+        *args,
+        max_batch: int = 0,
+        max_delay_ms: float = 5.0,
+        **kwargs,
+    ):
         """__init__.
 
         Args:
             topic (str): topic
             msg_type (PubSubMessage): msg_type
+            max_batch (int): Enables micro-batching if greater than 1.
+                Published messages are then sent in the background, in
+                batches of up to max_batch messages (see publish_batch()).
+            max_delay_ms (float): Maximum time (ms) a micro-batched message
+                waits for its batch to fill
         """
         super().__init__(*args, **kwargs)
         self._topic = topic
         self._msg_type = msg_type
         self._gen_random_id = gen_random_id
+        self._batcher = None
+        if max_batch > 1:
+            self._batcher = MicroBatcher(
+                self.publish_batch, max_batch, max_delay_ms, name=topic
+            )
 
     @property
     def topic(self) -> str:
         """topic"""
         return self._topic
 
+    @property
+    def compression_stats(self) -> Optional[CompressionStats]:
+        """Statistics of the compression policy. None for fixed compression."""
+        if isinstance(self._compression, CompressionPolicy):
+            return self._compression.stats
+        return None
+
+    @property
+    def batch_stats(self) -> Optional[BatchStats]:
+        """Statistics of micro-batching. None if not enabled."""
+        if self._batcher is not None:
+            return self._batcher.stats
+        return None
+
     def publish(self, msg: PubSubMessage) -> None:
         """publish.
 
@@ -50,11 +559,41 @@ class BasePublisher(BaseEndpoint):
         """
         raise NotImplementedError()
 
+    def publish_batch(self, msgs: List[PubSubMessage]) -> None:
+        """publish_batch.
+        Publish a batch of messages. Transports send the batch in as few
+        broker round trips as possible.
+
+        Args:
+            msgs (List[PubSubMessage]): Messages to publish, in order
+
+        Returns:
+            None:
+        """
+        for msg in msgs:
+            self.publish(msg)
+
+    def _check_msg(self, msg: PubSubMessage) -> Any:
+        # Typed messages are encoded by the serializer, using the compiled
+        # encoder of their type.
+        if self._msg_type is not None and not isinstance(msg, PubSubMessage):
+            raise ValueError('Argument "msg" must be of type PubSubMessage')
+        return msg
+
+    def _batch(self, item: Any) -> bool:
+        # Queue a published message in micro-batching mode
+        if self._batcher is None:
+            return False
+        self._batcher.add(item)
+        return True
+
     def run(self):
         if self._transport is not None:
             self._transport.start()
 
     def stop(self) -> None:
+        if self._batcher is not None:
+            self._batcher.stop()
         if self._transport is not None:
             self._transport.stop()
 
@@ -65,6 +604,9 @@ class BasePublisher(BaseEndpoint):
 class BaseSubscriber(BaseEndpoint):
     """BaseSubscriber."""
 
+    # Set by transports which receive messages in batches (on_messages)
+    NATIVE_BATCHING = False
+
     @classmethod
     def logger(cls) -> logging.Logger:
         global pubsub_logger
@@ -78,7 +620,18 @@ class BaseSubscriber(BaseEndpoint):
         msg_type: Optional[PubSubMessage] = None,
         on_message: Optional[Callable] = None,
         *args,
-        **kwargs
+        lazy: bool = False,
+        projection: Optional[List[str]] = None,
+        on_messages: Optional[Callable] = None,
+        max_batch: int = 100,
+        max_wait: float = 0.05,
+        inbox_size: int = 0,
+        inbox_policy: InboxPolicy = InboxPolicy.BLOCK,
+        conflate: bool = False,
+        dispatch: DispatchPolicy = DispatchPolicy.INLINE,
+        workers: int = 2,
+        dispatch_key: Optional[Union[str, Callable]] = None,
+        **kwargs,
     ):
         """__init__.
 
@@ -86,16 +639,72 @@ class BaseSubscriber(BaseEndpoint):
             topic (str): topic
             msg_type (PubSubMessage): msg_type
             on_message (callable): on_message
+            lazy (bool): Deliver LazyMessage views, which validate fields on
+                first access, instead of fully validated messages.
+            projection (Optional[List[str]]): Fields of the message to keep.
+                The rest of the payload is dropped without being validated.
+                Implies lazy for typed subscribers.
+            on_messages (callable): Batch callback, called with lists of
+                messages instead of on_message. Pattern-based subscribers
+                pass lists of (message, topic) pairs.
+            max_batch (int): Maximum number of messages per batch
+            max_wait (float): Maximum time (seconds) a received message
+                waits for its batch to fill
+            inbox_size (int): If set, received messages are queued, up to
+                inbox_size messages, and handled on a separate thread.
+                Otherwise, they are handled on the transport thread.
+            inbox_policy (InboxPolicy): What to do with received messages
+                when the inbox is full
+            conflate (bool): Keep only the latest received message (per
+                topic for pattern-based subscribers), and decode it only
+                when the callback is ready for it. Messages are handled on
+                a separate thread. Overrides inbox_size.
+            dispatch (DispatchPolicy): Where on_message callbacks run.
+                Inline (default), on a pool of workers, or on a pool of
+                workers which keeps the order of messages with the same key.
+            workers (int): Number of workers of pooled dispatch
+            dispatch_key (Optional[Union[str, Callable]]): Key of messages
+                for ordered dispatch. A message field, or a function of the
+                callback arguments. Defaults to the topic, for pattern-based
+                subscribers.
         """
         super().__init__(*args, **kwargs)
         self._topic = topic
         self._msg_type = msg_type
-        self.onmessage = on_message
+        self._dispatcher = Dispatcher(
+            dispatch,
+            workers,
+            dispatch_key,
+            name=topic,
+            executor=self._shared_executor,
+        )
+        self.onmessage = self._dispatcher.wrap(on_message)
+        self._lazy = lazy
+        self._projection = projection
+        self.onmessages = on_messages
+        self._max_batch = max_batch
+        self._max_wait = max_wait
         self._gen_random_id = gen_random_id
+        # Transports without a native bulk receive gather batches in the
+        # background
+        self._batcher = None
+        if on_messages is not None and not self.NATIVE_BATCHING:
+            self._batcher = MicroBatcher(
+                self._on_batch, max_batch, max_wait * 1000, name=topic
+            )
+
+        self._inbox = None
+        if conflate:
+            if on_messages is not None:
+                raise ValueError("Conflating subscribers deliver single messages")
+            self._inbox = ConflatingInbox(self._conflation_key, name=topic)
+        elif inbox_size > 0:
+            self._inbox = Inbox(inbox_size, inbox_policy, name=topic)
 
-        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._executor = None
         self._main_thread = None
-        self._t_stop_event = None
+        # Created once, so that a stop() is never missed by run_forever()
+        self._t_stop_event = threading.Event()
 
     @property
     def topic(self) -> str:
@@ -104,9 +713,18 @@ class BaseSubscriber(BaseEndpoint):
 
     @property
     def executor(self) -> ThreadPoolExecutor:
-        """topic"""
+        """executor"""
+        if self._executor is None:
+            self._executor = self._get_executor(2)
         return self._executor
 
+    @property
+    def inbox_stats(self) -> Optional[InboxStats]:
+        """Statistics of the inbox. None if messages are handled inline."""
+        if self._inbox is not None:
+            return self._inbox.stats
+        return None
+
     def run_forever(self) -> None:
         """run_forever.
         Start subscriber thread in background and blocks main thread.
@@ -129,17 +747,81 @@ class BaseSubscriber(BaseEndpoint):
         """
         raise NotImplementedError()
 
+    def _make_msg(self, data: Dict[str, Any]) -> Any:
+        """_make_msg.
+        Build the message passed to the on_message callback from the
+        deserialized payload.
+
+        Args:
+            data (Dict[str, Any]): Deserialized payload
+        """
+        if self._msg_type is None:
+            if self._projection is not None:
+                return {k: data[k] for k in self._projection if k in data}
+            return data
+        elif self._lazy or self._projection is not None:
+            return LazyMessage(self._msg_type, data, self._projection)
+        return self._build_msg(self._msg_type, data)
+
+    def _receive(self, handler: Callable, *args) -> None:
+        """_receive.
+        Called by the transport thread with a raw received message. The
+        handler decodes the message and passes it to the callback, either
+        inline or from the inbox.
+
+        Args:
+            handler (Callable): Handler of the message
+            args: The raw message
+        """
+        if self._inbox is None:
+            handler(*args)
+        else:
+            self._inbox.put(handler, *args)
+
+    def _conflation_key(self, *args) -> Any:
+        """_conflation_key.
+        Key of a raw received message, for conflation. Messages with the
+        same key replace each other. Pattern-based subscribers key messages
+        by topic.
+
+        Args:
+            args: The raw message
+        """
+        return None
+
+    def _on_batch(self, msgs: List[Any]) -> None:
+        """_on_batch.
+        Pass a batch of messages to the on_messages callback.
+
+        Args:
+            msgs (List[Any]): Messages (or (message, topic) pairs)
+        """
+        if len(msgs) == 0:
+            return
+        try:
+            self.onmessages(msgs)
+        except Exception:
+            self.log.error("Exception caught in on_messages", exc_info=True)
+
     def run(self) -> None:
         """Execute subscriber in a separate thread."""
         self._main_thread = threading.Thread(target=self.run_forever)
         self._main_thread.daemon = True
-        self._t_stop_event = threading.Event()
         self._main_thread.start()
 
+    def _stop_delivery(self) -> None:
+        # Stop the inbox, batcher and dispatch workers
+        if self._inbox is not None:
+            self._inbox.stop()
+        if self._batcher is not None:
+            self._batcher.stop()
+        self._dispatcher.shutdown()
+
     def stop(self) -> None:
-        if self._t_stop_event is not None:
-            self._t_stop_event.set()
-        self._transport.stop()
+        self._stop_delivery()
+        self._t_stop_event.set()
+        if self._transport is not None:
+            self._transport.stop()
 
     def __del__(self):
         self.stop()
@@ -1,13 +1,16 @@
+import heapq
 import logging
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import time
+from concurrent.futures import Future
 from functools import partial
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel
 
 from commlib.connection import BaseConnectionParameters
 from commlib.endpoints import BaseEndpoint
+from commlib.exceptions import RPCClientError, RPCClientTimeoutError
 from commlib.msg import RPCMessage
 from commlib.serializer import JSONSerializer, Serializer
 from commlib.utils import gen_random_id, gen_timestamp
@@ -21,6 +24,7 @@ class CommRPCHeader(BaseModel):
     content_type: Optional[str] = "json"
     encoding: Optional[str] = "utf8"
     agent: Optional[str] = "commlib"
+    correlation_id: Optional[str] = None
 
 
 class CommRPCMessage(BaseModel):
@@ -28,6 +32,149 @@ class CommRPCMessage(BaseModel):
     data: Dict[str, Any] = {}
 
 
+class PendingCalls:
+    """PendingCalls.
+    Calls of an RPC client in flight, by correlation id. Each call is a
+    future of its raw response, resolved by the thread which receives
+    responses (e.g. the I/O thread of a connection). Callbacks of these
+    futures must only hand responses over to other threads. Calls with a
+    timeout fail with RPCClientTimeoutError, from a timer thread which is
+    started with the first of them.
+    """
+
+    def __init__(self, name: str = ""):
+        """__init__.
+
+        Args:
+            name (str): Name of the timer thread
+        """
+        self._name = name
+        # Correlation id -> (future, send time)
+        self._calls: Dict[str, Tuple[Future, float]] = {}
+        # Heap of (deadline, correlation id, timeout)
+        self._deadlines: List[Tuple[float, str, float]] = []
+        self._cond = threading.Condition()
+        self._timer = None
+        self._running = True
+        self._delay = 0.0
+
+    @property
+    def delay(self) -> float:
+        """Round trip time (seconds) of the last resolved call."""
+        return self._delay
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._calls)
+
+    def add(self, corr_id: str, timeout: Optional[float] = None) -> Future:
+        """add.
+        Add a call.
+
+        Args:
+            corr_id (str): Correlation id of the request
+            timeout (Optional[float]): Fail the call after timeout seconds.
+                Callers which wait for the response themselves pass None,
+                and discard() the call if they give up.
+
+        Returns:
+            Future: Future of the raw response
+        """
+        future = Future()
+        # Running futures can not be cancelled
+        future.set_running_or_notify_cancel()
+        now = time.monotonic()
+        with self._cond:
+            self._calls[corr_id] = (future, now)
+            if timeout is None or not self._running:
+                return future
+            heapq.heappush(self._deadlines, (now + timeout, corr_id, timeout))
+            if self._timer is None:
+                self._timer = threading.Thread(
+                    target=self._run, name=f"rpc-timer-{self._name}", daemon=True
+                )
+                self._timer.start()
+            elif self._deadlines[0][1] == corr_id:
+                self._cond.notify()
+        return future
+
+    def resolve(self, corr_id: Optional[str], response: Any) -> bool:
+        """resolve.
+        Resolve a call with its raw response.
+
+        Args:
+            corr_id (Optional[str]): Correlation id of the response
+            response (Any): The raw response
+
+        Returns:
+            bool: False if there is no such call, e.g. it timed out. Responses
+                without a correlation id are dropped.
+        """
+        if corr_id is None:
+            return False
+        with self._cond:
+            entry = self._pop(corr_id)
+        if entry is None:
+            return False
+        future, start_t = entry
+        self._delay = time.monotonic() - start_t
+        future.set_result(response)
+        return True
+
+    def discard(self, corr_id: str) -> None:
+        """discard.
+        Forget a call, e.g. when its caller stops waiting for it.
+
+        Args:
+            corr_id (str): Correlation id of the request
+        """
+        with self._cond:
+            self._pop(corr_id)
+
+    def stop(self) -> None:
+        """stop.
+        Stop the timer thread. Calls in flight fail with RPCClientError.
+        """
+        with self._cond:
+            self._running = False
+            calls = list(self._calls.values())
+            self._calls.clear()
+            self._deadlines = []
+            self._cond.notify()
+        for future, _ in calls:
+            future.set_exception(RPCClientError("RPC client stopped"))
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join()
+
+    def _pop(self, corr_id: str) -> Optional[Tuple[Future, float]]:
+        entry = self._calls.pop(corr_id, None)
+        if entry is not None and len(self._deadlines) > 2 * len(self._calls) + 16:
+            # Drop the deadlines of completed calls, once they are the
+            # majority of the heap
+            self._deadlines = [d for d in self._deadlines if d[1] in self._calls]
+            heapq.heapify(self._deadlines)
+        return entry
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and len(self._deadlines) == 0:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                deadline, corr_id, timeout = self._deadlines[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._deadlines)
+                entry = self._calls.pop(corr_id, None)
+            if entry is not None:
+                entry[0].set_exception(
+                    RPCClientTimeoutError(f"Response timeout after {timeout} seconds")
+                )
+
+
 class BaseRPCServer(BaseEndpoint):
     @classmethod
     def logger(cls) -> logging.Logger:
@@ -49,10 +196,12 @@ class BaseRPCServer(BaseEndpoint):
         self._svc_map = svc_map
         self._max_workers = workers
         self._gen_random_id = gen_random_id
-        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._executor = self._get_executor(self._max_workers)
         self._main_thread = None
-        self._t_stop_event = None
+        self._t_stop_event = threading.Event()
         self._comm_obj = CommRPCMessage()
+        self._comm_obj.header.content_type = self._serializer.CONTENT_TYPE
+        self._comm_obj.header.encoding = self._serializer.CONTENT_ENCODING
 
     def run_forever(self):
         """run_forever.
@@ -66,10 +215,10 @@ class BaseRPCServer(BaseEndpoint):
         """
         self._main_thread = threading.Thread(target=self.run_forever)
         self._main_thread.daemon = True
-        self._t_stop_event = threading.Event()
         self._main_thread.start()
 
     def stop(self) -> None:
+        self._t_stop_event.set()
         self._transport.stop()
 
 
@@ -95,7 +244,7 @@ class BaseRPCService(BaseEndpoint):
         on_request: Callable = None,
         workers: int = 5,
         *args,
-        **kwargs
+        **kwargs,
     ):
         """__init__.
 
@@ -111,10 +260,12 @@ class BaseRPCService(BaseEndpoint):
         self.on_request = on_request
         self._gen_random_id = gen_random_id
         self._max_workers = workers
-        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._executor = self._get_executor(self._max_workers)
         self._main_thread = None
-        self._t_stop_event = None
+        self._t_stop_event = threading.Event()
         self._comm_obj = CommRPCMessage()
+        self._comm_obj.header.content_type = self._serializer.CONTENT_TYPE
+        self._comm_obj.header.encoding = self._serializer.CONTENT_ENCODING
 
     def _serialize_data(self, payload: Dict[str, Any]) -> str:
         return self._serializer.serialize(payload)
@@ -141,15 +292,13 @@ class BaseRPCService(BaseEndpoint):
         """
         self._main_thread = threading.Thread(target=self.run_forever)
         self._main_thread.daemon = True
-        self._t_stop_event = threading.Event()
         self._main_thread.start()
 
     def stop(self):
         """stop.
         Stop the RPC Service.
         """
-        if self._t_stop_event is not None:
-            self._t_stop_event.set()
+        self._t_stop_event.set()
         if self._transport is not None:
             self._transport.stop()
 
@@ -162,6 +311,8 @@ class BaseRPCClient(BaseEndpoint):
     Inherit to implement transport-specific RPCClient.
     """
 
+    _pending_calls: PendingCalls = None
+
     @classmethod
     def logger(cls) -> logging.Logger:
         global rpc_logger
@@ -175,7 +326,7 @@ class BaseRPCClient(BaseEndpoint):
         msg_type: RPCMessage = None,
         workers: int = 5,
         *args,
-        **kwargs
+        **kwargs,
     ):
         """__init__.
 
@@ -188,8 +339,11 @@ class BaseRPCClient(BaseEndpoint):
         self._msg_type = msg_type
         self._gen_random_id = gen_random_id
         self._max_workers = workers
-        self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        self._executor = self._get_executor(self._max_workers)
+        self._pending_calls = PendingCalls(name=rpc_name)
         self._comm_obj = CommRPCMessage()
+        self._comm_obj.header.content_type = self._serializer.CONTENT_TYPE
+        self._comm_obj.header.encoding = self._serializer.CONTENT_ENCODING
 
     def call(
         self, msg: RPCMessage.Request, timeout: float = 30.0
@@ -240,6 +394,49 @@ class BaseRPCClient(BaseEndpoint):
                 on_response(result)
                 return result
 
+    def _response_future(
+        self, call: Future, on_response: Optional[Callable] = None
+    ) -> Future:
+        """_response_future.
+        Future of the response of an asynchronous call, for transports
+        which route responses to PendingCalls. The raw response is parsed,
+        and on_response is called, on the executor of the client, so that
+        callbacks (which may make calls of their own) never block the thread
+        which receives responses.
+
+        Args:
+            call (Future): The call (see PendingCalls.add())
+            on_response (Optional[Callable]): Called with the response
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        if on_response is not None:
+            future.add_done_callback(partial(self._done_callback, on_response))
+        call.add_done_callback(partial(self._complete_async, future))
+        return future
+
+    def _complete_async(self, future: Future, call: Future) -> None:
+        try:
+            self._executor.submit(self._complete_response, future, call)
+        except RuntimeError:
+            # The executor is shut down
+            self._complete_response(future, call)
+
+    def _complete_response(self, future: Future, call: Future) -> None:
+        try:
+            future.set_result(self._parse_response(call.result()))
+        except Exception as exc:
+            future.set_exception(exc)
+
+    def _parse_response(self, response: Any) -> Any:
+        """_parse_response.
+        Build the response of a call from its raw received response.
+
+        Args:
+            response (Any): The raw response
+        """
+        return response
+
     def _serialize_data(self, payload: Dict[str, Any]) -> str:
         return self._serializer.serialize(payload)
 
@@ -251,6 +448,8 @@ class BaseRPCClient(BaseEndpoint):
             self._transport.start()
 
     def stop(self) -> None:
+        if self._pending_calls is not None:
+            self._pending_calls.stop()
         if self._transport is not None:
             self._transport.stop()
 
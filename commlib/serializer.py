@@ -16,8 +16,26 @@
 
 import abc
 import enum
+import struct
+import threading
 from decimal import Decimal
-from typing import Any, Dict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from pydantic import BaseModel
+
+from commlib.exceptions import SerializationError
+from commlib.msg import model_type_of
 
 DEFAULT_JSON_SERIALIZER = "ujson"
 
@@ -29,15 +47,43 @@ elif DEFAULT_JSON_SERIALIZER == "ujson":
 elif DEFAULT_JSON_SERIALIZER == "orjson":
     import orjson as json
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Layout of payloads carrying out-of-band buffers (numpy arrays):
+#   magic (4s) | number of buffers (I) | body length (Q)
+#   buffer lengths (Q each) | body | buffers
+# The body and every buffer start at an 8-byte aligned offset. 0xC1 is
+# never used by msgpack, and can not start a JSON or a CBOR map payload.
+OOB_MAGIC = b"\xc1OOB"
+NDARRAY_KEY = "__ndarray__"
+_OOB_HEADER = struct.Struct("<4sIQ")
+
 
 class SerializationTypes(enum.IntEnum):
     JSON = 0
+    MSGPACK = 1
+    CBOR = 2
 
 
 class ContentType:
     """Content Types."""
 
     json: str = "application/json"
+    msgpack: str = "application/msgpack"
+    cbor: str = "application/cbor"
     raw_bytes: str = "application/octet-stream"
     text: str = "plain/text"
 
@@ -47,6 +93,7 @@ class Serializer(abc.ABC):
 
     CONTENT_TYPE: str = "None"
     CONTENT_ENCODING: str = "None"
+    SERIALIZATION_TYPE: int = -1
 
     @staticmethod
     def serialize(data: Any) -> str:
@@ -66,6 +113,76 @@ class Serializer(abc.ABC):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def dumps(cls, data: Any) -> Union[str, bytes]:
+        """dumps.
+        Encode data, already converted to primitives. Falls back to
+        serialize(), for serializers that only implement serialize() and
+        deserialize().
+
+        Args:
+            data (Any): -
+        """
+        return cls.serialize(data)
+
+    @classmethod
+    def loads(cls, data: Union[bytes, memoryview]) -> Any:
+        """loads.
+        Falls back to deserialize().
+
+        Args:
+            data (Union[bytes, memoryview]): -
+        """
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return cls.deserialize(data)
+
+    @classmethod
+    def serialize_bytes(cls, data: Any) -> bytes:
+        """serialize_bytes.
+        Serialize straight to bytes, ready to be handed to broker clients.
+        Numpy arrays are carried out-of-band, next to the encoded body.
+
+        Args:
+            data (Any): Data to serialize
+        """
+        parts = cls.serialize_parts(data)
+        if len(parts) == 1:
+            return parts[0]
+        return b"".join(parts)
+
+    @classmethod
+    def serialize_parts(cls, data: Any) -> List[Any]:
+        """serialize_parts.
+        Serialize to a list of bytes-like parts, which make up the payload
+        of serialize_bytes() once joined. Out-of-band buffers are returned
+        as views, so that callers can join (or compress) them with a
+        single copy.
+
+        Args:
+            data (Any): Data to serialize
+        """
+        buffers = []
+        payload = cls.dumps(encode_message(data, buffers))
+        if isinstance(payload, str):
+            payload = payload.encode(cls.CONTENT_ENCODING)
+        if len(buffers) > 0:
+            return buffer_parts(payload, buffers)
+        return [payload]
+
+    @classmethod
+    def deserialize_bytes(cls, data: Union[bytes, memoryview]) -> Any:
+        """deserialize_bytes.
+        Deserialize from bytes, as received from broker clients.
+
+        Args:
+            data (Union[bytes, memoryview]): -
+        """
+        if bytes(data[:4]) == OOB_MAGIC:
+            body, buffers = unpack_buffers(data)
+            return _restore_ndarrays(cls.loads(body), buffers)
+        return cls.loads(data)
+
 
 class JSONSerializer(Serializer):
     """Thin wrapper to implement json serializer.
@@ -75,15 +192,39 @@ class JSONSerializer(Serializer):
 
     CONTENT_TYPE: str = ContentType.json
     CONTENT_ENCODING: str = "utf8"
+    SERIALIZATION_TYPE: int = SerializationTypes.JSON
 
     @staticmethod
-    def serialize(data: Dict[str, Any]) -> str:
+    def serialize(data: Union[Dict[str, Any], BaseModel]) -> str:
         """serialize.
 
         Args:
-            data (dict): Serialize to json string
+            data (Union[dict, BaseModel]): Serialize to json string
         """
-        return str(json.dumps(JSONSerializer.make_primitives(data)))
+        payload = json.dumps(encode_message(data))
+        if isinstance(payload, bytes):
+            payload = payload.decode(JSONSerializer.CONTENT_ENCODING)
+        return payload
+
+    @staticmethod
+    def dumps(data: Dict[str, Any]) -> Union[str, bytes]:
+        """dumps.
+
+        Args:
+            data (dict): Primitives to json
+        """
+        return json.dumps(data)
+
+    @staticmethod
+    def loads(data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        """loads.
+
+        Args:
+            data (Union[bytes, memoryview]): json bytes to dict
+        """
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
 
     @staticmethod
     def deserialize(data: str) -> Dict[str, Any]:
@@ -95,11 +236,11 @@ class JSONSerializer(Serializer):
         return json.loads(data)
 
     @staticmethod
-    def make_primitive_value(val: Any):
+    def make_primitive_value(val: Any, buffers: Optional[List[Any]] = None):
         if isinstance(val, dict):
-            return JSONSerializer.make_primitives(val)
+            return JSONSerializer.make_primitives(val, buffers)
         elif isinstance(val, list) or isinstance(val, tuple):
-            return list([JSONSerializer.make_primitive_value(v) for v in val])
+            return list([JSONSerializer.make_primitive_value(v, buffers) for v in val])
         elif isinstance(val, Decimal) or isinstance(val, float):
             return float(val)
         elif isinstance(val, int) and str(val).isdigit():
@@ -108,11 +249,565 @@ class JSONSerializer(Serializer):
             return bool(val)
         elif val is None:
             return None
+        elif np is not None and isinstance(val, np.ndarray):
+            return _encode_ndarray(val, buffers)
+        elif np is not None and isinstance(val, np.generic):
+            return val.item()
         else:
             return str(val)
 
     @staticmethod
-    def make_primitives(data: Dict[str, Any]):
+    def make_primitives(data: Dict[str, Any], buffers: Optional[List[Any]] = None):
         for key, val in data.items():
-            data[key] = JSONSerializer.make_primitive_value(val)
+            data[key] = JSONSerializer.make_primitive_value(val, buffers)
         return data
+
+
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
+# Field kinds of compiled encoder plans. Primitive fields are left out of
+# the plan, as their values need no conversion.
+_FIELD_ANY = 0
+_FIELD_MODEL = 1
+_FIELD_MODEL_LIST = 2
+
+_encoders: Dict[type, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+_plans: Dict[type, List[Tuple[str, int, Any]]] = {}
+# Plans are compiled under _plans_lock, and published to _plans once
+# complete. _building holds the incomplete plans of the compiling thread.
+_plans_lock = threading.RLock()
+_building: Dict[type, List[Tuple[str, int, Any]]] = {}
+
+
+def _is_primitive_type(annotation: Any) -> bool:
+    if annotation in _PRIMITIVE_TYPES:
+        return True
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is Union:
+        return all(_is_primitive_type(arg) for arg in args)
+    elif origin in (list, List) and args:
+        return _is_primitive_type(args[0])
+    elif origin in (dict, Dict) and len(args) == 2:
+        return args[0] is str and _is_primitive_type(args[1])
+    return False
+
+
+def _compile_plan(msg_type: Type[BaseModel]) -> List[Tuple[str, int, Any]]:
+    plan = _plans.get(msg_type)
+    if plan is not None:
+        return plan
+    with _plans_lock:
+        plan = _plans.get(msg_type, _building.get(msg_type))
+        if plan is not None:
+            # Compiled by another thread, or a self-referencing model
+            return plan
+        outermost = len(_building) == 0
+        plan = []
+        # Register before walking the fields, to support self-referencing
+        # models
+        _building[msg_type] = plan
+        try:
+            _fill_plan(msg_type, plan)
+            if outermost:
+                # Nested plans may refer to this one: publish them together
+                _plans.update(_building)
+        finally:
+            if outermost:
+                _building.clear()
+    return plan
+
+
+def _fill_plan(msg_type: Type[BaseModel], plan: List[Tuple[str, int, Any]]):
+    for name, field in msg_type.model_fields.items():
+        annotation = field.annotation
+        if _is_primitive_type(annotation):
+            continue
+        model = model_type_of(annotation)
+        if model is not None:
+            plan.append((name, _FIELD_MODEL, _compile_plan(model)))
+            continue
+        if get_origin(annotation) in (list, List) and get_args(annotation):
+            model = model_type_of(get_args(annotation)[0])
+            if model is not None:
+                plan.append((name, _FIELD_MODEL_LIST, _compile_plan(model)))
+                continue
+        plan.append((name, _FIELD_ANY, None))
+
+
+def _apply_plan(
+    plan: List[Tuple[str, int, Any]],
+    data: Dict[str, Any],
+    buffers: Optional[List[Any]] = None,
+):
+    for key, kind, subplan in plan:
+        val = data.get(key)
+        if val is None:
+            continue
+        elif kind == _FIELD_ANY:
+            data[key] = JSONSerializer.make_primitive_value(val, buffers)
+        elif kind == _FIELD_MODEL:
+            _apply_plan(subplan, val, buffers)
+        else:
+            for item in val:
+                if item is not None:
+                    _apply_plan(subplan, item, buffers)
+    return data
+
+
+def compile_encoder(
+    msg_type: Type[BaseModel],
+) -> Callable[..., Dict[str, Any]]:
+    """compile_encoder.
+    Build (once) and return the encoder of a message type. The encoder
+    converts the dumped dict of a message to primitives, visiting only the
+    fields that are not of a known primitive type. It optionally takes a
+    list to collect out-of-band buffers into.
+
+    Args:
+        msg_type (Type[BaseModel]): The message type
+
+    Returns:
+        Callable[[Dict[str, Any]], Dict[str, Any]]: The encoder
+    """
+    encoder = _encoders.get(msg_type)
+    if encoder is None:
+        plan = _compile_plan(msg_type)
+        if len(plan) == 0:
+            encoder = lambda data, buffers=None: data  # noqa: E731
+        else:
+            encoder = lambda data, buffers=None: _apply_plan(  # noqa: E731
+                plan, data, buffers
+            )
+        _encoders[msg_type] = encoder
+    return encoder
+
+
+def encode_message(
+    data: Union[Dict[str, Any], BaseModel], buffers: Optional[List[Any]] = None
+) -> Dict[str, Any]:
+    """encode_message.
+    Convert a message to primitives. Typed messages use the compiled encoder
+    of their type, untyped (dict) payloads are walked recursively.
+
+    Args:
+        data (Union[Dict[str, Any], BaseModel]): The message
+        buffers (Optional[List[Any]]): Collects numpy arrays out-of-band.
+            If not given, arrays are converted to (nested) lists.
+    """
+    if isinstance(data, BaseModel):
+        return compile_encoder(type(data))(data.model_dump(), buffers)
+    return JSONSerializer.make_primitives(data, buffers)
+
+
+def _encode_ndarray(arr: Any, buffers: Optional[List[Any]]) -> Any:
+    if buffers is None or arr.dtype.hasobject:
+        return JSONSerializer.make_primitive_value(arr.tolist())
+    # Copies only arrays that are not already C-contiguous
+    arr = np.ascontiguousarray(arr)
+    buffers.append(arr)
+    return {
+        NDARRAY_KEY: len(buffers) - 1,
+        "dtype": arr.dtype.str,
+        "shape": list(arr.shape),
+    }
+
+
+def _restore_ndarrays(data: Any, buffers: List[memoryview]) -> Any:
+    if isinstance(data, dict):
+        if NDARRAY_KEY in data:
+            if np is None:
+                raise SerializationError(
+                    "Received a numpy array but numpy is not installed"
+                )
+            arr = np.frombuffer(buffers[data[NDARRAY_KEY]], dtype=data["dtype"])
+            return arr.reshape(data["shape"])
+        for key, val in data.items():
+            data[key] = _restore_ndarrays(val, buffers)
+    elif isinstance(data, list):
+        for i, val in enumerate(data):
+            data[i] = _restore_ndarrays(val, buffers)
+    return data
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def pack_buffers(body: bytes, buffers: List[Any]) -> bytes:
+    """pack_buffers.
+    Build a payload from an encoded body and its out-of-band buffers.
+    Buffers are copied once, straight into the payload.
+
+    Args:
+        body (bytes): The encoded message body
+        buffers (List[Any]): C-contiguous buffers (e.g. numpy arrays)
+    """
+    return b"".join(buffer_parts(body, buffers))
+
+
+def buffer_parts(body: bytes, buffers: List[Any]) -> List[Any]:
+    """buffer_parts.
+    The parts of the payload built by pack_buffers(), not yet joined.
+
+    Args:
+        body (bytes): The encoded message body
+        buffers (List[Any]): C-contiguous buffers (e.g. numpy arrays)
+    """
+    views = [memoryview(buf).cast("B") for buf in buffers]
+    parts = [
+        _OOB_HEADER.pack(OOB_MAGIC, len(views), len(body)),
+        struct.pack(f"<{len(views)}Q", *[view.nbytes for view in views]),
+        body,
+        bytes(_padding(len(body))),
+    ]
+    for view in views:
+        parts.append(view)
+        parts.append(bytes(_padding(view.nbytes)))
+    return parts
+
+
+def unpack_buffers(data: Union[bytes, memoryview]) -> Tuple[memoryview, List]:
+    """unpack_buffers.
+    Split a payload built by pack_buffers to the body and the buffers.
+    Returned views share memory with the payload.
+
+    Args:
+        data (Union[bytes, memoryview]): The payload
+    """
+    view = memoryview(data)
+    try:
+        _, nbufs, body_len = _OOB_HEADER.unpack_from(view, 0)
+        offset = _OOB_HEADER.size
+        lengths = struct.unpack_from(f"<{nbufs}Q", view, offset)
+    except struct.error as exc:
+        raise SerializationError(f"Malformed out-of-band payload: {exc}")
+    offset += 8 * nbufs
+    end = offset + body_len
+    body = view[offset:end]
+    buffers = []
+    for length in lengths:
+        offset = end + _padding(end)
+        end = offset + length
+        buffers.append(view[offset:end])
+    if end > len(view):
+        raise SerializationError("Truncated out-of-band payload")
+    return body, buffers
+
+
+def _mp_pack(obj: Any, buf: bytearray) -> None:
+    """Pure-Python MessagePack encoder. Used when msgpack is not installed.
+
+    Args:
+        obj (Any): Object to encode. Must be built from primitives.
+        buf (bytearray): Output buffer
+    """
+    if obj is None:
+        buf.append(0xC0)
+    elif obj is True:
+        buf.append(0xC3)
+    elif obj is False:
+        buf.append(0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            buf.append(obj)
+        elif -0x20 <= obj < 0:
+            buf.append(obj & 0xFF)
+        elif obj >= 0:
+            if obj <= 0xFF:
+                buf += struct.pack(">BB", 0xCC, obj)
+            elif obj <= 0xFFFF:
+                buf += struct.pack(">BH", 0xCD, obj)
+            elif obj <= 0xFFFFFFFF:
+                buf += struct.pack(">BI", 0xCE, obj)
+            else:
+                buf += struct.pack(">BQ", 0xCF, obj)
+        else:
+            if obj >= -0x80:
+                buf += struct.pack(">Bb", 0xD0, obj)
+            elif obj >= -0x8000:
+                buf += struct.pack(">Bh", 0xD1, obj)
+            elif obj >= -0x80000000:
+                buf += struct.pack(">Bi", 0xD2, obj)
+            else:
+                buf += struct.pack(">Bq", 0xD3, obj)
+    elif isinstance(obj, float):
+        buf += struct.pack(">Bd", 0xCB, obj)
+    elif isinstance(obj, str):
+        _b = obj.encode("utf8")
+        _len = len(_b)
+        if _len < 0x20:
+            buf.append(0xA0 | _len)
+        elif _len <= 0xFF:
+            buf += struct.pack(">BB", 0xD9, _len)
+        elif _len <= 0xFFFF:
+            buf += struct.pack(">BH", 0xDA, _len)
+        else:
+            buf += struct.pack(">BI", 0xDB, _len)
+        buf += _b
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        _len = len(obj) if not isinstance(obj, memoryview) else obj.nbytes
+        if _len <= 0xFF:
+            buf += struct.pack(">BB", 0xC4, _len)
+        elif _len <= 0xFFFF:
+            buf += struct.pack(">BH", 0xC5, _len)
+        else:
+            buf += struct.pack(">BI", 0xC6, _len)
+        buf += obj
+    elif isinstance(obj, (list, tuple)):
+        _len = len(obj)
+        if _len < 0x10:
+            buf.append(0x90 | _len)
+        elif _len <= 0xFFFF:
+            buf += struct.pack(">BH", 0xDC, _len)
+        else:
+            buf += struct.pack(">BI", 0xDD, _len)
+        for _item in obj:
+            _mp_pack(_item, buf)
+    elif isinstance(obj, dict):
+        _len = len(obj)
+        if _len < 0x10:
+            buf.append(0x80 | _len)
+        elif _len <= 0xFFFF:
+            buf += struct.pack(">BH", 0xDE, _len)
+        else:
+            buf += struct.pack(">BI", 0xDF, _len)
+        for _key, _val in obj.items():
+            _mp_pack(_key, buf)
+            _mp_pack(_val, buf)
+    else:
+        raise SerializationError(f"Cannot pack object of type {type(obj)}")
+
+
+def _mp_unpack(data: Any, offset: int = 0):
+    """Pure-Python MessagePack decoder. Used when msgpack is not installed.
+
+    Args:
+        data (Any): Bytes-like object to decode
+        offset (int): Offset to start decoding from
+
+    Returns:
+        Tuple[Any, int]: The decoded object and the offset after it
+    """
+    code = data[offset]
+    offset += 1
+    if code < 0x80:
+        return code, offset
+    elif code >= 0xE0:
+        return code - 0x100, offset
+    elif code & 0xE0 == 0xA0:
+        _len = code & 0x1F
+        return bytes(data[offset : offset + _len]).decode("utf8"), offset + _len
+    elif code & 0xF0 == 0x90:
+        return _mp_unpack_array(data, offset, code & 0x0F)
+    elif code & 0xF0 == 0x80:
+        return _mp_unpack_map(data, offset, code & 0x0F)
+    elif code == 0xC0:
+        return None, offset
+    elif code == 0xC2:
+        return False, offset
+    elif code == 0xC3:
+        return True, offset
+    elif code in _MP_FIXED:
+        _fmt, _size = _MP_FIXED[code]
+        return struct.unpack_from(_fmt, data, offset)[0], offset + _size
+    elif code in _MP_STR:
+        _fmt, _size = _MP_STR[code]
+        _len = struct.unpack_from(_fmt, data, offset)[0]
+        offset += _size
+        return bytes(data[offset : offset + _len]).decode("utf8"), offset + _len
+    elif code in _MP_BIN:
+        _fmt, _size = _MP_BIN[code]
+        _len = struct.unpack_from(_fmt, data, offset)[0]
+        offset += _size
+        return bytes(data[offset : offset + _len]), offset + _len
+    elif code in (0xDC, 0xDD):
+        _fmt, _size = (">H", 2) if code == 0xDC else (">I", 4)
+        _len = struct.unpack_from(_fmt, data, offset)[0]
+        return _mp_unpack_array(data, offset + _size, _len)
+    elif code in (0xDE, 0xDF):
+        _fmt, _size = (">H", 2) if code == 0xDE else (">I", 4)
+        _len = struct.unpack_from(_fmt, data, offset)[0]
+        return _mp_unpack_map(data, offset + _size, _len)
+    raise SerializationError(f"Unsupported msgpack type code: {hex(code)}")
+
+
+def _mp_unpack_array(data: Any, offset: int, length: int):
+    _items = []
+    for _ in range(length):
+        _item, offset = _mp_unpack(data, offset)
+        _items.append(_item)
+    return _items, offset
+
+
+def _mp_unpack_map(data: Any, offset: int, length: int):
+    _items = {}
+    for _ in range(length):
+        _key, offset = _mp_unpack(data, offset)
+        _val, offset = _mp_unpack(data, offset)
+        _items[_key] = _val
+    return _items, offset
+
+
+_MP_FIXED = {
+    0xCA: (">f", 4),
+    0xCB: (">d", 8),
+    0xCC: (">B", 1),
+    0xCD: (">H", 2),
+    0xCE: (">I", 4),
+    0xCF: (">Q", 8),
+    0xD0: (">b", 1),
+    0xD1: (">h", 2),
+    0xD2: (">i", 4),
+    0xD3: (">q", 8),
+}
+_MP_STR = {0xD9: (">B", 1), 0xDA: (">H", 2), 0xDB: (">I", 4)}
+_MP_BIN = {0xC4: (">B", 1), 0xC5: (">H", 2), 0xC6: (">I", 4)}
+
+
+class MsgPackSerializer(Serializer):
+    """MessagePack serializer.
+    Uses the msgpack package when installed, or the built-in pure-Python
+    codec otherwise. Both produce the same wire format.
+
+    Static class.
+    """
+
+    CONTENT_TYPE: str = ContentType.msgpack
+    CONTENT_ENCODING: str = "binary"
+    SERIALIZATION_TYPE: int = SerializationTypes.MSGPACK
+
+    @staticmethod
+    def serialize(data: Union[Dict[str, Any], BaseModel]) -> bytes:
+        """serialize.
+
+        Args:
+            data (Union[dict, BaseModel]): Serialize to msgpack bytes
+        """
+        return MsgPackSerializer.dumps(encode_message(data))
+
+    @staticmethod
+    def deserialize(data: bytes) -> Dict[str, Any]:
+        """deserialize.
+
+        Args:
+            data (bytes): msgpack bytes to dict
+        """
+        return MsgPackSerializer.loads(data)
+
+    @staticmethod
+    def dumps(data: Dict[str, Any]) -> bytes:
+        """dumps.
+
+        Args:
+            data (dict): Primitives to msgpack bytes
+        """
+        if msgpack is not None:
+            return msgpack.packb(data, use_bin_type=True)
+        buf = bytearray()
+        _mp_pack(data, buf)
+        return bytes(buf)
+
+    @staticmethod
+    def loads(data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        """loads.
+
+        Args:
+            data (Union[bytes, memoryview]): msgpack bytes to dict
+        """
+        if msgpack is not None:
+            return msgpack.unpackb(data, raw=False)
+        return _mp_unpack(data)[0]
+
+
+class CBORSerializer(Serializer):
+    """CBOR serializer. Requires the cbor2 package.
+
+    Static class.
+    """
+
+    CONTENT_TYPE: str = ContentType.cbor
+    CONTENT_ENCODING: str = "binary"
+    SERIALIZATION_TYPE: int = SerializationTypes.CBOR
+
+    @staticmethod
+    def serialize(data: Union[Dict[str, Any], BaseModel]) -> bytes:
+        """serialize.
+
+        Args:
+            data (Union[dict, BaseModel]): Serialize to cbor bytes
+        """
+        return cbor2.dumps(encode_message(data))
+
+    @staticmethod
+    def deserialize(data: bytes) -> Dict[str, Any]:
+        """deserialize.
+
+        Args:
+            data (bytes): cbor bytes to dict
+        """
+        return cbor2.loads(data)
+
+    @staticmethod
+    def dumps(data: Dict[str, Any]) -> bytes:
+        """dumps.
+
+        Args:
+            data (dict): Primitives to cbor bytes
+        """
+        return cbor2.dumps(data)
+
+    @staticmethod
+    def loads(data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        """loads.
+
+        Args:
+            data (Union[bytes, memoryview]): cbor bytes to dict
+        """
+        return cbor2.loads(data)
+
+
+_serializers: Dict[int, Type[Serializer]] = {}
+
+
+def register_serializer(serializer: Type[Serializer]) -> None:
+    """register_serializer.
+    Register a serializer under its SERIALIZATION_TYPE id.
+
+    Args:
+        serializer (Type[Serializer]): The serializer class
+    """
+    _serializers[int(serializer.SERIALIZATION_TYPE)] = serializer
+
+
+def get_serializer(
+    serializer: Union[Serializer, Type[Serializer], SerializationTypes, int, str],
+) -> Type[Serializer]:
+    """get_serializer.
+    Resolve a serializer by class, instance, SerializationTypes id or name
+    (e.g. "json", "msgpack").
+
+    Args:
+        serializer: The serializer reference
+
+    Returns:
+        Type[Serializer]: The serializer
+    """
+    if isinstance(serializer, Serializer) or (
+        isinstance(serializer, type) and issubclass(serializer, Serializer)
+    ):
+        return serializer
+    if isinstance(serializer, str):
+        try:
+            serializer = SerializationTypes[serializer.upper()]
+        except KeyError:
+            raise SerializationError(f"Unknown serializer <{serializer}>")
+    if int(serializer) not in _serializers:
+        raise SerializationError(f"Serializer <{serializer}> is not available")
+    return _serializers[int(serializer)]
+
+
+register_serializer(JSONSerializer)
+register_serializer(MsgPackSerializer)
+if cbor2 is not None:
+    register_serializer(CBORSerializer)
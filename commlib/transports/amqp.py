@@ -5,9 +5,11 @@ import threading
 import time
 import uuid
 from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from threading import Event as ThreadEvent
 from threading import Semaphore, Thread
-from typing import Dict
+from typing import Any, Callable, Dict, List, Tuple
 
 import pika
 
@@ -20,11 +22,10 @@ from commlib.action import (
     _ActionResultMessage,
     _ActionStatusMessage,
 )
-from commlib.compression import CompressionType, deflate, inflate_str
 from commlib.connection import BaseConnectionParameters
 from commlib.exceptions import *
 from commlib.msg import PubSubMessage, RPCMessage
-from commlib.pubsub import BasePublisher, BaseSubscriber
+from commlib.pubsub import BasePublisher, BaseSubscriber, Inbox, InboxPolicy
 from commlib.rpc import (
     BaseRPCClient,
     BaseRPCServer,
@@ -179,6 +180,57 @@ class Connection(pika.BlockingConnection):
         self._t_stop_event = ThreadEvent()
         self._events_thread.start()
 
+    def start(self) -> None:
+        """start.
+        Process the events of the connection in background, for all the
+        endpoints that share it.
+        """
+        self.detach_amqp_events_thread()
+
+    def run_threadsafe(self, fn: Callable, *args, **kwargs) -> Any:
+        """run_threadsafe.
+        Run a function on the thread that processes the events of the
+        connection and wait for its result. Blocking connections are not
+        thread safe, so endpoints that share a connection create their
+        channels, queues and consumers through this method.
+
+        Args:
+            fn (Callable): The function
+            args: Positional arguments of the function
+            kwargs: Keyword arguments of the function
+        """
+        events_thread = self._events_thread
+        if (
+            events_thread is None
+            or not events_thread.is_alive()
+            or events_thread is threading.current_thread()
+        ):
+            return fn(*args, **kwargs)
+        future = Future()
+
+        def _run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        self.add_callback_threadsafe(_run)
+        return future.result()
+
+    def close(self, *args, **kwargs) -> None:
+        """close.
+        Stop the events thread and close the connection.
+        """
+        events_thread = self._events_thread
+        self.stop_amqp_events_thread()
+        if (
+            events_thread is not None
+            and events_thread is not threading.current_thread()
+        ):
+            events_thread.join()
+        if self.is_open:
+            super(Connection, self).close(*args, **kwargs)
+
     def _ensure_events_processed(self):
         """_ensure_events_processed."""
         try:
@@ -205,6 +257,8 @@ class AMQPTransport(BaseTransport):
     def __init__(self, connection: Connection = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._connection = connection
+        # Shared connections are driven (and closed) by their owner
+        self._shared = connection is not None
         self._channel = None
         self._closing = False
 
@@ -216,11 +270,15 @@ class AMQPTransport(BaseTransport):
     def connection(self):
         return self._connection
 
+    @property
+    def shared(self) -> bool:
+        return self._shared
+
     def connect(self) -> bool:
         try:
             if self._connection is None:
                 self._connection = Connection(self._conn_params)
-            self.create_channel()
+            self.run_threadsafe(self.create_channel)
             return True
         except pika.exceptions.ProbableAuthenticationError as e:
             logger.error(f"Authentication Error: {str(e)}")
@@ -255,6 +313,11 @@ class AMQPTransport(BaseTransport):
     def add_threadsafe_callback(self, cb, *args, **kwargs):
         self.connection.add_callback_threadsafe(functools.partial(cb, *args, **kwargs))
 
+    def run_threadsafe(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a function on the events thread of the connection, if it
+        is running, and wait for its result."""
+        return self._connection.run_threadsafe(fn, *args, **kwargs)
+
     def process_amqp_events(self, timeout=0):
         """Force process amqp events, such as heartbeat packages."""
         self.connection.process_data_events(timeout)
@@ -437,7 +500,8 @@ class AMQPTransport(BaseTransport):
         self.connect()
 
     def stop(self):
-        self.stop_consuming()
+        if not self._shared:
+            self.stop_consuming()
         self.disconnect()
 
 
@@ -465,21 +529,24 @@ class RPCService(BaseRPCService):
         self._exchange = exchange
         self._closing = False
         self._rpc_queue = None
-        super(RPCService, self).__init__(*args, **kwargs)
+        super(RPCService, self).__init__(connection=connection, *args, **kwargs)
 
         self._transport = AMQPTransport(
             conn_params=self._conn_params, connection=connection, debug=self.debug
         )
 
     def run_forever(self, raise_if_exists: bool = False):
-        """Run RPC Service in normal mode. Blocking operation."""
+        """Run RPC Service in normal mode. Blocking operation, unless the
+        connection is shared."""
         status = self._transport.connect()
         if not status:
             raise ConnectionError(f"Failed to connect to AMQP broker")
 
-        self._rpc_queue = self._transport.create_queue(self._rpc_name)
-        self._transport.set_channel_qos(prefetch_count=self._max_workers)
-        self._transport.consume_from_queue(self._rpc_queue, self._on_request_handle)
+        self._transport.run_threadsafe(self._setup_queue)
+        if self._transport.shared:
+            # Consumed by the events thread of the shared connection
+            self._transport.detach_amqp_events_thread()
+            return
         try:
             self._transport.start_consuming()
         except pika.exceptions.ConnectionClosedByBroker as exc:
@@ -490,6 +557,11 @@ class RPCService(BaseRPCService):
             self.log.error(exc, exc_info=True)
             raise AMQPError("Error while trying to consume from queue")
 
+    def _setup_queue(self):
+        self._rpc_queue = self._transport.create_queue(self._rpc_name)
+        self._transport.set_channel_qos(prefetch_count=self._max_workers)
+        self._transport.consume_from_queue(self._rpc_queue, self._on_request_handle)
+
     def _rpc_exists(self):
         return self._transport.queue_exists(self._rpc_name)
 
@@ -524,19 +596,28 @@ class RPCService(BaseRPCService):
         except Exception:
             self.log.error("Exception Thrown in on_request_handle", exc_info=True)
         try:
-            if self._compression != CompressionType.NO_COMPRESSION:
-                body = deflate(body)
-            _data = self._serializer.deserialize(body)
+            _data = self._codec.decode(body)
         except Exception:
             self.log.error("Could not deserialize data", exc_info=True)
             self._transport.add_threadsafe_callback(
-                self._send_response, {}, ch, _corr_id, _reply_to, _delivery_tag
+                self._send_response,
+                self._encode_response({}),
+                ch,
+                _corr_id,
+                _reply_to,
+                _delivery_tag,
             )
             return
         try:
             resp = self._invoke_onrequest_callback(_data)
+            # Encode on the worker thread, not on the connection I/O thread
             self._transport.add_threadsafe_callback(
-                self._send_response, resp, ch, _corr_id, _reply_to, _delivery_tag
+                self._send_response,
+                self._encode_response(resp),
+                ch,
+                _corr_id,
+                _reply_to,
+                _delivery_tag,
             )
         except Exception:
             self.log.error("OnRequest Callback invocation failed", exc_info=True)
@@ -550,7 +631,7 @@ class RPCService(BaseRPCService):
                 resp = {}
         else:
             try:
-                msg = self._msg_type.Request(**data)
+                msg = self._build_msg(self._msg_type.Request, data)
                 resp = self.on_request(msg)
             except Exception as exc:
                 self.log.error(str(exc), exc_info=False)
@@ -558,27 +639,27 @@ class RPCService(BaseRPCService):
             resp = resp.dict()
         return resp
 
-    def _send_response(
-        self, data: dict, channel, correlation_id: str, reply_to: str, delivery_tag: str
-    ):
-        _payload = None
-        _encoding = None
-        _type = None
+    def _encode_response(self, data: dict) -> bytes:
         try:
-            _encoding = self._serializer.CONTENT_ENCODING
-            _type = self._serializer.CONTENT_TYPE
-            _payload = self._serializer.serialize(data)
-            if self._compression != CompressionType.NO_COMPRESSION:
-                _payload = inflate_str(_payload)
-            else:
-                _payload = _payload.encode(_encoding)
+            return self._codec.encode(data, self._rpc_name)
         except Exception as e:
-            self.log.error("Could not deserialize data", exc_info=True)
-            _payload = {"status": 501, "error": f"Internal server error: {e}"}
+            self.log.error("Could not serialize data", exc_info=True)
+            return self._codec.encode(
+                {"status": 501, "error": f"Internal server error: {e}"},
+                self._rpc_name,
+            )
 
+    def _send_response(
+        self,
+        payload: bytes,
+        channel,
+        correlation_id: str,
+        reply_to: str,
+        delivery_tag: str,
+    ):
         _msg_props = MessageProperties(
-            content_type=_type,
-            content_encoding=_encoding,
+            content_type=self._serializer.CONTENT_TYPE,
+            content_encoding=self._serializer.CONTENT_ENCODING,
             correlation_id=correlation_id,
         )
 
@@ -586,7 +667,7 @@ class RPCService(BaseRPCService):
             exchange=self._exchange,
             routing_key=reply_to,
             properties=_msg_props,
-            body=_payload,
+            body=payload,
         )
         # Acknowledge receiving the message.
         channel.basic_ack(delivery_tag=delivery_tag)
@@ -634,15 +715,18 @@ class RPCClient(BaseRPCClient):
     def __init__(
         self, use_corr_id=False, connection: Connection = None, *args, **kwargs
     ):
-        """Constructor."""
+        """Constructor.
+
+        Args:
+            use_corr_id (bool): Unused. Kept for backward compatibility,
+                requests always carry a correlation id.
+            connection (Connection): Shared connection
+        """
         self._use_corr_id = use_corr_id
-        self._corr_id = None
-        self._response = None
         self._exchange = ExchangeType.Default
         self._mean_delay = 0
-        self._delay = 0
 
-        super().__init__(*args, **kwargs)
+        super().__init__(connection=connection, *args, **kwargs)
 
         self._transport = AMQPTransport(
             conn_params=self._conn_params, connection=connection, debug=self.debug
@@ -672,7 +756,7 @@ class RPCClient(BaseRPCClient):
         """The last recorded delay of the communication.
         Internally calculated.
         """
-        return self._delay
+        return self._pending_calls.delay
 
     def run(self):
         self._transport.detach_amqp_events_thread()
@@ -682,98 +766,83 @@ class RPCClient(BaseRPCClient):
         return str(uuid.uuid4())
 
     def call(self, msg: RPCMessage.Request, timeout: float = 10.0):
-        """Call RPC.
+        """Call RPC. Calls of many threads can be in flight at the same
+        time. Returns None on timeout.
 
         Args:
             timeout (float): Response timeout. Set this value carefully
                 based on application criteria.
         """
+        corr_id, call = self._send_request(msg)
+        try:
+            body = call.result(timeout)
+        except FutureTimeoutError:
+            self._pending_calls.discard(corr_id)
+            return None
+        return self._parse_response(body)
+
+    def call_async(
+        self,
+        msg: RPCMessage.Request,
+        timeout: float = 30.0,
+        on_response: callable = None,
+    ) -> Future:
+        """Asynchronous RPC call. Returns a future of the response, without
+        occupying a worker thread while waiting. The response is decoded,
+        and on_response is called, on the executor of the client. The
+        future fails with RPCClientTimeoutError on timeout.
+
+        Args:
+            msg (RPCMessage.Request): The request
+            timeout (float): Response timeout
+            on_response (callable): Called with the response
+        """
+        _, call = self._send_request(msg, timeout)
+        return self._response_future(call, on_response)
+
+    def _send_request(
+        self, msg: RPCMessage.Request, timeout: float = None
+    ) -> Tuple[str, Future]:
         if self._msg_type is None:
             data = msg
         else:
             data = msg.dict()
-
-        self._response = None
-        if self._use_corr_id:
-            self._corr_id = self.gen_corr_id()
-
-        start_t = time.time()
-        self._transport.add_threadsafe_callback(functools.partial(self._send_msg, data))
-        resp = self._wait_for_response(timeout=timeout)
-        if resp is None:
-            return resp
-        elapsed_t = time.time() - start_t
-        self._delay = elapsed_t
-        if self._msg_type is None:
-            return resp
-        else:
-            return self._msg_type.Response(**resp)
-
-    def _wait_for_response(self, timeout: float = 30.0):
-        start_t = time.time()
-        while self._response is None:
-            elapsed_t = time.time() - start_t
-            if elapsed_t >= timeout:
-                return None
-            time.sleep(0.001)
-        return self._response
+        corr_id = self.gen_corr_id()
+        call = self._pending_calls.add(corr_id, timeout)
+        _payload = self._codec.encode(data, self._rpc_name)
+        self._transport.add_threadsafe_callback(self._send_msg, _payload, corr_id)
+        return corr_id, call
 
     def _on_response_handle(self, ch, method, properties, body):
-        _ctype = None
-        _cencoding = None
-        _ts_send = None
-        _dmode = None
-        _data = None
-        try:
-            if self._use_corr_id:
-                _corr_id = properties.correlation_id
-                if self._corr_id != _corr_id:
-                    return
-            _ctype = properties.content_type
-            _cencoding = properties.content_encoding
-            _dmode = properties.delivery_mode
-            _ts_send = properties.timestamp
-        except Exception:
-            self.log.error("Error parsing response from rpc server.", exc_info=True)
+        # Runs on the connection I/O thread. Only routes the raw response to
+        # its call, it is decoded by the caller (or the executor).
+        self._pending_calls.resolve(getattr(properties, "correlation_id", None), body)
 
+    def _parse_response(self, body: bytes) -> Any:
         try:
-            if self._compression != CompressionType.NO_COMPRESSION:
-                body = deflate(body)
-            _data = self._serializer.deserialize(body)
+            _data = self._codec.decode(body)
         except Exception:
             self.log.error("Could not deserialize data", exc_info=True)
             _data = {}
-        self._response = _data
-
-    def _send_msg(self, data: Dict) -> None:
-        _payload = None
-        _encoding = None
-        _type = None
-
-        _encoding = self._serializer.CONTENT_ENCODING
-        _type = self._serializer.CONTENT_TYPE
-        _payload = self._serializer.serialize(data)
-        if self._compression != CompressionType.NO_COMPRESSION:
-            _payload = inflate_str(_payload)
-        else:
-            _payload = _payload.encode(_encoding)
+        if self._msg_type is None:
+            return _data
+        return self._msg_type.Response(**_data)
 
-        # Direct reply-to implementation
+    def _send_msg(self, payload: bytes, corr_id: str) -> None:
+        # Direct reply-to implementation. Runs on the connection I/O thread.
         _rpc_props = MessageProperties(
-            content_type=_type,
-            content_encoding=_encoding,
-            correlation_id=self._corr_id,
+            content_type=self._serializer.CONTENT_TYPE,
+            content_encoding=self._serializer.CONTENT_ENCODING,
+            correlation_id=corr_id,
             timestamp=gen_timestamp(),
             reply_to="amq.rabbitmq.reply-to",
         )
-
-        self._transport.add_threadsafe_callback(
-            self._transport.channel.basic_publish,
+        self._transport.channel.basic_publish(
             exchange=self._exchange,
             routing_key=self._rpc_name,
             mandatory=False,
             properties=_rpc_props,
-            body=_payload,
+            body=payload,
         )
 
 
@@ -796,13 +865,15 @@ class Publisher(BasePublisher):
     ):
         """Constructor."""
         self._topic_exchange = exchange
-        super().__init__(*args, **kwargs)
+        super().__init__(connection=connection, *args, **kwargs)
 
         self._transport = AMQPTransport(
             conn_params=self._conn_params, connection=connection, debug=self.debug
         )
         self._transport.connect()
-        self._transport.create_exchange(self._topic_exchange, ExchangeType.Topic)
+        self._transport.run_threadsafe(
+            self._transport.create_exchange, self._topic_exchange, ExchangeType.Topic
+        )
         if connection is None:
             self.run()
 
@@ -817,29 +888,37 @@ class Publisher(BasePublisher):
         """
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
-        # Thread Safe solution
-        self._transport.add_threadsafe_callback(self._send_msg, data, self._topic)
-
-    def _send_msg(self, msg: Dict, topic: str):
-        _payload = None
-        _encoding = None
-        _type = None
-
-        _encoding = self._serializer.CONTENT_ENCODING
-        _type = self._serializer.CONTENT_TYPE
-        _payload = self._serializer.serialize(msg)
-        if self._compression != CompressionType.NO_COMPRESSION:
-            _payload = inflate_str(_payload)
-        else:
-            _payload = _payload.encode(_encoding)
+        if self._batch(msg):
+            return
+        # Encode on the calling thread, to keep the connection I/O thread
+        # free for other endpoints. Sending is thread safe.
+        _payload = self._codec.encode(data, self._topic)
+        self._transport.add_threadsafe_callback(self._send_msg, _payload, self._topic)
+
+    def publish_batch(self, msgs: List[PubSubMessage]) -> None:
+        """Publish a batch of messages, with a single I/O thread callback.
+
+        Args:
+            msgs (List[PubSubMessage]): Messages to publish.
+        """
+        _payloads = [
+            (self._codec.encode(self._check_msg(msg), self._topic), self._topic)
+            for msg in msgs
+        ]
+        self._transport.add_threadsafe_callback(self._send_msgs, _payloads)
+
+    def _send_msgs(self, payloads: List[Tuple[bytes, str]]):
+        for payload, topic in payloads:
+            self._send_msg(payload, topic)
 
+    def _send_msg(self, payload: bytes, topic: str):
         msg_props = MessageProperties(
-            content_type=_type,
-            content_encoding=_encoding,
+            content_type=self._serializer.CONTENT_TYPE,
+            content_encoding=self._serializer.CONTENT_ENCODING,
             message_id=0,
         )
 
@@ -850,7 +929,7 @@ class Publisher(BasePublisher):
             exchange=self._topic_exchange,
             routing_key=topic,
             properties=msg_props,
-            body=_payload,
+            body=payload,
         )
 
 
@@ -866,12 +945,41 @@ class MPublisher(Publisher):
         """
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
-        # Thread Safe solution
-        self._transport.add_threadsafe_callback(self._send_msg, data, topic)
+        if self._batch((msg, topic)):
+            return
+        _payload = self._codec.encode(data, topic)
+        self._transport.add_threadsafe_callback(self._send_msg, _payload, topic)
+
+    def publish_batch(self, msgs: List[Tuple[PubSubMessage, str]]) -> None:
+        """Publish a batch of messages, with a single I/O thread callback.
+
+        Args:
+            msgs (List[Tuple[PubSubMessage, str]]): (message, topic) pairs.
+        """
+        _payloads = [
+            (self._codec.encode(self._check_msg(msg), topic), topic)
+            for msg, topic in msgs
+        ]
+        self._transport.add_threadsafe_callback(self._send_msgs, _payloads)
+
+    def publish_to_many(self, msg: PubSubMessage, topics: List[str]) -> None:
+        """Publish a message to many topics. It is serialized and compressed
+        once, and sent to all topics with a single I/O thread callback.
+
+        Args:
+            msg (PubSubMessage): Message to publish.
+            topics (List[str]): Topics to publish the message to.
+        """
+        if len(topics) == 0:
+            return
+        _payload = self._codec.encode(self._check_msg(msg), topics[0])
+        self._transport.add_threadsafe_callback(
+            self._send_msgs, [(_payload, topic) for topic in topics]
+        )
 
 
 class Subscriber(BaseSubscriber):
@@ -887,12 +995,23 @@ class Subscriber(BaseSubscriber):
         message_ttl (int): Message Time-to-Live as specified by AMQP.
         overflow (str): queue overflow behavior. Specified by AMQP Protocol.
             Defaults to `drop-head`.
+        offload_decoding (bool): Decode received messages and run callbacks
+            off the connection I/O thread, on an inbox of queue_size
+            messages which applies the overflow behaviour of the queue.
+            Ignored if an inbox is configured (e.g. with inbox_size).
         **kwargs: The keyword arguments to pass to the base class
             (BaseSubscriber).
     """
 
     FREQ_CALC_SAMPLES_MAX = 100
 
+    # Inbox policy of each AMQP queue overflow behaviour
+    OVERFLOW_POLICIES = {
+        "drop-head": InboxPolicy.DROP_OLDEST,
+        "reject-publish": InboxPolicy.DROP_NEWEST,
+        "reject-publish-dlx": InboxPolicy.DROP_NEWEST,
+    }
+
     def __init__(
         self,
         exchange: str = "amq.topic",
@@ -901,6 +1020,7 @@ class Subscriber(BaseSubscriber):
         overflow: str = "drop-head",
         connection: Connection = None,
         *args,
+        offload_decoding: bool = False,
         **kwargs,
     ):
         """Constructor."""
@@ -912,7 +1032,16 @@ class Subscriber(BaseSubscriber):
         self._closing = False
         self._transport = None
 
-        super().__init__(*args, **kwargs)
+        super().__init__(connection=connection, *args, **kwargs)
+
+        if offload_decoding and self._inbox is None:
+            # Keep decoding (e.g. decompression of large payloads) and
+            # callbacks off the I/O thread. Never block the I/O thread.
+            self._inbox = Inbox(
+                queue_size,
+                self.OVERFLOW_POLICIES.get(overflow, InboxPolicy.DROP_OLDEST),
+                name=self._topic,
+            )
 
         self._transport = AMQPTransport(
             conn_params=self._conn_params, connection=connection, debug=self.debug
@@ -929,8 +1058,13 @@ class Subscriber(BaseSubscriber):
         return self._hz
 
     def run_forever(self) -> None:
-        """Start Subscriber. Blocking method."""
+        """Start Subscriber. Blocking method, unless the connection is
+        shared."""
         self._transport.connect()
+        self._transport.run_threadsafe(self._setup_queue)
+        self._consume()
+
+    def _setup_queue(self) -> None:
         _exch_ex = self._transport.exchange_exists(self._topic_exchange)
         if _exch_ex.method.NAME != "Exchange.DeclareOk":
             self._transport.create_exchange(self._topic_exchange, ExchangeType.Topic)
@@ -945,7 +1079,6 @@ class Subscriber(BaseSubscriber):
 
         # Bind queue to the Topic exchange
         self._transport.bind_queue(self._topic_exchange, self._queue_name, self._topic)
-        self._consume()
 
     def close(self) -> None:
         if self._closing:
@@ -964,12 +1097,17 @@ class Subscriber(BaseSubscriber):
 
     def _consume(self, reliable: bool = False) -> None:
         """Start AMQP consumer."""
-        self._transport._channel.basic_consume(
+        self._transport.run_threadsafe(
+            self._transport._channel.basic_consume,
             self._queue_name,
-            self._on_msg_callback_wrapper,
+            functools.partial(self._receive, self._on_msg_callback_wrapper),
             exclusive=False,
             auto_ack=(not reliable),
         )
+        if self._transport.shared:
+            # Consumed by the events thread of the shared connection
+            self._transport.detach_amqp_events_thread()
+            return
         try:
             self._transport.start_consuming()
         except KeyboardInterrupt as exc:
@@ -994,9 +1132,7 @@ class Subscriber(BaseSubscriber):
         except Exception:
             self.log.debug("Failed to read message properties", exc_info=True)
         try:
-            if self._compression != CompressionType.NO_COMPRESSION:
-                body = deflate(body)
-            _data = self._serializer.deserialize(body)
+            _data = self._codec.decode(body)
         except Exception:
             self.log.error("Could not deserialize data", exc_info=True)
             # Return data as is. Let callback handle with encoding...
@@ -1008,16 +1144,16 @@ class Subscriber(BaseSubscriber):
             self.log.warn("Could not calculate message rate", exc_info=True)
 
         try:
-            if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, _data)
-                else:
-                    _clb = functools.partial(self.onmessage, self._msg_type(**_data))
+            if self._batcher is not None:
+                self._batcher.add(self._make_msg(_data))
+            elif self.onmessage is not None:
+                _clb = functools.partial(self.onmessage, self._make_msg(_data))
                 _clb()
         except Exception:
             self.log.error("Error in on_msg_callback", exc_info=True)
 
     def stop(self) -> None:
+        self._stop_delivery()
         self.close()
 
     def __del__(self):
@@ -1040,6 +1176,9 @@ class PSubscriber(Subscriber):
         kwargs["topic"] = kwargs["topic"].replace("*", "#")
         super(PSubscriber, self).__init__(*args, **kwargs)
 
+    def _conflation_key(self, ch, method, properties, body):
+        return method.routing_key
+
     def _on_msg_callback_wrapper(self, ch, method, properties, body):
         _data = {}
         _ctype = None
@@ -1056,9 +1195,7 @@ class PSubscriber(Subscriber):
             self.log.debug("Error reading message properties", exc_info=True)
 
         try:
-            if self._compression != CompressionType.NO_COMPRESSION:
-                body = deflate(body)
-            _data = self._serializer.deserialize(body)
+            _data = self._codec.decode(body)
         except Exception:
             self.log.error("Could not deserialize data", exc_info=True)
             # Return data as is. Let callback handle with encoding...
@@ -1073,13 +1210,10 @@ class PSubscriber(Subscriber):
             return
 
         try:
-            if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, _data, _topic)
-                else:
-                    _clb = functools.partial(
-                        self.onmessage, self._msg_type(**_data), _topic
-                    )
+            if self._batcher is not None:
+                self._batcher.add((self._make_msg(_data), _topic))
+            elif self.onmessage is not None:
+                _clb = functools.partial(self.onmessage, self._make_msg(_data), _topic)
                 _clb()
         except Exception:
             self.log.error("Error in on_msg_callback", exc_info=True)
@@ -1099,33 +1233,59 @@ class ActionService(BaseActionService):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_send_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._cancel_rpc = RPCService(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_cancel_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._result_rpc = RPCService(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_get_result,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._feedback_pub = Publisher(
             msg_type=_ActionFeedbackMessage,
             topic=self._feedback_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._status_pub = Publisher(
             msg_type=_ActionStatusMessage,
             topic=self._status_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
 
@@ -1145,35 +1305,59 @@ class ActionClient(BaseActionClient):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._cancel_client = RPCClient(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._result_client = RPCClient(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._status_sub = Subscriber(
             msg_type=_ActionStatusMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._status_topic,
             on_message=self._on_status,
         )
         self._status_sub = Subscriber(
             msg_type=_ActionStatusMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._status_topic,
             on_message=self._on_status,
         )
         self._feedback_sub = Subscriber(
             msg_type=_ActionFeedbackMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._feedback_topic,
             on_message=self._on_feedback,
         )
@@ -1,5 +1,6 @@
 import functools
 import logging
+import threading
 import time
 from typing import Any, Callable, Dict, List, Tuple
 
@@ -24,6 +25,7 @@ from commlib.action import (
 from commlib.compression import CompressionType
 from commlib.connection import BaseConnectionParameters
 from commlib.exceptions import RPCClientTimeoutError, RPCRequestError
+from commlib.framing import FrameCodec
 from commlib.msg import PubSubMessage, RPCMessage
 from commlib.pubsub import BasePublisher, BaseSubscriber
 from commlib.rpc import (
@@ -61,12 +63,16 @@ class KafkaTransport(BaseTransport):
         self,
         compression: CompressionType = CompressionType.DEFAULT_COMPRESSION,
         serializer: Serializer = JSONSerializer(),
+        codec: FrameCodec = None,
         *args,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
         self._serializer = serializer
         self._compression = compression
+        if codec is None:
+            codec = FrameCodec(serializer=serializer, compression=compression)
+        self._codec = codec
         self._producers: List[Producer] = []
         self._consumers: List[Consumer] = []
         self.connect()
@@ -115,11 +121,67 @@ class KafkaTransport(BaseTransport):
         on_delivery=None,
     ):
         producer.poll(0)
-        payload = self._serializer.serialize(data)
+        payload = self._codec.encode(data, topic)
         if on_delivery is None:
             on_delivery = self._on_publish
         producer.produce(topic, key=key, value=payload, on_delivery=on_delivery)
 
+    def publish_data_batch(
+        self,
+        producer: Producer,
+        msgs: List[Tuple[str, Dict, str]],
+        on_delivery=None,
+    ):
+        """publish_data_batch.
+        Produce a batch of messages, serving delivery callbacks once.
+
+        Args:
+            producer (Producer): The producer
+            msgs (List[Tuple[str, Dict, str]]): (topic, data, key) tuples
+            on_delivery: Delivery callback
+        """
+        if on_delivery is None:
+            on_delivery = self._on_publish
+        for topic, data, key in msgs:
+            payload = self._codec.encode(data, topic)
+            self._produce(producer, topic, key, payload, on_delivery)
+        producer.poll(0)
+
+    def publish_data_many(
+        self,
+        producer: Producer,
+        data: Dict,
+        topics: List[str],
+        key: str = "",
+        on_delivery=None,
+    ):
+        """publish_data_many.
+        Produce a message to many topics. The message is encoded once.
+
+        Args:
+            producer (Producer): The producer
+            data (Dict): The message
+            topics (List[str]): Topics
+            key (str): Key of the message
+            on_delivery: Delivery callback
+        """
+        if len(topics) == 0:
+            return
+        if on_delivery is None:
+            on_delivery = self._on_publish
+        payload = self._codec.encode(data, topics[0])
+        for topic in topics:
+            self._produce(producer, topic, key, payload, on_delivery)
+        producer.poll(0)
+
+    def _produce(self, producer: Producer, topic, key, payload, on_delivery):
+        try:
+            producer.produce(topic, key=key, value=payload, on_delivery=on_delivery)
+        except BufferError:
+            # Local queue full, wait for deliveries to free space
+            producer.poll(1)
+            producer.produce(topic, key=key, value=payload, on_delivery=on_delivery)
+
     def _on_publish(self, err, msg):
         pass
 
@@ -136,6 +198,7 @@ class Publisher(BasePublisher):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
         )
 
     def _create_kafka_conf(self):
@@ -161,10 +224,12 @@ class Publisher(BasePublisher):
     def publish(self, msg: PubSubMessage, key: str = "") -> None:
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
+        if key in (None, "") and self._batch(msg):
+            return
         if key in (None, ""):
             key = self._key
 
@@ -173,6 +238,21 @@ class Publisher(BasePublisher):
         )
         self._msg_seq += 1
 
+    def publish_batch(self, msgs: List[PubSubMessage], key: str = "") -> None:
+        """publish_batch.
+
+        Args:
+            msgs (List[PubSubMessage]): Messages to publish
+            key (str): Key of the messages. Publisher key if not given.
+        """
+        if key in (None, ""):
+            key = self._key
+        batch = [(self._topic, self._check_msg(msg), key) for msg in msgs]
+        self._transport.publish_data_batch(
+            self._producer, batch, on_delivery=self._on_delivery
+        )
+        self._msg_seq += len(batch)
+
     def _on_delivery(self, err, msg):
         if err is not None:
             self.logger().error(err)
@@ -184,6 +264,8 @@ class Publisher(BasePublisher):
         self._producer = self._transport.create_producer(self._kafka_cfg)
 
     def stop(self):
+        if self._batcher is not None:
+            self._batcher.stop()
         if self._producer is not None:
             self._producer.flush()
 
@@ -196,20 +278,62 @@ class MPublisher(Publisher):
     def publish(self, msg: PubSubMessage, topic: str, key: str = "") -> None:
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
+        if key in (None, "") and self._batch((msg, topic)):
+            return
         if key in (None, ""):
             key = self._key
-        self._producer.poll(0)
-        self._producer.produce(
-            topic, key=key, value=data, on_delivery=self._on_delivery
+        self._transport.publish_data(
+            self._producer, data, topic, key, on_delivery=self._on_delivery
         )
         self._msg_seq += 1
 
+    def publish_batch(
+        self, msgs: List[Tuple[PubSubMessage, str]], key: str = ""
+    ) -> None:
+        """publish_batch.
+
+        Args:
+            msgs (List[Tuple[PubSubMessage, str]]): (message, topic) pairs
+            key (str): Key of the messages. Publisher key if not given.
+        """
+        if key in (None, ""):
+            key = self._key
+        batch = [(topic, self._check_msg(msg), key) for msg, topic in msgs]
+        self._transport.publish_data_batch(
+            self._producer, batch, on_delivery=self._on_delivery
+        )
+        self._msg_seq += len(batch)
+
+    def publish_to_many(self, msg: PubSubMessage, topics: List[str], key: str = ""):
+        """publish_to_many.
+        Publish a message to many topics. It is serialized and compressed
+        once.
+
+        Args:
+            msg (PubSubMessage): Message to publish
+            topics (List[str]): Topics to publish the message to
+            key (str): Key of the message. Publisher key if not given.
+        """
+        if key in (None, ""):
+            key = self._key
+        self._transport.publish_data_many(
+            self._producer,
+            self._check_msg(msg),
+            topics,
+            key,
+            on_delivery=self._on_delivery,
+        )
+        self._msg_seq += len(topics)
+
 
 class Subscriber(BaseSubscriber):
+    # Batches are received with Consumer.consume()
+    NATIVE_BATCHING = True
+
     def __init__(self, key: str = "", *args, **kwargs):
         self._key = key
         self._consumer: Consumer = None
@@ -219,6 +343,7 @@ class Subscriber(BaseSubscriber):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
         )
 
     def _create_kafka_conf(self):
@@ -252,6 +377,13 @@ class Subscriber(BaseSubscriber):
         try:
             self._consumer.subscribe([self._topic], on_assign=self._on_assign)
             while running:
+                if self.onmessages is not None:
+                    msgs = self._consumer.consume(
+                        num_messages=self._max_batch, timeout=self._max_wait
+                    )
+                    if msgs:
+                        self._receive(self._on_messages, msgs)
+                    continue
                 msg = self._consumer.poll(timeout=1.0)
                 if msg is None:
                     continue
@@ -265,7 +397,7 @@ class Subscriber(BaseSubscriber):
                     elif msg.error():
                         raise KafkaException(msg.error())
                 else:
-                    self._on_message(msg)
+                    self._receive(self._on_message, msg)
                     # self._consumer.store_offsets(msg)
                     # self._consumer.commit(asynchronous=False)
         finally:
@@ -286,36 +418,56 @@ class Subscriber(BaseSubscriber):
         try:
             data, topic, key, ts = self._unpack_comm_msg(msg)
             if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, data)
-                else:
-                    _clb = functools.partial(self.onmessage, self._msg_type(**data))
+                _clb = functools.partial(self.onmessage, self._make_msg(data))
                 _clb()
         except Exception:
             self.log.error("Exception caught in _on_message", exc_info=True)
 
+    def _on_messages(self, msgs: List[Any]):
+        batch = []
+        for msg in msgs:
+            if msg.error():
+                # The rest of the batch is still delivered
+                if msg.error().code() != KafkaError._PARTITION_EOF:
+                    self.log.error(f"Consumer error: {msg.error()}")
+                continue
+            try:
+                batch.append(self._batch_item(*self._unpack_comm_msg(msg)))
+            except Exception:
+                self.log.error("Exception caught in _on_messages", exc_info=True)
+        self._on_batch(batch)
+
+    def _batch_item(self, data: Dict, topic: str, key: Any, ts: Any) -> Any:
+        return self._make_msg(data)
+
+    def _conflation_key(self, msg: Any) -> Any:
+        # Latest message per message key
+        return msg.key()
+
     def _unpack_comm_msg(self, msg: Any) -> Tuple:
         _topic = msg.topic()
         _key = msg.key()
         _timestamp = msg.timestamp()
-        _data = self._serializer.deserialize(msg.value())
+        _data = self._codec.decode(msg.value())
         return _data, _topic, _key, _timestamp
 
     def stop(self):
+        self._stop_delivery()
         self._consumer.close()
 
 
 class PSubscriber(Subscriber):
+    def _batch_item(self, data: Dict, topic: str, key: Any, ts: Any) -> Any:
+        return self._make_msg(data), topic
+
+    def _conflation_key(self, msg: Any) -> Any:
+        return msg.topic(), msg.key()
+
     def _on_message(self, msg: Any):
         try:
             data, topic, key, ts = self._unpack_comm_msg(msg)
             if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, data, topic)
-                else:
-                    _clb = functools.partial(
-                        self.onmessage, self._msg_type(**data), topic
-                    )
+                _clb = functools.partial(self.onmessage, self._make_msg(data), topic)
                 _clb()
         except Exception:
             self.log.error("Exception caught in _on_message", exc_info=True)
@@ -333,6 +485,7 @@ class RPCService(BaseRPCService):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
         )
 
     def _send_response(self, data: Dict[str, Any], reply_to: str):
@@ -357,7 +510,9 @@ class RPCService(BaseRPCService):
             if self._msg_type is None:
                 resp = self.on_request(req_msg.data)
             else:
-                resp = self.on_request(self._msg_type.Request(**req_msg.data))
+                resp = self.on_request(
+                    self._build_msg(self._msg_type.Request, req_msg.data)
+                )
                 # RPCMessage.Response object here
                 resp = resp.dict()
             self._send_response(resp, req_msg.header.reply_to)
@@ -367,7 +522,7 @@ class RPCService(BaseRPCService):
     def _unpack_comm_msg(self, msg: Any) -> Tuple[CommRPCMessage, str]:
         try:
             _uri = msg.topic
-            _payload = self._serializer.deserialize(msg.payload)
+            _payload = self._codec.decode(msg.payload)
             _data = _payload["data"]
             _header = _payload["header"]
             _req_msg = CommRPCMessage(header=CommRPCHeader(**_header), data=_data)
@@ -383,12 +538,8 @@ class RPCService(BaseRPCService):
             self._rpc_name, self._on_request_handle, qos=MQTTQoS.L1
         )
         self._transport.start()
-        while True:
-            if self._t_stop_event is not None:
-                if self._t_stop_event.is_set():
-                    self.log.debug("Stop event caught in thread")
-                    break
-            time.sleep(0.001)
+        self._t_stop_event.wait()
+        self.log.debug("Stop event caught in thread")
         self._transport.stop()
 
 
@@ -405,6 +556,7 @@ class RPCServer(BaseRPCServer):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
         )
         for uri in self._svc_map:
             callback = self._svc_map[uri][0]
@@ -455,7 +607,7 @@ class RPCServer(BaseRPCServer):
                 if msg_type is None:
                     resp = clb(req_msg.data)
                 else:
-                    resp = clb(msg_type.Request(**req_msg.data))
+                    resp = clb(self._build_msg(msg_type.Request, req_msg.data))
                     resp = resp.dict()
             self._send_response(resp, req.header.reply_to)
         except Exception as exc:
@@ -475,7 +627,7 @@ class RPCServer(BaseRPCServer):
         """
         try:
             _uri = msg.topic
-            _payload = self._serializer.deserialize(msg.payload)
+            _payload = self._codec.decode(msg.payload)
             _data = _payload["data"]
             _header = _payload["header"]
             _req_msg = CommRPCMessage(header=CommRPCHeader(**_header), data=_data)
@@ -499,12 +651,8 @@ class RPCServer(BaseRPCServer):
     def run_forever(self):
         """run_forever."""
         self._transport.start()
-        while True:
-            if self._t_stop_event is not None:
-                if self._t_stop_event.is_set():
-                    self.log.debug("Stop event caught in thread")
-                    break
-            time.sleep(0.001)
+        self._t_stop_event.wait()
+        self.log.debug("Stop event caught in thread")
         self._transport.stop()
 
 
@@ -521,12 +669,14 @@ class RPCClient(BaseRPCClient):
             kwargs: See BaseRPCClient
         """
         self._response = None
+        self._response_event = threading.Event()
 
         super(RPCClient, self).__init__(*args, **kwargs)
         self._transport = MQTTTransport(
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
         )
 
     def _gen_queue_name(self):
@@ -558,10 +708,11 @@ class RPCClient(BaseRPCClient):
             self.log.error(exc, exc_info=True)
             data = {}
         self._response = data
+        self._response_event.set()
 
     def _unpack_comm_msg(self, msg: Any) -> Tuple[Any, Any, Any]:
         _uri = msg.topic
-        _payload = self._serializer.deserialize(msg.payload)
+        _payload = self._codec.decode(msg.payload)
         _data = _payload["data"]
         _header = _payload["header"]
         return _data, _header, _uri
@@ -572,12 +723,8 @@ class RPCClient(BaseRPCClient):
         Args:
             timeout (float): timeout
         """
-        start_t = time.time()
-        while self._response is None:
-            elapsed_t = time.time() - start_t
-            if elapsed_t >= timeout:
-                raise RPCClientTimeoutError(f"Response timeout after {timeout} seconds")
-            time.sleep(0.001)
+        if not self._response_event.wait(timeout):
+            raise RPCClientTimeoutError(f"Response timeout after {timeout} seconds")
         return self._response
 
     def call(self, msg: RPCMessage.Request, timeout: float = 30) -> RPCMessage.Response:
@@ -595,6 +742,7 @@ class RPCClient(BaseRPCClient):
             data = msg.dict()
 
         self._response = None
+        self._response_event.clear()
 
         _msg = self._prepare_request(data)
         _reply_to = _msg["header"]["reply_to"]
@@ -632,33 +780,54 @@ class ActionService(BaseActionService):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             on_request=self._handle_send_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._cancel_rpc = RPCService(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             on_request=self._handle_cancel_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._result_rpc = RPCService(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             on_request=self._handle_get_result,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._feedback_pub = Publisher(
             msg_type=_ActionFeedbackMessage,
             topic=self._feedback_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             debug=self.debug,
         )
         self._status_pub = Publisher(
             msg_type=_ActionStatusMessage,
             topic=self._status_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             debug=self.debug,
         )
 
@@ -681,23 +850,35 @@ class ActionClient(BaseActionClient):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             debug=self.debug,
         )
         self._cancel_client = RPCClient(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             debug=self.debug,
         )
         self._result_client = RPCClient(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             debug=self.debug,
         )
         self._status_sub = Subscriber(
             msg_type=_ActionStatusMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             topic=self._status_topic,
             on_message=self._on_status,
             debug=self.debug,
@@ -705,6 +886,9 @@ class ActionClient(BaseActionClient):
         self._feedback_sub = Subscriber(
             msg_type=_ActionFeedbackMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
             topic=self._feedback_topic,
             on_message=self._on_feedback,
             debug=self.debug,
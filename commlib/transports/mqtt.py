@@ -1,8 +1,14 @@
 import functools
 import logging
+import selectors
+import socket
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from enum import IntEnum
-from typing import Any, Callable, Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.packettypes import PacketTypes
@@ -17,9 +23,10 @@ from commlib.action import (
     _ActionResultMessage,
     _ActionStatusMessage,
 )
-from commlib.compression import CompressionType, deflate, inflate_str
+from commlib.compression import CompressionType
 from commlib.connection import BaseConnectionParameters
 from commlib.exceptions import RPCClientTimeoutError, RPCRequestError
+from commlib.framing import FrameCodec
 from commlib.msg import PubSubMessage, RPCMessage
 from commlib.pubsub import BasePublisher, BaseSubscriber
 from commlib.rpc import (
@@ -71,6 +78,432 @@ class ConnectionParameters(BaseConnectionParameters):
     ssl: bool = False
     transport: str = "tcp"
     keepalive: int = 60
+    # Drive the client from the I/O reactor thread of the process (see
+    # MQTTReactor), instead of a network thread per client
+    reactor: bool = False
+
+
+def _rpc_properties(msg: Any) -> Tuple[Optional[str], Optional[str]]:
+    """_rpc_properties.
+    Response topic and correlation id of a received MQTT v5 message, if
+    set by the sender.
+
+    Args:
+        msg (Any): Received message
+    """
+    properties = getattr(msg, "properties", None)
+    response_topic = getattr(properties, "ResponseTopic", None)
+    corr_id = getattr(properties, "CorrelationData", None)
+    if corr_id is not None:
+        corr_id = bytes(corr_id).decode()
+    return response_topic, corr_id
+
+
+def _connect_properties(conn_params: ConnectionParameters) -> Optional[Properties]:
+    # Workaround for both v3 and v5 support
+    # http://www.steves-internet-guide.com/python-mqtt-client-changes/
+    if conn_params.protocol == MQTTProtocolType.MQTTv5:
+        properties = Properties(PacketTypes.CONNECT)
+        properties.MaximumPacketSize = 20
+    else:
+        properties = None
+    return properties
+
+
+def _create_client(conn_params: ConnectionParameters) -> mqtt.Client:
+    client = mqtt.Client(
+        clean_session=True,
+        protocol=conn_params.protocol,
+        transport=conn_params.transport,
+    )
+    client.username_pw_set(conn_params.username, conn_params.password)
+    return client
+
+
+def _connect_client(
+    client: mqtt.Client,
+    conn_params: ConnectionParameters,
+    properties: Optional[Properties],
+) -> None:
+    client.connect(
+        conn_params.host,
+        int(conn_params.port),
+        keepalive=conn_params.keepalive,
+        properties=properties,
+    )
+    if conn_params.ssl:
+        import ssl
+
+        client.tls_set(cert_reqs=None, certfile=None, keyfile=None)
+
+
+class MQTTReactor:
+    """MQTTReactor.
+    Drives the network I/O of many paho clients from a single thread,
+    with selectors, in place of a loop_start() thread per client. Clients
+    are served with loop_read(), loop_write() and loop_misc(), and are
+    reconnected until removed from the reactor.
+    """
+
+    @classmethod
+    def logger(cls) -> logging.Logger:
+        return MQTTTransport.logger()
+
+    def __init__(
+        self,
+        misc_interval: float = 1.0,
+        reconnect_delay: float = 1.0,
+        name: str = "mqtt-reactor",
+    ):
+        """__init__.
+
+        Args:
+            misc_interval (float): Interval (seconds) of the keepalive
+                handling of the clients (loop_misc)
+            reconnect_delay (float): Delay (seconds) between reconnection
+                attempts of a disconnected client
+            name (str): Name of the reactor thread
+        """
+        self._misc_interval = misc_interval
+        self._reconnect_delay = reconnect_delay
+        self._name = name
+        self._selector = selectors.DefaultSelector()
+        # Client -> time of the next reconnection attempt, once the
+        # connection is lost
+        self._clients: Dict[mqtt.Client, Optional[float]] = {}
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+    @property
+    def log(self) -> logging.Logger:
+        return self.logger()
+
+    @property
+    def clients(self) -> int:
+        """Number of clients driven by the reactor."""
+        return len(self._clients)
+
+    def add(self, client: mqtt.Client) -> None:
+        """add.
+        Drive a client from the reactor. Clients are best added before
+        connecting them.
+
+        Args:
+            client (mqtt.Client): The client
+        """
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._call(self._add, client)
+        self.start()
+
+    def remove(self, client: mqtt.Client) -> None:
+        """remove.
+        Stop driving a client. Pending packets (e.g. a DISCONNECT) are
+        flushed first.
+
+        Args:
+            client (mqtt.Client): The client
+        """
+        self._call(self._remove, client)
+
+    def start(self) -> None:
+        """start.
+        Start the reactor thread.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self._name, daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        """stop.
+        Stop the reactor thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._wakeup()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def _call(self, fn: Callable, *args) -> None:
+        # Selectors are not thread safe: changes are applied on the
+        # reactor thread
+        if threading.current_thread() is self._thread:
+            fn(*args)
+            return
+        self._pending.append((fn, args))
+        self._wakeup()
+
+    def _wakeup(self) -> None:
+        try:
+            self._wakeup_w.send(b"\x00")
+        except BlockingIOError:
+            pass
+
+    def _add(self, client: mqtt.Client) -> None:
+        self._clients[client] = None
+        sock = client.socket()
+        if sock is not None:
+            self._register(client, sock)
+
+    def _remove(self, client: mqtt.Client) -> None:
+        if client not in self._clients:
+            return
+        del self._clients[client]
+        sock = client.socket()
+        if sock is None:
+            return
+        if client.want_write():
+            client.loop_write()
+        self._unregister(sock)
+
+    def _register(self, client: mqtt.Client, sock: Any) -> None:
+        if client in self._clients:
+            self._clients[client] = None
+        events = selectors.EVENT_READ
+        if client.want_write():
+            events |= selectors.EVENT_WRITE
+        try:
+            self._selector.register(sock, events, client)
+        except KeyError:
+            self._selector.modify(sock, events, client)
+
+    def _unregister(self, sock: Any) -> None:
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def _set_write(self, client: mqtt.Client, sock: Any, write: bool) -> None:
+        events = selectors.EVENT_READ
+        if write:
+            events |= selectors.EVENT_WRITE
+        try:
+            self._selector.modify(sock, events, client)
+        except (KeyError, ValueError):
+            pass
+
+    def _on_socket_open(self, client: Any, userdata: Any, sock: Any) -> None:
+        self._call(self._register, client, sock)
+
+    def _on_socket_close(self, client: Any, userdata: Any, sock: Any) -> None:
+        self._call(self._on_closed, client, sock)
+
+    def _on_closed(self, client: mqtt.Client, sock: Any) -> None:
+        self._unregister(sock)
+        if client in self._clients:
+            # Lost, not removed: reconnect
+            self._clients[client] = time.monotonic() + self._reconnect_delay
+
+    def _on_socket_register_write(self, client: Any, userdata: Any, sock: Any):
+        self._call(self._set_write, client, sock, True)
+
+    def _on_socket_unregister_write(self, client: Any, userdata: Any, sock: Any):
+        self._call(self._set_write, client, sock, False)
+
+    def _run_pending(self) -> None:
+        while self._pending:
+            fn, args = self._pending.popleft()
+            try:
+                fn(*args)
+            except Exception:
+                self.log.error("Exception caught in MQTT reactor", exc_info=True)
+
+    def _misc(self, now: float) -> None:
+        for client, reconnect_t in list(self._clients.items()):
+            try:
+                if client.socket() is not None:
+                    client.loop_misc()
+                elif reconnect_t is not None and now >= reconnect_t:
+                    self._clients[client] = now + self._reconnect_delay
+                    client.reconnect()
+            except Exception as exc:
+                self.log.debug(f"MQTT reactor client error: {exc}")
+
+    def _run(self) -> None:
+        self._run_pending()
+        next_misc = time.monotonic() + self._misc_interval
+        while self._thread is threading.current_thread():
+            timeout = max(0.0, next_misc - time.monotonic())
+            for key, events in self._selector.select(timeout):
+                client = key.data
+                if client is None:
+                    try:
+                        while self._wakeup_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    if events & selectors.EVENT_READ:
+                        client.loop_read()
+                    if events & selectors.EVENT_WRITE and client.socket() is not None:
+                        client.loop_write()
+                except Exception:
+                    self.log.error("Exception caught in MQTT reactor", exc_info=True)
+            self._run_pending()
+            now = time.monotonic()
+            if now >= next_misc:
+                self._misc(now)
+                next_misc = now + self._misc_interval
+
+
+_reactor: Optional[MQTTReactor] = None
+_reactor_lock = threading.Lock()
+
+
+def get_reactor() -> MQTTReactor:
+    """get_reactor.
+    The I/O reactor of the process, shared by the MQTT clients of
+    connections with reactor=True.
+    """
+    global _reactor
+    if _reactor is None:
+        with _reactor_lock:
+            if _reactor is None:
+                _reactor = MQTTReactor()
+    return _reactor
+
+
+class Connection:
+    """Connection.
+    MQTT client shared by many endpoints, e.g. the endpoints of a Node.
+    Received messages are routed to the endpoints by topic filter, and a
+    single network loop serves all of them.
+    """
+
+    @classmethod
+    def logger(cls) -> logging.Logger:
+        return MQTTTransport.logger()
+
+    def __init__(self, conn_params: ConnectionParameters):
+        """__init__.
+
+        Args:
+            conn_params (ConnectionParameters): conn_params
+        """
+        self._conn_params = conn_params
+        self._properties = _connect_properties(conn_params)
+        self._routes: Dict[str, List[Callable]] = {}
+        self._qos: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._client = _create_client(conn_params)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._reactor = get_reactor() if conn_params.reactor else None
+        if self._reactor is not None:
+            self._reactor.add(self._client)
+        _connect_client(self._client, conn_params, self._properties)
+
+    @property
+    def log(self) -> logging.Logger:
+        return self.logger()
+
+    @property
+    def client(self) -> mqtt.Client:
+        return self._client
+
+    def _on_connect(
+        self,
+        client: Any,
+        userdata: Any,
+        flags: Dict[str, Any],
+        rc: int,
+        properties: Any = None,
+    ):
+        if rc != MQTTReturnCode.CONNECTION_SUCCESS:
+            return
+        self.log.debug(
+            f"Connected to MQTT Broker <mqtt://"
+            + f"{self._conn_params.host}:{self._conn_params.port}>"
+        )
+        # Restore the subscriptions of the endpoints (clean session)
+        with self._lock:
+            for topic, qos in self._qos.items():
+                client.subscribe(topic, qos=qos, properties=self._properties)
+
+    def _on_disconnect(self, client: Any, userdata: Any, rc: int):
+        if rc == 5:
+            self.log.debug(f"Authentication error with MQTT broker")
+        elif rc > 0:
+            self.log.debug(f"Disconnection from MQTT Broker")
+
+    def subscribe(self, topic: str, callback: Callable, qos: MQTTQoS) -> None:
+        """subscribe.
+        Subscribe to a topic filter. Many callbacks can be subscribed to
+        the same filter.
+
+        Args:
+            topic (str): Topic filter
+            callback (Callable): Called with (client, userdata, msg)
+            qos (MQTTQoS): MQTT QoS Level
+        """
+        with self._lock:
+            callbacks = self._routes.setdefault(topic, [])
+            callbacks.append(callback)
+            if len(callbacks) > 1 and qos <= self._qos[topic]:
+                return
+            self._qos[topic] = qos
+            self._client.subscribe(
+                topic, qos=qos, options=None, properties=self._properties
+            )
+            self._client.message_callback_add(
+                topic, functools.partial(self._route, topic)
+            )
+
+    def unsubscribe(self, topic: str, callback: Callable) -> None:
+        """unsubscribe.
+
+        Args:
+            topic (str): Topic filter
+            callback (Callable): A subscribed callback
+        """
+        with self._lock:
+            callbacks = self._routes.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if len(callbacks) == 0 and topic in self._routes:
+                del self._routes[topic]
+                del self._qos[topic]
+                self._client.message_callback_remove(topic)
+                self._client.unsubscribe(topic)
+
+    def _route(self, topic: str, client: Any, userdata: Any, msg: Any) -> None:
+        for callback in tuple(self._routes.get(topic, ())):
+            callback(client, userdata, msg)
+
+    def start(self) -> None:
+        """start.
+        Start the network loop, once for all endpoints.
+        """
+        with self._lock:
+            if not self._started:
+                if self._reactor is None:
+                    self._client.loop_start()
+                self._started = True
+
+    def close(self) -> None:
+        """close.
+        Disconnect and stop the network loop.
+        """
+        self._client.disconnect()
+        if self._reactor is not None:
+            self._reactor.remove(self._client)
+        else:
+            self._client.loop_stop()
+        self._started = False
 
 
 class MQTTTransport(BaseTransport):
@@ -87,6 +520,8 @@ class MQTTTransport(BaseTransport):
         self,
         serializer: Serializer = JSONSerializer(),
         compression: CompressionType = CompressionType.DEFAULT_COMPRESSION,
+        codec: FrameCodec = None,
+        connection: Optional[Connection] = None,
         *args,
         **kwargs,
     ):
@@ -96,21 +531,38 @@ class MQTTTransport(BaseTransport):
             conn_params (ConnectionParameters): conn_params
             serializer (Serializer): serializer
             compression (CompressionType): compression_type
+            codec (FrameCodec): Encodes and decodes payloads. Built from
+                serializer and compression if not given.
+            connection (Optional[Connection]): Shared connection (client
+                and network loop). A new client is connected if not given.
         """
         super().__init__(*args, **kwargs)
         self._client = None
+        self._connection = connection
+        self._reactor = None
+        self._subscriptions: List[Tuple[str, Callable]] = []
+        self._qos: Dict[str, int] = {}
+        self._stop_event = threading.Event()
         self._serializer = serializer
         self._compression = compression
-
-        # Workaround for both v3 and v5 support
-        # http://www.steves-internet-guide.com/python-mqtt-client-changes/
-        if self._conn_params.protocol == MQTTProtocolType.MQTTv5:
-            properties = Properties(PacketTypes.CONNECT)
-            properties.MaximumPacketSize = 20
+        if codec is None:
+            codec = FrameCodec(serializer=serializer, compression=compression)
+        self._codec = codec
+        self._mqtt_properties = _connect_properties(self._conn_params)
+        if connection is not None:
+            self._client = connection.client
+            self._connected = True
         else:
-            properties = None
-        self._mqtt_properties = properties
-        self.connect()
+            self.connect()
+
+    @property
+    def connection(self) -> Optional[Connection]:
+        return self._connection
+
+    @property
+    def external_loop(self) -> bool:
+        """The network loop is run by a shared connection or the reactor."""
+        return self._connection is not None or self._reactor is not None
 
     def on_connect(
         self,
@@ -133,6 +585,9 @@ class MQTTTransport(BaseTransport):
         if rc == MQTTReturnCode.CONNECTION_SUCCESS:
             self._connected = True
             self._report_on_connect()
+            # Restore the subscriptions (clean session)
+            for topic, qos in tuple(self._qos.items()):
+                client.subscribe(topic, qos=qos, properties=self._mqtt_properties)
 
     def _report_on_connect(self):
         self.log.debug("MQTT Transport initiated:")
@@ -153,7 +608,8 @@ class MQTTTransport(BaseTransport):
             rc (int): Return Code - Internal paho-mqtt
         """
         self._connected = False
-        self._client.loop_stop()
+        if self._reactor is None:
+            self._client.loop_stop()
         if rc == 5:
             self.log.debug(f"Authentication error with MQTT broker")
         elif rc > 0:
@@ -180,6 +636,7 @@ class MQTTTransport(BaseTransport):
         payload: Dict[str, Any],
         qos: MQTTQoS = MQTTQoS.L0,
         retain: bool = False,
+        properties: Optional[Properties] = None,
     ):
         """publish.
 
@@ -189,15 +646,86 @@ class MQTTTransport(BaseTransport):
             qos (int): MQTT QoS Level (see MQTTQoS class)
             retain (bool): If set to True, then it tells the broker to store
                 that message on the topic as the “last good message”.
+            properties (Optional[Properties]): MQTT v5 publish properties
         """
         topic = topic.replace(".", "/")
-        pl = self._serializer.serialize(payload)
-        if self._compression != CompressionType.NO_COMPRESSION:
-            pl = inflate_str(pl)
+        pl = self._codec.encode(payload, topic)
+        if properties is None:
+            properties = self._mqtt_properties
         ph = self._client.publish(
-            topic, pl, qos=qos, retain=retain, properties=self._mqtt_properties
+            topic, pl, qos=qos, retain=retain, properties=properties
         )
 
+    def rpc_properties(
+        self, corr_id: Optional[str], response_topic: Optional[str] = None
+    ) -> Optional[Properties]:
+        """rpc_properties.
+        MQTT v5 publish properties of a request or a response. None for
+        other protocol versions, which carry them in the message header.
+
+        Args:
+            corr_id (Optional[str]): Correlation id
+            response_topic (Optional[str]): Response topic of a request
+        """
+        if self._conn_params.protocol != MQTTProtocolType.MQTTv5:
+            return None
+        properties = Properties(PacketTypes.PUBLISH)
+        if response_topic is not None:
+            properties.ResponseTopic = response_topic.replace(".", "/")
+        if corr_id is not None:
+            properties.CorrelationData = corr_id.encode()
+        return properties
+
+    def publish_batch(
+        self,
+        msgs: List[Tuple[str, Dict[str, Any]]],
+        qos: MQTTQoS = MQTTQoS.L0,
+        retain: bool = False,
+    ):
+        """publish_batch.
+        Publish a batch of messages. Payloads are encoded first, and the
+        publish packets are then queued back to back, to be flushed
+        together by the network loop.
+
+        Args:
+            msgs (List[Tuple[str, Dict[str, Any]]]): (topic, data) pairs
+            qos (int): MQTT QoS Level (see MQTTQoS class)
+            retain (bool): Retain the messages on the broker
+        """
+        packets = []
+        for topic, data in msgs:
+            topic = topic.replace(".", "/")
+            packets.append((topic, self._codec.encode(data, topic)))
+        for topic, pl in packets:
+            self._client.publish(
+                topic, pl, qos=qos, retain=retain, properties=self._mqtt_properties
+            )
+
+    def publish_many(
+        self,
+        topics: List[str],
+        payload: Dict[str, Any],
+        qos: MQTTQoS = MQTTQoS.L0,
+        retain: bool = False,
+    ):
+        """publish_many.
+        Publish a message to many topics. The message is encoded once.
+
+        Args:
+            topics (List[str]): Topics
+            payload (Dict[str, Any]): The message
+            qos (int): MQTT QoS Level (see MQTTQoS class)
+            retain (bool): Retain the message on the broker
+        """
+        topics = [topic.replace(".", "/") for topic in topics]
+        if len(topics) == 0:
+            return
+        pl = self._codec.encode(payload, topics[0])
+        for topic in topics:
+            self._client.publish(
+                topic, pl, qos=qos, retain=retain, properties=self._mqtt_properties
+            )
+
     def subscribe(
         self, topic: str, callback: Callable, qos: MQTTQoS = MQTTQoS.L0
     ) -> str:
@@ -213,10 +741,15 @@ class MQTTTransport(BaseTransport):
         """
         # Adds subtopic specific callback handlers
         topic = topic.replace(".", "/").replace("*", "#")
+        _clb = functools.partial(self._on_msg_internal, callback)
+        if self._connection is not None:
+            self._connection.subscribe(topic, _clb, qos)
+            self._subscriptions.append((topic, _clb))
+            return topic
+        self._qos[topic] = qos
         self._client.subscribe(
             topic, qos=qos, options=None, properties=self._mqtt_properties
         )
-        _clb = functools.partial(self._on_msg_internal, callback)
         self._client.message_callback_add(topic, _clb)
         return topic
 
@@ -227,38 +760,23 @@ class MQTTTransport(BaseTransport):
         _payload = msg.payload
         _qos = msg.qos
         _retain = msg.retain
-        if self._compression != CompressionType.NO_COMPRESSION:
-            _payload = deflate(_payload)
-        msg.payload = _payload
+        # Payloads are decoded by the endpoints, per message
         callback(client, userdata, msg)
 
     def connect(self):
         if self._connected:
             raise Exception("Already connected")
-        self._client = mqtt.Client(
-            clean_session=True,
-            protocol=self._conn_params.protocol,
-            transport=self._conn_params.transport,
-        )
+        self._client = _create_client(self._conn_params)
 
         self._client.on_connect = self.on_connect
         self._client.on_disconnect = self.on_disconnect
         # self._client.on_log = self.on_log
         self._client.on_message = self.on_message
 
-        self._client.username_pw_set(
-            self._conn_params.username, self._conn_params.password
-        )
-        self._client.connect(
-            self._conn_params.host,
-            int(self._conn_params.port),
-            keepalive=self._conn_params.keepalive,
-            properties=self._mqtt_properties,
-        )
-        if self._conn_params.ssl:
-            import ssl
-
-            self._client.tls_set(cert_reqs=None, certfile=None, keyfile=None)
+        if self._conn_params.reactor:
+            self._reactor = get_reactor()
+            self._reactor.add(self._client)
+        _connect_client(self._client, self._conn_params, self._mqtt_properties)
 
     def disconnect(self) -> None:
         self._client.disconnect()
@@ -268,14 +786,28 @@ class MQTTTransport(BaseTransport):
 
         Start the event loop. Cannot create any more endpoints from here on.
         """
-        self._client.loop_start()
+        if self._connection is not None:
+            self._connection.start()
+        elif self._reactor is None:
+            self._client.loop_start()
 
     def stop(self) -> None:
         """stop.
 
-        Disconnects the client and stops the event loop.
+        Disconnects the client and stops the event loop. With a shared
+        connection, only the subscriptions of the transport are removed.
         """
+        if self._connection is not None:
+            for topic, callback in self._subscriptions:
+                self._connection.unsubscribe(topic, callback)
+            self._subscriptions = []
+            self._stop_event.set()
+            return
         self.disconnect()
+        if self._reactor is not None:
+            self._reactor.remove(self._client)
+            self._stop_event.set()
+            return
         self._client.loop_stop(force=True)
 
     def loop_forever(self):
@@ -283,6 +815,10 @@ class MQTTTransport(BaseTransport):
 
         Starts the loop and waits until termination. This is synchronous.
         """
+        if self.external_loop:
+            self.start()
+            self._stop_event.wait()
+            return
         self._client.loop_forever()
 
 
@@ -304,6 +840,8 @@ class Publisher(BasePublisher):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
 
     def publish(self, msg: PubSubMessage) -> None:
@@ -317,13 +855,28 @@ class Publisher(BasePublisher):
         """
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
+        if self._batch(msg):
+            return
         self._transport.publish(self._topic, data, qos=MQTTQoS.L0)
         self._msg_seq += 1
 
+    def publish_batch(self, msgs: List[PubSubMessage]) -> None:
+        """publish_batch.
+
+        Args:
+            msgs (List[PubSubMessage]): Messages to Publish
+
+        Returns:
+            None:
+        """
+        batch = [(self._topic, self._check_msg(msg)) for msg in msgs]
+        self._transport.publish_batch(batch, qos=MQTTQoS.L0)
+        self._msg_seq += len(batch)
+
 
 class MPublisher(Publisher):
     """MPublisher.
@@ -345,13 +898,43 @@ class MPublisher(Publisher):
         """
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
+        if self._batch((msg, topic)):
+            return
         self._transport.publish(topic, data)
         self._msg_seq += 1
 
+    def publish_batch(self, msgs: List[Tuple[PubSubMessage, str]]) -> None:
+        """publish_batch.
+
+        Args:
+            msgs (List[Tuple[PubSubMessage, str]]): (message, topic) pairs
+
+        Returns:
+            None:
+        """
+        batch = [(topic, self._check_msg(msg)) for msg, topic in msgs]
+        self._transport.publish_batch(batch)
+        self._msg_seq += len(batch)
+
+    def publish_to_many(self, msg: PubSubMessage, topics: List[str]) -> None:
+        """publish_to_many.
+        Publish a message to many topics. It is serialized and compressed
+        once.
+
+        Args:
+            msg (PubSubMessage): msg
+            topics (List[str]): topics
+
+        Returns:
+            None:
+        """
+        self._transport.publish_many(topics, self._check_msg(msg))
+        self._msg_seq += len(topics)
+
 
 class Subscriber(BaseSubscriber):
     """Subscriber.
@@ -370,15 +953,26 @@ class Subscriber(BaseSubscriber):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
 
     def run(self):
-        self._topic = self._transport.subscribe(self._topic, self._on_message)
-        super().run()
+        self._topic = self._transport.subscribe(
+            self._topic, functools.partial(self._receive, self._on_message)
+        )
+        if self._transport.external_loop:
+            # Served by the network loop of the shared connection, or by
+            # the reactor
+            self._transport.start()
+        else:
+            super().run()
         self.log.debug(f"Started Subscriber: <{self._topic}>")
 
     def run_forever(self):
-        self._transport.subscribe(self._topic, self._on_message)
+        self._transport.subscribe(
+            self._topic, functools.partial(self._receive, self._on_message)
+        )
         self.log.debug(f"Started Subscriber: <{self._topic}>")
         self._transport.loop_forever()
 
@@ -393,24 +987,26 @@ class Subscriber(BaseSubscriber):
         # Received MqttMessage (paho)
         try:
             data, uri = self._unpack_comm_msg(msg)
-            if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, data)
-                else:
-                    _clb = functools.partial(self.onmessage, self._msg_type(**data))
+            if self._batcher is not None:
+                self._batcher.add(self._make_msg(data))
+            elif self.onmessage is not None:
+                _clb = functools.partial(self.onmessage, self._make_msg(data))
                 _clb()
         except Exception:
             self.log.error("Exception caught in _on_message", exc_info=True)
 
     def _unpack_comm_msg(self, msg: Any) -> Tuple:
         _uri = msg.topic
-        _data = self._serializer.deserialize(msg.payload)
+        _data = self._codec.decode(msg.payload)
         return _data, _uri
 
 
 class PSubscriber(Subscriber):
     """PSubscriber."""
 
+    def _conflation_key(self, client: Any, userdata: Any, msg: Any) -> Any:
+        return msg.topic
+
     def _on_message(self, client: Any, userdata: Any, msg: Dict[str, Any]):
         """_on_message.
 
@@ -421,13 +1017,10 @@ class PSubscriber(Subscriber):
         """
         try:
             data, topic = self._unpack_comm_msg(msg)
-            if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, data, topic)
-                else:
-                    _clb = functools.partial(
-                        self.onmessage, self._msg_type(**data), topic
-                    )
+            if self._batcher is not None:
+                self._batcher.add((self._make_msg(data), topic))
+            elif self.onmessage is not None:
+                _clb = functools.partial(self.onmessage, self._make_msg(data), topic)
                 _clb()
         except Exception:
             self.log.error("Exception caught in _on_message", exc_info=True)
@@ -450,13 +1043,24 @@ class RPCService(BaseRPCService):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
 
-    def _send_response(self, data: Dict[str, Any], reply_to: str):
-        self._comm_obj.header.timestamp = gen_timestamp()  # pylint: disable=E0237
-        self._comm_obj.data = data
+    def _send_response(
+        self, data: Dict[str, Any], reply_to: str, corr_id: Optional[str] = None
+    ):
+        # Built per response, requests are handled by many workers
         _resp = self._comm_obj.dict()
-        self._transport.publish(reply_to, _resp, qos=MQTTQoS.L1)
+        _resp["header"]["timestamp"] = gen_timestamp()
+        _resp["header"]["correlation_id"] = corr_id
+        _resp["data"] = data
+        self._transport.publish(
+            reply_to,
+            _resp,
+            qos=MQTTQoS.L1,
+            properties=self._transport.rpc_properties(corr_id),
+        )
 
     def _on_request_handle(self, client: Any, userdata: Any, msg: Dict[str, Any]):
         task = self._executor.submit(self._on_request_internal, client, userdata, msg)
@@ -474,17 +1078,24 @@ class RPCService(BaseRPCService):
             if self._msg_type is None:
                 resp = self.on_request(req_msg.data)
             else:
-                resp = self.on_request(self._msg_type.Request(**req_msg.data))
+                resp = self.on_request(
+                    self._build_msg(self._msg_type.Request, req_msg.data)
+                )
                 # RPCMessage.Response object here
                 resp = resp.dict()
-            self._send_response(resp, req_msg.header.reply_to)
+            response_topic, corr_id = _rpc_properties(msg)
+            self._send_response(
+                resp,
+                response_topic or req_msg.header.reply_to,
+                corr_id or req_msg.header.correlation_id,
+            )
         except Exception as exc:
             self.log.error(str(exc), exc_info=True)
 
     def _unpack_comm_msg(self, msg: Any) -> Tuple[CommRPCMessage, str]:
         try:
             _uri = msg.topic
-            _payload = self._serializer.deserialize(msg.payload)
+            _payload = self._codec.decode(msg.payload)
             _data = _payload["data"]
             _header = _payload["header"]
             _req_msg = CommRPCMessage(header=CommRPCHeader(**_header), data=_data)
@@ -500,12 +1111,8 @@ class RPCService(BaseRPCService):
             self._rpc_name, self._on_request_handle, qos=MQTTQoS.L1
         )
         self._transport.start()
-        while True:
-            if self._t_stop_event is not None:
-                if self._t_stop_event.is_set():
-                    self.log.debug("Stop event caught in thread")
-                    break
-            time.sleep(0.001)
+        self._t_stop_event.wait()
+        self.log.debug("Stop event caught in thread")
         self._transport.stop()
 
 
@@ -522,23 +1129,34 @@ class RPCServer(BaseRPCServer):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
         for uri in self._svc_map:
             callback = self._svc_map[uri][0]
             msg_type = self._svc_map[uri][1]
             self._register_endpoint(uri, callback, msg_type)
 
-    def _send_response(self, data: Dict[str, Any], reply_to: str):
+    def _send_response(
+        self, data: Dict[str, Any], reply_to: str, corr_id: Optional[str] = None
+    ):
         """_send_response.
 
         Args:
             data (dict): data
             reply_to (str): reply_to
+            corr_id (Optional[str]): Correlation id of the request
         """
-        self._comm_obj.header.timestamp = gen_timestamp()  # pylint: disable=E0237
-        self._comm_obj.data = data
         _resp = self._comm_obj.dict()
-        self._transport.publish(reply_to, _resp, qos=MQTTQoS.L1)
+        _resp["header"]["timestamp"] = gen_timestamp()
+        _resp["header"]["correlation_id"] = corr_id
+        _resp["data"] = data
+        self._transport.publish(
+            reply_to,
+            _resp,
+            qos=MQTTQoS.L1,
+            properties=self._transport.rpc_properties(corr_id),
+        )
 
     def _on_request_handle(self, client: Any, userdata: Any, msg: Dict[str, Any]):
         task = self._executor.submit(self._on_request_internal, client, userdata, msg)
@@ -572,9 +1190,14 @@ class RPCServer(BaseRPCServer):
                 if msg_type is None:
                     resp = clb(req_msg.data)
                 else:
-                    resp = clb(msg_type.Request(**req_msg.data))
+                    resp = clb(self._build_msg(msg_type.Request, req_msg.data))
                     resp = resp.dict()
-            self._send_response(resp, req.header.reply_to)
+            response_topic, corr_id = _rpc_properties(msg)
+            self._send_response(
+                resp,
+                response_topic or req_msg.header.reply_to,
+                corr_id or req_msg.header.correlation_id,
+            )
         except Exception as exc:
             self.log.error(str(exc), exc_info=False)
             return
@@ -592,7 +1215,7 @@ class RPCServer(BaseRPCServer):
         """
         try:
             _uri = msg.topic
-            _payload = self._serializer.deserialize(msg.payload)
+            _payload = self._codec.decode(msg.payload)
             _data = _payload["data"]
             _header = _payload["header"]
             _req_msg = CommRPCMessage(header=CommRPCHeader(**_header), data=_data)
@@ -616,18 +1239,16 @@ class RPCServer(BaseRPCServer):
     def run_forever(self):
         """run_forever."""
         self._transport.start()
-        while True:
-            if self._t_stop_event is not None:
-                if self._t_stop_event.is_set():
-                    self.log.debug("Stop event caught in thread")
-                    break
-            time.sleep(0.001)
+        self._t_stop_event.wait()
+        self.log.debug("Stop event caught in thread")
         self._transport.stop()
 
 
 class RPCClient(BaseRPCClient):
     """RPCClient.
-    MQTT RPC Client
+    MQTT RPC Client. Responses are received on one response topic per
+    client, and are routed to the calls by correlation id (MQTT v5
+    CorrelationData, or the message header).
     """
 
     def __init__(self, *args, **kwargs):
@@ -637,32 +1258,51 @@ class RPCClient(BaseRPCClient):
             args: See BaseRPCClient
             kwargs: See BaseRPCClient
         """
-        self._response = None
+        self._subscribe_lock = threading.Lock()
+        self._subscribed = False
 
         super(RPCClient, self).__init__(*args, **kwargs)
         self._transport = MQTTTransport(
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
+        self._reply_to = self._gen_queue_name()
 
     def _gen_queue_name(self):
         """_gen_queue_name."""
         return f"rpc-{self._gen_random_id()}"
 
-    def _prepare_request(self, data: Dict[str, Any]):
+    def _prepare_request(self, data: Dict[str, Any], corr_id: str):
         """_prepare_request.
 
         Args:
             data:
+            corr_id (str): Correlation id of the request
         """
-        self._comm_obj.header.timestamp = gen_timestamp()  # pylint: disable=E0237
-        self._comm_obj.header.reply_to = self._gen_queue_name()
-        self._comm_obj.data = data
-        return self._comm_obj.dict()
+        # Built per request, calls can be made from many threads
+        _msg = self._comm_obj.dict()
+        _msg["header"]["timestamp"] = gen_timestamp()
+        _msg["header"]["reply_to"] = self._reply_to
+        _msg["header"]["correlation_id"] = corr_id
+        _msg["data"] = data
+        return _msg
+
+    def _subscribe_responses(self) -> None:
+        # A single subscription, made on the first call
+        with self._subscribe_lock:
+            if self._subscribed:
+                return
+            self._transport.subscribe(
+                self._reply_to, callback=self._on_response_wrapper, qos=MQTTQoS.L1
+            )
+            self._subscribed = True
 
     def _on_response_wrapper(self, client: Any, userdata: Any, msg: Dict[str, Any]):
         """_on_response_wrapper.
+        Routes a response to its call. Runs on the network loop thread.
 
         Args:
             client (Any): client
@@ -673,62 +1313,81 @@ class RPCClient(BaseRPCClient):
             data, header, uri = self._unpack_comm_msg(msg)
         except Exception as exc:
             self.log.error(exc, exc_info=True)
-            data = {}
-        self._response = data
+            return
+        _, corr_id = _rpc_properties(msg)
+        if corr_id is None:
+            corr_id = header.get("correlation_id")
+        self._pending_calls.resolve(corr_id, data)
 
     def _unpack_comm_msg(self, msg: Any) -> Tuple[Any, Any, Any]:
         _uri = msg.topic
-        _payload = self._serializer.deserialize(msg.payload)
+        _payload = self._codec.decode(msg.payload)
         _data = _payload["data"]
         _header = _payload["header"]
         return _data, _header, _uri
 
-    def _wait_for_response(self, timeout: float = 10.0):
-        """_wait_for_response.
-
-        Args:
-            timeout (float): timeout
-        """
-        start_t = time.time()
-        while self._response is None:
-            elapsed_t = time.time() - start_t
-            if elapsed_t >= timeout:
-                raise RPCClientTimeoutError(f"Response timeout after {timeout} seconds")
-            time.sleep(0.001)
-        return self._response
-
-    def call(self, msg: RPCMessage.Request, timeout: float = 30) -> RPCMessage.Response:
-        """call.
+    def _parse_response(self, data: Dict[str, Any]) -> Any:
+        if self._msg_type is None:
+            return data
+        return self._msg_type.Response(**data)
 
-        Args:
-            msg (RPCMessage.Request): msg
-            timeout (float): timeout
-        """
+    def _send_request(
+        self, msg: RPCMessage.Request, timeout: Optional[float] = None
+    ) -> Tuple[str, Future]:
         if self._msg_type is None:
             data = msg
         else:
             if not isinstance(msg, self._msg_type.Request):
                 raise ValueError("Message type not valid")
             data = msg.dict()
+        self._subscribe_responses()
+        corr_id = self._gen_random_id()
+        call = self._pending_calls.add(corr_id, timeout)
+        _msg = self._prepare_request(data, corr_id)
+        self._transport.publish(
+            self._rpc_name,
+            _msg,
+            qos=MQTTQoS.L1,
+            properties=self._transport.rpc_properties(corr_id, self._reply_to),
+        )
+        return corr_id, call
 
-        self._response = None
-
-        _msg = self._prepare_request(data)
-        _reply_to = _msg["header"]["reply_to"]
+    def call(self, msg: RPCMessage.Request, timeout: float = 30) -> RPCMessage.Response:
+        """call.
+        Raises RPCClientTimeoutError on timeout.
 
-        self._transport.subscribe(
-            _reply_to, callback=self._on_response_wrapper, qos=MQTTQoS.L1
-        )
-        start_t = time.time()
-        self._transport.publish(self._rpc_name, _msg, qos=MQTTQoS.L1)
-        _resp = self._wait_for_response(timeout=timeout)
-        elapsed_t = time.time() - start_t
-        self._delay = elapsed_t
+        Args:
+            msg (RPCMessage.Request): msg
+            timeout (float): timeout
+        """
+        corr_id, call = self._send_request(msg)
+        try:
+            data = call.result(timeout)
+        except FutureTimeoutError:
+            self._pending_calls.discard(corr_id)
+            raise RPCClientTimeoutError(f"Response timeout after {timeout} seconds")
+        self._delay = self._pending_calls.delay
+        return self._parse_response(data)
+
+    def call_async(
+        self,
+        msg: RPCMessage.Request,
+        timeout: float = 30.0,
+        on_response: callable = None,
+    ) -> Future:
+        """call_async.
+        Asynchronous RPC call. Returns a future of the response, without
+        occupying a worker thread while waiting. The response is built, and
+        on_response is called, on the executor of the client. The future
+        fails with RPCClientTimeoutError on timeout.
 
-        if self._msg_type is None:
-            return _resp
-        else:
-            return self._msg_type.Response(**_resp)
+        Args:
+            msg (RPCMessage.Request): msg
+            timeout (float): timeout
+            on_response (callable): on_response
+        """
+        _, call = self._send_request(msg, timeout)
+        return self._response_future(call, on_response)
 
 
 class ActionService(BaseActionService):
@@ -749,33 +1408,59 @@ class ActionService(BaseActionService):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_send_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._cancel_rpc = RPCService(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_cancel_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._result_rpc = RPCService(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_get_result,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._feedback_pub = Publisher(
             msg_type=_ActionFeedbackMessage,
             topic=self._feedback_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._status_pub = Publisher(
             msg_type=_ActionStatusMessage,
             topic=self._status_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
 
@@ -798,23 +1483,39 @@ class ActionClient(BaseActionClient):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._cancel_client = RPCClient(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._result_client = RPCClient(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._status_sub = Subscriber(
             msg_type=_ActionStatusMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._status_topic,
             on_message=self._on_status,
             debug=self.debug,
@@ -822,6 +1523,10 @@ class ActionClient(BaseActionClient):
         self._feedback_sub = Subscriber(
             msg_type=_ActionFeedbackMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._feedback_topic,
             on_message=self._on_feedback,
             debug=self.debug,
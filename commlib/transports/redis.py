@@ -2,8 +2,11 @@ import datetime
 import functools
 import logging
 import sys
+import threading
 import time
-from typing import Any, Callable, Dict, Optional, Tuple
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import redis
 
@@ -16,9 +19,10 @@ from commlib.action import (
     _ActionResultMessage,
     _ActionStatusMessage,
 )
-from commlib.compression import CompressionType, deflate, inflate_str
+from commlib.compression import CompressionType
 from commlib.connection import BaseConnectionParameters
 from commlib.exceptions import RPCClientTimeoutError, RPCRequestError
+from commlib.framing import FrameCodec
 from commlib.msg import PubSubMessage, RPCMessage
 from commlib.pubsub import BasePublisher, BaseSubscriber
 from commlib.rpc import (
@@ -57,6 +61,141 @@ class RedisConnection(redis.Redis):
         super(RedisConnection, self).__init__(*args, **kwargs)
 
 
+class Connection(RedisConnection):
+    """Connection.
+    Redis connection shared by many endpoints, e.g. the endpoints of a
+    Node. Commands use the connection pool of the client. Subscriptions
+    are multiplexed on a single pubsub connection, served by one thread.
+    """
+
+    def __init__(self, conn_params: ConnectionParameters):
+        """__init__.
+
+        Args:
+            conn_params (ConnectionParameters): conn_params
+        """
+        if conn_params.unix_socket not in ("", None):
+            super(Connection, self).__init__(
+                unix_socket_path=conn_params.unix_socket,
+                username=conn_params.username,
+                password=conn_params.password,
+                db=conn_params.db,
+                decode_responses=False,
+            )
+        else:
+            super(Connection, self).__init__(
+                host=conn_params.host,
+                port=conn_params.port,
+                username=conn_params.username,
+                password=conn_params.password,
+                db=conn_params.db,
+                decode_responses=False,
+            )
+        self._routes: Dict[str, List[Callable]] = {}
+        self._lock = threading.Lock()
+        self._pubsub = self.pubsub()
+        self._pubsub_thread = None
+
+    def subscribe(self, topic: str, callback: Callable) -> None:
+        """subscribe.
+        Subscribe to a topic pattern. Many callbacks can be subscribed to
+        the same pattern.
+
+        Args:
+            topic (str): Topic pattern
+            callback (Callable): Called with every received message
+        """
+        with self._lock:
+            callbacks = self._routes.setdefault(topic, [])
+            callbacks.append(callback)
+            if len(callbacks) == 1:
+                self._pubsub.psubscribe(
+                    **{topic: functools.partial(self._route, topic)}
+                )
+        self.start()
+
+    def unsubscribe(self, topic: str, callback: Callable) -> None:
+        """unsubscribe.
+
+        Args:
+            topic (str): Topic pattern
+            callback (Callable): A subscribed callback
+        """
+        with self._lock:
+            callbacks = self._routes.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if len(callbacks) == 0 and topic in self._routes:
+                del self._routes[topic]
+                self._pubsub.punsubscribe(topic)
+
+    def _route(self, topic: str, msg: Dict[str, Any]) -> None:
+        for callback in tuple(self._routes.get(topic, ())):
+            callback(msg)
+
+    def start(self) -> None:
+        """start.
+        Start the thread that serves the subscriptions.
+        """
+        with self._lock:
+            if self._pubsub_thread is None:
+                self._pubsub_thread = self._pubsub.run_in_thread(1.0, daemon=True)
+
+    def close(self) -> None:
+        """close.
+        Stop the subscriptions thread and disconnect.
+        """
+        with self._lock:
+            if self._pubsub_thread is not None:
+                self._pubsub_thread.stop()
+                self._pubsub_thread = None
+        self._pubsub.close()
+        super(Connection, self).close()
+        self.connection_pool.disconnect()
+
+
+class BatchSubscriberThread(threading.Thread):
+    """BatchSubscriberThread.
+    Receives messages of a pubsub in batches. Waits for a message, then
+    drains the messages already received from the socket, until max_batch
+    messages or max_wait seconds.
+    """
+
+    def __init__(
+        self, pubsub: Any, callback: Callable, max_batch: int, max_wait: float
+    ):
+        super().__init__(daemon=True)
+        self._pubsub = pubsub
+        self._callback = callback
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._running = threading.Event()
+
+    def run(self) -> None:
+        self._running.set()
+        pubsub = self._pubsub
+        while self._running.is_set():
+            msg = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if msg is None:
+                continue
+            batch = [msg]
+            deadline = time.monotonic() + self._max_wait
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                msg = pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=timeout
+                )
+                if msg is not None:
+                    batch.append(msg)
+            self._callback(batch)
+        pubsub.close()
+
+    def stop(self) -> None:
+        self._running.clear()
+
+
 class RedisTransport(BaseTransport):
     @classmethod
     def logger(cls) -> logging.Logger:
@@ -69,6 +208,8 @@ class RedisTransport(BaseTransport):
         self,
         compression: CompressionType = CompressionType.DEFAULT_COMPRESSION,
         serializer: Serializer = JSONSerializer(),
+        codec: FrameCodec = None,
+        connection: Optional[Connection] = None,
         *args,
         **kwargs,
     ):
@@ -77,10 +218,20 @@ class RedisTransport(BaseTransport):
         Args:
             serializer (Serializer): serializer
             compression (CompressionType): compression
+            codec (FrameCodec): Encodes and decodes payloads. Built from
+                serializer and compression if not given.
+            connection (Optional[Connection]): Shared connection. Its
+                subscriptions are multiplexed on a single pubsub
+                connection. A new connection is opened if not given.
         """
         super().__init__(*args, **kwargs)
+        self._connection = connection
+        self._subscriptions: List[Tuple[str, Callable]] = []
         self._serializer = serializer
         self._compression = compression
+        if codec is None:
+            codec = FrameCodec(serializer=serializer, compression=compression)
+        self._codec = codec
         self.connect()
 
     @property
@@ -92,13 +243,15 @@ class RedisTransport(BaseTransport):
         return self.logger()
 
     def connect(self) -> None:
-        if self._conn_params.unix_socket not in ("", None):
+        if self._connection is not None:
+            self._redis = self._connection
+        elif self._conn_params.unix_socket not in ("", None):
             self._redis = RedisConnection(
                 unix_socket_path=self._conn_params.unix_socket,
                 username=self._conn_params.username,
                 password=self._conn_params.password,
                 db=self._conn_params.db,
-                decode_responses=True,
+                decode_responses=False,
             )
         else:
             self._redis = RedisConnection(
@@ -118,9 +271,16 @@ class RedisTransport(BaseTransport):
             self.connect()
 
     def stop(self) -> None:
-        if self.is_connected:
+        if not self.is_connected:
+            return
+        if self._connection is not None:
+            # Shared connections are closed by their owner
+            for topic, callback in self._subscriptions:
+                self._connection.unsubscribe(topic, callback)
+            self._subscriptions = []
+        else:
             self._redis.connection_pool.disconnect()
-            self._connected = False
+        self._connected = False
 
     def delete_queue(self, queue_name: str) -> bool:
         # self.log.debug('Removing message queue: <{}>'.format(queue_name))
@@ -129,40 +289,104 @@ class RedisTransport(BaseTransport):
     def queue_exists(self, queue_name: str) -> bool:
         return True if self._redis.exists(queue_name) else False
 
-    def push_msg_to_queue(self, queue_name: str, data: Dict[str, Any]):
-        payload = self._serializer.serialize(data)
-        if self._compression != CompressionType.NO_COMPRESSION:
-            payload = inflate_str(payload)
-        self._redis.rpush(queue_name, payload)
+    def push_msg_to_queue(
+        self, queue_name: str, data: Dict[str, Any], ttl: Optional[int] = None
+    ):
+        """push_msg_to_queue.
+
+        Args:
+            queue_name (str): The queue (list)
+            data (Dict[str, Any]): The message
+            ttl (Optional[int]): Time to live (seconds) of the queue, set
+                in the same round trip (pipeline). Refreshed on every push.
+        """
+        payload = self._codec.encode(data, queue_name)
+        if ttl is None:
+            self._redis.rpush(queue_name, payload)
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.rpush(queue_name, payload)
+        pipe.expire(queue_name, ttl)
+        pipe.execute()
 
     def publish(self, queue_name: str, data: Dict[str, Any]):
-        payload = self._serializer.serialize(data)
-        if self._compression != CompressionType.NO_COMPRESSION:
-            payload = inflate_str(payload)
+        payload = self._codec.encode(data, queue_name)
         self._redis.publish(queue_name, payload)
 
+    def publish_batch(self, msgs: List[Tuple[str, Dict[str, Any]]]):
+        """publish_batch.
+        Publish a batch of messages in a single round trip (pipeline).
+
+        Args:
+            msgs (List[Tuple[str, Dict[str, Any]]]): (topic, data) pairs
+        """
+        pipe = self._redis.pipeline(transaction=False)
+        for queue_name, data in msgs:
+            pipe.publish(queue_name, self._codec.encode(data, queue_name))
+        pipe.execute()
+
+    def publish_many(self, queue_names: List[str], data: Dict[str, Any]):
+        """publish_many.
+        Publish a message to many topics. The message is encoded once, and
+        sent to every topic in a single round trip (pipeline).
+
+        Args:
+            queue_names (List[str]): Topics
+            data (Dict[str, Any]): The message
+        """
+        if len(queue_names) == 0:
+            return
+        payload = self._codec.encode(data, queue_names[0])
+        pipe = self._redis.pipeline(transaction=False)
+        for queue_name in queue_names:
+            pipe.publish(queue_name, payload)
+        pipe.execute()
+
     def subscribe(self, topic: str, callback: Callable):
         _clb = functools.partial(self._on_msg_internal, callback)
+        if self._connection is not None:
+            # Served by the subscriptions thread of the shared connection
+            self._connection.subscribe(topic, _clb)
+            self._subscriptions.append((topic, _clb))
+            return None
         self._sub = self._rsub.psubscribe(**{topic: _clb})
         self._rsub.get_message()
         t = self._rsub.run_in_thread(0.001, daemon=True)
         return t
 
+    def subscribe_batch(
+        self, topic: str, callback: Callable, max_batch: int, max_wait: float
+    ) -> BatchSubscriberThread:
+        """subscribe_batch.
+        Subscribe to a topic, receiving messages in batches.
+
+        Args:
+            topic (str): Topic pattern
+            callback (Callable): Called with lists of messages
+            max_batch (int): Maximum number of messages per batch
+            max_wait (float): Maximum time (seconds) to fill a batch
+        """
+        # Batches are drained from a pubsub connection of their own
+        pubsub = self._redis.pubsub()
+        pubsub.psubscribe(topic)
+        t = BatchSubscriberThread(pubsub, callback, max_batch, max_wait)
+        t.start()
+        return t
+
     def _on_msg_internal(self, callback: Callable, data: Any):
-        if self._compression != CompressionType.NO_COMPRESSION:
-            # _topic = data['channel']
-            data["data"] = deflate(data["data"])
+        # Payloads are decoded by the endpoints, per message
         callback(data)
 
     def wait_for_msg(self, queue_name: str, timeout=10):
         try:
-            msgq, payload = self._redis.blpop(queue_name, timeout=timeout)
-            if self._compression != CompressionType.NO_COMPRESSION:
-                payload = deflate(payload)
+            resp = self._redis.blpop(queue_name, timeout=timeout)
         except Exception as exc:
             self.log.error(exc, exc_info=True)
-            msgq = ""
-            payload = None
+            resp = None
+        if resp is None:
+            # Timed out
+            return "", None
+        msgq, payload = resp
         return msgq, payload
 
 
@@ -171,6 +395,12 @@ class RPCService(BaseRPCService):
     Redis RPC Service class
     """
 
+    # Interval (seconds) to check for a stop event, while idle
+    STOP_CHECK_INTERVAL = 1
+    # Time to live (seconds) of reply queues, so that the queues of clients
+    # that died do not leak
+    REPLY_TTL = 60
+
     def __init__(self, *args, **kwargs):
         """__init__.
 
@@ -183,13 +413,19 @@ class RPCService(BaseRPCService):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
 
-    def _send_response(self, data: Dict[str, Any], reply_to: str):
-        self._comm_obj.header.timestamp = gen_timestamp()  # pylint: disable=E0237
-        self._comm_obj.data = data
+    def _send_response(
+        self, data: Dict[str, Any], reply_to: str, corr_id: Optional[str] = None
+    ):
+        # Built per response, requests are handled by many workers
         _resp = self._comm_obj.dict()
-        self._transport.push_msg_to_queue(reply_to, _resp)
+        _resp["header"]["timestamp"] = gen_timestamp()
+        _resp["header"]["correlation_id"] = corr_id
+        _resp["data"] = data
+        self._transport.push_msg_to_queue(reply_to, _resp, ttl=self.REPLY_TTL)
 
     def _on_request_handle(self, data: Dict[str, Any], header: Dict[str, Any]):
         task = self._executor.submit(self._on_request_internal, data, header)
@@ -206,7 +442,7 @@ class RPCService(BaseRPCService):
             if self._msg_type is None:
                 resp = self.on_request(data)
             else:
-                resp = self.on_request(self._msg_type.Request(**data))
+                resp = self.on_request(self._build_msg(self._msg_type.Request, data))
                 # RPCMessage.Response object here
                 resp = resp.dict()
         except RPCRequestError as e:
@@ -215,21 +451,25 @@ class RPCService(BaseRPCService):
         except Exception as exc:
             self.log.error(str(exc), exc_info=False)
             resp = {}
-        self._send_response(resp, _req_msg.header.reply_to)
+        self._send_response(
+            resp, _req_msg.header.reply_to, header.get("correlation_id")
+        )
 
     def run_forever(self):
         if self._transport.queue_exists(self._rpc_name):
             self._transport.delete_queue(self._rpc_name)
         while True:
-            msgq, payload = self._transport.wait_for_msg(self._rpc_name, timeout=0)
-
-            self._detach_request_handler(payload)
-            if self._t_stop_event is not None:
-                if self._t_stop_event.is_set():
-                    self.log.debug("Stop event caught in thread")
-                    self._transport.delete_queue(self._rpc_name)
-                    break
-            time.sleep(0.001)
+            # Requests are handled as soon as they are pushed. The timeout
+            # only bounds the time to notice a stop event.
+            msgq, payload = self._transport.wait_for_msg(
+                self._rpc_name, timeout=self.STOP_CHECK_INTERVAL
+            )
+            if payload is not None:
+                self._detach_request_handler(payload)
+            if self._t_stop_event.is_set():
+                self.log.debug("Stop event caught in thread")
+                self._transport.delete_queue(self._rpc_name)
+                break
 
     def _detach_request_handler(self, payload: str):
         data, header = self._unpack_comm_msg(payload)
@@ -237,7 +477,7 @@ class RPCService(BaseRPCService):
         self._on_request_handle(data, header)
 
     def _unpack_comm_msg(self, payload: str) -> Tuple:
-        _payload = self._serializer.deserialize(payload)
+        _payload = self._codec.decode(payload)
         _data = _payload["data"]
         _header = _payload["header"]
         return _data, _header
@@ -246,30 +486,68 @@ class RPCService(BaseRPCService):
 class RPCClient(BaseRPCClient):
     """RPCClient."""
 
-    def __init__(self, *args, **kwargs):
+    # Interval (seconds) to check for a stop event, while waiting for
+    # responses on the reply queue
+    STOP_CHECK_INTERVAL = 1
+
+    def __init__(self, *args, persistent_reply: bool = False, **kwargs):
         """__init__.
 
         Args:
             args:
+            persistent_reply (bool): Receive the responses of all calls on
+                one long-lived reply queue, served by a single receiver
+                thread, instead of a new queue per call. Responses are
+                routed to calls by correlation id, so calls of many threads
+                can be in flight at the same time.
             kwargs:
         """
+        self._persistent_reply = persistent_reply
+        self._receiver = None
+        self._receiver_stop = threading.Event()
         super(RPCClient, self).__init__(*args, **kwargs)
         self._transport = RedisTransport(
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
+        self._reply_to = self._gen_queue_name()
+        if persistent_reply:
+            self._receiver = threading.Thread(
+                target=self._receive_responses, daemon=True
+            )
+            self._receiver.start()
 
     def _gen_queue_name(self):
         return f"rpc-{self._gen_random_id()}"
 
-    def _prepare_request(self, data: Dict[str, Any]):
-        self._comm_obj.header.timestamp = gen_timestamp()  # pylint: disable=E0237
-        self._comm_obj.header.reply_to = self._gen_queue_name()
-        self._comm_obj.data = data
-        return self._comm_obj.dict()
+    def _prepare_request(
+        self,
+        data: Dict[str, Any],
+        reply_to: Optional[str] = None,
+        corr_id: Optional[str] = None,
+    ):
+        # Built per request, calls can be made from many threads
+        _msg = self._comm_obj.dict()
+        _msg["header"]["timestamp"] = gen_timestamp()
+        _msg["header"]["reply_to"] = (
+            reply_to if reply_to is not None else self._gen_queue_name()
+        )
+        _msg["header"]["correlation_id"] = corr_id
+        _msg["data"] = data
+        return _msg
 
     def call(self, msg: RPCMessage.Request, timeout: float = 30) -> RPCMessage.Response:
+        if self._persistent_reply:
+            corr_id, call = self._send_request(msg)
+            try:
+                data = call.result(timeout)
+            except FutureTimeoutError:
+                self._pending_calls.discard(corr_id)
+                return None
+            return self._parse_response(data)
         # TODO: Evaluate msg type passed here.
         if self._msg_type is None:
             data = msg
@@ -284,6 +562,69 @@ class RPCClient(BaseRPCClient):
         if _msg is None:
             return None
         data, header = self._unpack_comm_msg(_msg)
+        return self._parse_response(data)
+
+    def call_async(
+        self,
+        msg: RPCMessage.Request,
+        timeout: float = 30.0,
+        on_response: callable = None,
+    ) -> Future:
+        """call_async.
+        Asynchronous RPC call. With a persistent reply queue, the returned
+        future does not occupy a worker thread while waiting. The response
+        is built, and on_response is called, on the executor of the client.
+        The future fails with RPCClientTimeoutError on timeout.
+
+        Args:
+            msg (RPCMessage.Request): msg
+            timeout (float): timeout
+            on_response (callable): on_response
+        """
+        if not self._persistent_reply:
+            return super().call_async(msg, timeout, on_response)
+        _, call = self._send_request(msg, timeout)
+        return self._response_future(call, on_response)
+
+    def stop(self) -> None:
+        if self._receiver is not None:
+            self._receiver_stop.set()
+            self._receiver = None
+            self._transport.delete_queue(self._reply_to)
+        super().stop()
+
+    def _send_request(
+        self, msg: RPCMessage.Request, timeout: Optional[float] = None
+    ) -> Tuple[str, Future]:
+        if self._msg_type is None:
+            data = msg
+        else:
+            data = msg.dict()
+        corr_id = self._gen_random_id()
+        call = self._pending_calls.add(corr_id, timeout)
+        _msg = self._prepare_request(data, self._reply_to, corr_id)
+        self._transport.push_msg_to_queue(self._rpc_name, _msg)
+        return corr_id, call
+
+    def _receive_responses(self) -> None:
+        # Timeouts are handled by the timer of the pending calls. The BLPOP
+        # timeout only bounds the time to notice a stop event.
+        while not self._receiver_stop.is_set():
+            _, payload = self._transport.wait_for_msg(
+                self._reply_to, timeout=self.STOP_CHECK_INTERVAL
+            )
+            if payload is not None:
+                self._on_response(payload)
+
+    def _on_response(self, payload: bytes) -> None:
+        try:
+            data, header = self._unpack_comm_msg(payload)
+        except Exception:
+            self.log.error("Could not deserialize data", exc_info=True)
+            return
+        self._pending_calls.resolve(header.get("correlation_id"), data)
+
+    def _parse_response(self, data: Dict[str, Any]) -> Any:
         # TODO: Evaluate response type and raise exception if necessary
         if self._msg_type is None:
             return data
@@ -291,7 +632,7 @@ class RPCClient(BaseRPCClient):
             return self._msg_type.Response(**data)
 
     def _unpack_comm_msg(self, payload: str) -> Tuple:
-        _payload = self._serializer.deserialize(payload)
+        _payload = self._codec.decode(payload)
         _data = _payload["data"]
         _header = _payload["header"]
         return _data, _header
@@ -319,6 +660,8 @@ class Publisher(BasePublisher):
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
 
     def publish(self, msg: PubSubMessage) -> None:
@@ -333,14 +676,31 @@ class Publisher(BasePublisher):
         """
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
+        if self._batch(msg):
+            return
         self.log.debug(f"Publishing Message to topic <{self._topic}>")
         self._transport.publish(self._topic, data)
         self._msg_seq += 1
 
+    def publish_batch(self, msgs: List[PubSubMessage]) -> None:
+        """publish_batch.
+        Publish a batch of messages, pipelined.
+
+        Args:
+            msgs (List[PubSubMessage]): Messages to publish
+
+        Returns:
+            None:
+        """
+        batch = [(self._topic, self._check_msg(msg)) for msg in msgs]
+        self.log.debug(f"Publishing {len(batch)} Messages to topic <{self._topic}>")
+        self._transport.publish_batch(batch)
+        self._msg_seq += len(batch)
+
 
 class MPublisher(Publisher):
     """MPublisher.
@@ -368,42 +728,91 @@ class MPublisher(Publisher):
         """
         if self._msg_type is not None and not isinstance(msg, PubSubMessage):
             raise ValueError('Argument "msg" must be of type PubSubMessage')
-        elif isinstance(msg, dict):
+        elif isinstance(msg, (dict, PubSubMessage)):
+            # Typed messages are encoded by the serializer, using the
+            # compiled encoder of their type.
             data = msg
-        elif isinstance(msg, PubSubMessage):
-            data = msg.dict()
+        if self._batch((msg, topic)):
+            return
         self.log.debug(f"Publishing Message: <{topic}>:{data}")
         self._transport.publish(topic, data)
         self._msg_seq += 1
 
+    def publish_batch(self, msgs: List[Tuple[PubSubMessage, str]]) -> None:
+        """publish_batch.
+        Publish a batch of messages, pipelined.
+
+        Args:
+            msgs (List[Tuple[PubSubMessage, str]]): (message, topic) pairs
+
+        Returns:
+            None:
+        """
+        batch = [(topic, self._check_msg(msg)) for msg, topic in msgs]
+        self.log.debug(f"Publishing {len(batch)} Messages")
+        self._transport.publish_batch(batch)
+        self._msg_seq += len(batch)
+
+    def publish_to_many(self, msg: PubSubMessage, topics: List[str]) -> None:
+        """publish_to_many.
+        Publish a message to many topics. It is serialized and compressed
+        once, and sent to all topics pipelined.
+
+        Args:
+            msg (PubSubMessage): Message to publish
+            topics (List[str]): Topics (URIs) to send the message
+
+        Returns:
+            None:
+        """
+        self.log.debug(f"Publishing Message to {len(topics)} topics")
+        self._transport.publish_many(topics, self._check_msg(msg))
+        self._msg_seq += len(topics)
+
 
 class Subscriber(BaseSubscriber):
     """Subscriber.
     Redis Subscriber
     """
 
-    def __init__(self, queue_size: Optional[int] = 1, *args, **kwargs):
+    # Batches are drained from the pubsub connection (on_messages)
+    NATIVE_BATCHING = True
+
+    def __init__(self, queue_size: Optional[int] = None, *args, **kwargs):
         """__init__.
 
         Args:
-            queue_size (int): queue_size
+            queue_size (int): Size of the inbox of received messages. Same
+                as inbox_size (see BaseSubscriber).
             args:
             kwargs:
         """
         self._subscriber_thread = None
         self._queue_size = queue_size
+        if queue_size is not None:
+            kwargs.setdefault("inbox_size", queue_size)
         super(Subscriber, self).__init__(*args, **kwargs)
 
         self._transport = RedisTransport(
             conn_params=self._conn_params,
             serializer=self._serializer,
             compression=self._compression,
+            codec=self._codec,
+            connection=self._connection,
         )
 
     def run(self):
-        self._subscriber_thread = self._transport.subscribe(
-            self._topic, self._on_message
-        )
+        if self.onmessages is not None:
+            self._subscriber_thread = self._transport.subscribe_batch(
+                self._topic,
+                functools.partial(self._receive, self._on_messages),
+                self._max_batch,
+                self._max_wait,
+            )
+        else:
+            self._subscriber_thread = self._transport.subscribe(
+                self._topic, functools.partial(self._receive, self._on_message)
+            )
         self.log.debug(f"Started Subscriber: <{self._topic}>")
 
     def stop(self):
@@ -414,24 +823,32 @@ class Subscriber(BaseSubscriber):
 
     def run_forever(self):
         self.run()
-        while True:
-            time.sleep(0.001)
+        self._t_stop_event.wait()
 
     def _on_message(self, payload: Dict[str, Any]):
         try:
             data, uri = self._unpack_comm_msg(payload)
             if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, data)
-                else:
-                    _clb = functools.partial(self.onmessage, self._msg_type(**data))
+                _clb = functools.partial(self.onmessage, self._make_msg(data))
                 _clb()
         except Exception:
             self.log.error("Exception caught in _on_message", exc_info=True)
 
+    def _on_messages(self, payloads: List[Dict[str, Any]]):
+        batch = []
+        for payload in payloads:
+            try:
+                batch.append(self._batch_item(*self._unpack_comm_msg(payload)))
+            except Exception:
+                self.log.error("Exception caught in _on_messages", exc_info=True)
+        self._on_batch(batch)
+
+    def _batch_item(self, data: Dict[str, Any], topic: str) -> Any:
+        return self._make_msg(data)
+
     def _unpack_comm_msg(self, msg: Dict[str, Any]) -> Tuple:
         _uri = msg["channel"]
-        _data = self._serializer.deserialize(msg["data"])
+        _data = self._codec.decode(msg["data"])
         return _data, _uri
 
 
@@ -440,16 +857,17 @@ class PSubscriber(Subscriber):
     Redis Pattern-based Subscriber.
     """
 
+    def _conflation_key(self, payload: Dict[str, Any]) -> Any:
+        return payload["channel"]
+
+    def _batch_item(self, data: Dict[str, Any], topic: str) -> Any:
+        return self._make_msg(data), topic
+
     def _on_message(self, payload: Dict[str, Any]) -> None:
         try:
             data, topic = self._unpack_comm_msg(payload)
             if self.onmessage is not None:
-                if self._msg_type is None:
-                    _clb = functools.partial(self.onmessage, data, topic)
-                else:
-                    _clb = functools.partial(
-                        self.onmessage, self._msg_type(**data), topic
-                    )
+                _clb = functools.partial(self.onmessage, self._make_msg(data), topic)
                 _clb()
         except Exception:
             self.log.error("Exception caught in _on_message", exc_info=True)
@@ -473,33 +891,59 @@ class ActionService(BaseActionService):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_send_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._cancel_rpc = RPCService(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_cancel_goal,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._result_rpc = RPCService(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             on_request=self._handle_get_result,
+            trusted=self._trusted,
+            validate_rate=self._validate_rate,
             debug=self.debug,
         )
         self._feedback_pub = Publisher(
             msg_type=_ActionFeedbackMessage,
             topic=self._feedback_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._status_pub = Publisher(
             msg_type=_ActionStatusMessage,
             topic=self._status_topic,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
 
@@ -522,29 +966,49 @@ class ActionClient(BaseActionClient):
             msg_type=_ActionGoalMessage,
             rpc_name=self._goal_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._cancel_client = RPCClient(
             msg_type=_ActionCancelMessage,
             rpc_name=self._cancel_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._result_client = RPCClient(
             msg_type=_ActionResultMessage,
             rpc_name=self._result_rpc_uri,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             debug=self.debug,
         )
         self._status_sub = Subscriber(
             msg_type=_ActionStatusMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._status_topic,
             on_message=self._on_status,
         )
         self._feedback_sub = Subscriber(
             msg_type=_ActionFeedbackMessage,
             conn_params=self._conn_params,
+            serializer=self._serializer,
+            framed=self._framed,
+            executor=self._executor,
+            connection=self._connection,
             topic=self._feedback_topic,
             on_message=self._on_feedback,
         )
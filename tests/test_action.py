@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.action` module."""
+
+import queue
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from commlib.action import BaseActionClient, GoalStatus, _ActionStatusMessage
+
+
+class TestActionClient(unittest.TestCase):
+    """Tests for `commlib.action.BaseActionClient`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.client = BaseActionClient(action_name="move")
+        self.client._result_client = mock.Mock()
+        self.client._result_client.call.return_value = SimpleNamespace(result={"x": 1})
+        self.client._goal_id = "g1"
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_get_result_wait(self):
+        results = queue.Queue()
+        waiter = threading.Thread(
+            target=lambda: results.put(
+                self.client.get_result(wait=True, wait_max_sec=5)
+            )
+        )
+        waiter.start()
+        time.sleep(0.05)
+        self.assertTrue(results.empty())
+        # Woken up by the status update, not by wait_max_sec
+        start = time.monotonic()
+        self.client._on_status(
+            _ActionStatusMessage(goal_id="g1", status=GoalStatus.SUCCEDED)
+        )
+        self.assertEqual(results.get(timeout=1), {"x": 1})
+        self.assertLess(time.monotonic() - start, 1)
+        waiter.join()
+
+    def test_get_result_timeout(self):
+        # Status updates of other goals are ignored
+        self.client._on_status(
+            _ActionStatusMessage(goal_id="g0", status=GoalStatus.SUCCEDED)
+        )
+        self.assertIsNone(self.client.get_result(wait=True, wait_max_sec=0.05))
+        self.client._result_client.call.assert_not_called()
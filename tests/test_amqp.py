@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.transports.amqp` module."""
+
+import functools
+import queue
+import random
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from commlib.exceptions import RPCClientTimeoutError
+from commlib.framing import FrameCodec
+from commlib.pubsub import InboxPolicy
+from commlib.transports import amqp
+
+
+class FakeChannel:
+    """Records consumers and published messages."""
+
+    def __init__(self):
+        self.is_closed = False
+        self.consumer = None
+        self.published = queue.Queue()
+
+    def basic_consume(self, queue_name, on_message_callback, **kwargs):
+        self.consumer = on_message_callback
+
+    def basic_publish(self, exchange, routing_key, properties, body, **kwargs):
+        self.published.put((properties, body))
+
+
+class FakeTransport:
+    """Runs thread-safe callbacks on a single I/O thread, like a pika
+    connection."""
+
+    def __init__(self, *args, **kwargs):
+        self.channel = FakeChannel()
+        self.shared = False
+        self._callbacks = queue.Queue()
+        self.io_thread = threading.Thread(target=self._run, daemon=True)
+        self.io_thread.start()
+
+    def _run(self):
+        while True:
+            callback = self._callbacks.get()
+            if callback is None:
+                return
+            callback()
+
+    def connect(self):
+        pass
+
+    def detach_amqp_events_thread(self):
+        pass
+
+    def add_threadsafe_callback(self, cb, *args, **kwargs):
+        self._callbacks.put(functools.partial(cb, *args, **kwargs))
+
+    def delete_queue(self, queue_name):
+        pass
+
+    def stop(self):
+        self._callbacks.put(None)
+
+    def reply(self, properties, data):
+        # Deliver a response to the reply-to consumer, on the I/O thread
+        self.add_threadsafe_callback(
+            self.channel.consumer,
+            self.channel,
+            None,
+            SimpleNamespace(correlation_id=properties.correlation_id),
+            FrameCodec().encode(data),
+        )
+
+
+class TestRPCClient(unittest.TestCase):
+    """Tests for `commlib.transports.amqp.RPCClient`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(amqp, "AMQPTransport", FakeTransport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = amqp.RPCClient(rpc_name="add")
+        self.transport = self.client._transport
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.client.stop()
+
+    def requests(self, n):
+        return [self.transport.channel.published.get(timeout=1) for _ in range(n)]
+
+    def serve(self, batch=1, shuffle=False):
+        # Reply to batches of requests, in any order
+        def _serve():
+            while True:
+                try:
+                    requests = self.requests(batch)
+                except queue.Empty:
+                    return
+                if shuffle:
+                    random.shuffle(requests)
+                for properties, body in requests:
+                    data = FrameCodec().decode(body)
+                    self.transport.reply(properties, {"c": data["a"] * 2})
+
+        threading.Thread(target=_serve, daemon=True).start()
+
+    def test_concurrent_calls(self):
+        self.serve(batch=4, shuffle=True)
+        results = {}
+
+        def call(a):
+            results[a] = self.client.call({"a": a}, timeout=2)
+
+        callers = [threading.Thread(target=call, args=(a,)) for a in range(4)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        self.assertEqual(results, {a: {"c": a * 2} for a in range(4)})
+        self.assertEqual(len(self.client._pending_calls), 0)
+
+    def test_out_of_order_async(self):
+        self.serve(batch=8, shuffle=True)
+        futures = [self.client.call_async({"a": a}, timeout=2) for a in range(8)]
+        self.assertEqual(
+            [f.result(2) for f in futures], [{"c": a * 2} for a in range(8)]
+        )
+
+    def test_callback_off_io_thread(self):
+        self.serve()
+        responses = queue.Queue()
+
+        def on_response(resp):
+            # A nested call, which needs the I/O thread to deliver its response
+            nested = self.client.call({"a": 10}, timeout=2)
+            responses.put((resp["c"], nested, threading.current_thread()))
+
+        for a in range(3):
+            self.client.call_async({"a": a}, on_response=on_response)
+        received = sorted(responses.get(timeout=2) for _ in range(3))
+        self.assertEqual(
+            [r[:2] for r in received], [(a * 2, {"c": 20}) for a in range(3)]
+        )
+        for _, _, thread in received:
+            self.assertIsNot(thread, self.transport.io_thread)
+
+    def test_expiry(self):
+        future = self.client.call_async({"a": 1}, timeout=0.05)
+        with self.assertRaises(RPCClientTimeoutError):
+            future.result(2)
+        self.assertIsNone(self.client.call({"a": 2}, timeout=0.05))
+        self.assertEqual(len(self.client._pending_calls), 0)
+        # Late responses are dropped
+        for properties, _ in self.requests(2):
+            self.transport.reply(properties, {"c": 0})
+        future = self.client.call_async({"a": 3}, timeout=2)
+        properties, _ = self.requests(1)[0]
+        # Responses without a correlation id are dropped, even with a
+        # single call in flight
+        self.transport.reply(SimpleNamespace(correlation_id=None), {"c": 0})
+        self.transport.reply(properties, {"c": 6})
+        self.assertEqual(future.result(2), {"c": 6})
+
+
+class TestSubscriber(unittest.TestCase):
+    """Tests for `commlib.transports.amqp.Subscriber`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(amqp, "AMQPTransport", FakeTransport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_decode_off_io_thread(self):
+        received = queue.Queue()
+        sub = amqp.Subscriber(
+            topic="camera.frames", on_message=received.put, offload_decoding=True
+        )
+        self.assertEqual(sub._inbox.policy, InboxPolicy.DROP_OLDEST)
+        decoding = threading.Event()
+        gate = threading.Event()
+        decode = sub._codec.decode
+
+        def slow_decode(payload):
+            decoding.set()
+            gate.wait()
+            return decode(payload)
+
+        sub._codec.decode = slow_decode
+        properties = SimpleNamespace(
+            content_type=None, content_encoding=None, delivery_mode=1, timestamp=0
+        )
+        # The consumer callback of the I/O thread
+        sub._receive(
+            sub._on_msg_callback_wrapper,
+            None,
+            None,
+            properties,
+            FrameCodec().encode({"frame": 1}),
+        )
+        # It returned while the message is being decoded
+        self.assertTrue(decoding.wait(2))
+        self.assertTrue(received.empty())
+        gate.set()
+        self.assertEqual(received.get(timeout=2), {"frame": 1})
+        self.assertEqual(sub.inbox_stats.received, 1)
+        sub._stop_delivery()
+        # Unknown overflow behaviours never block the I/O thread
+        other = amqp.Subscriber(
+            topic="camera.frames", overflow="drop-tail", offload_decoding=True
+        )
+        self.assertEqual(other._inbox.policy, InboxPolicy.DROP_OLDEST)
+        other._stop_delivery()
+
+    def test_shared_io_thread(self):
+        # Endpoints of a shared connection share its I/O thread
+        transport = FakeTransport()
+        self.addCleanup(transport.stop)
+        with mock.patch.object(amqp, "AMQPTransport", lambda *a, **kw: transport):
+            gate = threading.Event()
+            fast = queue.Queue()
+            slow = amqp.Subscriber(
+                topic="camera.frames", on_message=lambda m: gate.wait(), inbox_size=4
+            )
+            sub = amqp.Subscriber(topic="robot.pose", on_message=fast.put)
+            # Messages are handled on the I/O thread by default
+            self.assertIsNone(sub.inbox_stats)
+        properties = SimpleNamespace(
+            content_type=None, content_encoding=None, delivery_mode=1, timestamp=0
+        )
+        for endpoint, data in ((slow, {"frame": 1}), (sub, {"x": 1})):
+            transport.add_threadsafe_callback(
+                endpoint._receive,
+                endpoint._on_msg_callback_wrapper,
+                None,
+                None,
+                properties,
+                FrameCodec().encode(data),
+            )
+        # A slow callback does not stall the other endpoints
+        self.assertEqual(fast.get(timeout=2), {"x": 1})
+        gate.set()
+        slow._stop_delivery()
+        sub._stop_delivery()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.framing` module."""
+
+import base64
+import collections
+import os
+import unittest
+from unittest import mock
+
+from commlib import compression
+from commlib.compression import (
+    AdaptiveCompression,
+    CompressionCodecs,
+    CompressionType,
+    DictionaryCompression,
+    ZlibDictCodec,
+    get_codec,
+)
+from commlib.exceptions import SerializationError
+from commlib.framing import (
+    FLAG_CHUNKED,
+    FRAME_HEADER_SIZE,
+    FrameCodec,
+    decode_frame,
+    is_framed,
+)
+from commlib.serializer import JSONSerializer, MsgPackSerializer, SerializationTypes
+
+
+class TestFraming(unittest.TestCase):
+    """Tests for `commlib.framing` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.data = {"a": 1, "b": "text " * 20, "c": [1.5, None, True]}
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_frame_header(self):
+        codec = FrameCodec(
+            serializer=MsgPackSerializer,
+            compression=CompressionType.BEST_SPEED,
+            framed=True,
+        )
+        payload = codec.encode(self.data)
+        self.assertTrue(is_framed(payload))
+        header, body = decode_frame(payload)
+        self.assertEqual(header.codec, SerializationTypes.MSGPACK)
+        self.assertEqual(header.compression, CompressionCodecs.ZLIB)
+        self.assertEqual(len(body), len(payload) - FRAME_HEADER_SIZE)
+        with self.assertRaises(SerializationError):
+            decode_frame(payload[:4])
+
+    def test_decode_autodetect(self):
+        # The receiver is configured differently from every sender
+        receiver = FrameCodec(serializer=JSONSerializer)
+        senders = [
+            FrameCodec(serializer=MsgPackSerializer, framed=True),
+            FrameCodec(
+                serializer=MsgPackSerializer,
+                compression=CompressionType.DEFAULT_COMPRESSION,
+                framed=True,
+            ),
+            # Unframed payloads of senders that do not frame messages
+            FrameCodec(serializer=JSONSerializer),
+            FrameCodec(
+                serializer=JSONSerializer,
+                compression=CompressionType.BEST_COMPRESSION,
+            ),
+        ]
+        for sender in senders:
+            payload = sender.encode(dict(self.data))
+            self.assertEqual(receiver.decode(payload), self.data)
+            self.assertEqual(receiver.decode(memoryview(payload)), self.data)
+
+    def test_adaptive_compression(self):
+        policy = AdaptiveCompression(min_size=256, max_ratio=0.7)
+        codec = FrameCodec(compression=policy)
+        receiver = FrameCodec()
+        small = {"ts": 1}
+        text = {"text": "compressible " * 200}
+        noise = {"noise": base64.b64encode(os.urandom(4096)).decode()}
+        for _ in range(3):
+            for topic, data in (("a", small), ("b", text), ("c", noise)):
+                payload = codec.encode(dict(data), topic)
+                self.assertEqual(receiver.decode(payload), data)
+                header, _ = decode_frame(payload)
+                self.assertEqual(
+                    header.compression,
+                    CompressionCodecs.ZLIB if topic == "b" else CompressionCodecs.NONE,
+                )
+        stats = policy.stats
+        self.assertEqual(stats.messages, 9)
+        self.assertEqual(stats.skipped_small, 3)
+        self.assertEqual(stats.compressed, 3)
+        self.assertEqual(stats.skipped_incompressible, 3)
+        self.assertGreater(stats.bytes_saved, 0)
+
+    def test_compression_codecs(self):
+        receiver = FrameCodec()
+        for codec in CompressionCodecs:
+            if codec in (CompressionCodecs.NONE, CompressionCodecs.ZLIB_DICT):
+                continue
+            try:
+                get_codec(codec)
+            except ValueError:
+                # Optional codec, not installed
+                continue
+            for compression in (codec, (codec.name.lower(), 1)):
+                sender = FrameCodec(compression=compression)
+                payload = sender.encode(dict(self.data))
+                self.assertEqual(receiver.decode(payload), self.data)
+                if codec != CompressionCodecs.ZLIB:
+                    header, _ = decode_frame(payload)
+                    self.assertEqual(header.compression, codec)
+
+    def test_corrupted_body(self):
+        receiver = FrameCodec()
+        self.assertRaises(
+            SerializationError, receiver.decode, b"\xc1C\x01\x00\x01\x00\x00\x00garbage"
+        )
+        for codec in (CompressionCodecs.LZMA, CompressionCodecs.BZ2):
+            payload = bytes([0xC1, 0x43, 1, 0, codec, 0, 0, 0]) + b"garbage"
+            with self.assertRaises(SerializationError):
+                receiver.decode(payload)
+        # Unframed, with a zlib header
+        with self.assertRaises(SerializationError):
+            receiver.decode(b"\x78\x9cgarbage")
+
+    def test_dictionary_compression(self):
+        policy = DictionaryCompression(train_samples=10, announce_interval=5)
+        sender = FrameCodec(compression=policy)
+        receiver = FrameCodec()
+        codecs = []
+        for i in range(30):
+            data = {"header": {"msg_id": i, "reply_to": f"rpc-{i}"}, "data": {}}
+            payload = sender.encode(dict(data), "sensors")
+            self.assertEqual(receiver.decode(payload), data)
+            codecs.append(decode_frame(payload)[0].compression)
+        # Plain zlib until the dictionary is trained
+        self.assertEqual(codecs[:9], [CompressionCodecs.ZLIB] * 9)
+        self.assertEqual(codecs[9:], [CompressionCodecs.ZLIB_DICT] * 21)
+        self.assertIsNotNone(policy.dictionary("sensors"))
+        self.assertEqual(policy.stats.messages, 30)
+
+    def test_inline_dictionaries_bounded(self):
+        zdicts = [f"dictionary {i}".encode() * 8 for i in range(3)]
+        data = b"dictionary 0" * 4
+        with mock.patch.multiple(
+            compression,
+            MAX_INLINE_ZDICTS=2,
+            _inline_zdicts=collections.OrderedDict(),
+        ):
+            for zdict in zdicts:
+                stream = ZlibDictCodec.compress_with_dict([data], zdict, inline=True)
+                self.assertEqual(ZlibDictCodec.decompress(b"".join(stream)), data)
+            self.assertEqual(len(compression._inline_zdicts), 2)
+            # The least recently used dictionary was dropped
+            for zdict, known in zip(zdicts, (False, True, True)):
+                stream = b"".join(ZlibDictCodec.compress_with_dict([data], zdict))
+                if known:
+                    self.assertEqual(ZlibDictCodec.decompress(stream), data)
+                else:
+                    self.assertRaises(ValueError, ZlibDictCodec.decompress, stream)
+
+    def test_chunked_compression(self):
+        sender = FrameCodec(
+            compression=CompressionType.BEST_SPEED,
+            framed=True,
+            chunk_size=32,
+            parallel_min_size=100,
+        )
+        receiver = FrameCodec()
+        payload = sender.encode(dict(self.data))
+        self.assertEqual(receiver.decode(payload), self.data)
+        self.assertTrue(decode_frame(payload)[0].flags & FLAG_CHUNKED)
+        with self.assertRaises(SerializationError):
+            receiver.decode(payload[:-8])
+        # Small payloads are compressed as a whole
+        small = {"ts": 1}
+        payload = sender.encode(dict(small))
+        self.assertEqual(receiver.decode(payload), small)
+        self.assertFalse(decode_frame(payload)[0].flags & FLAG_CHUNKED)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.transports.kafka` module."""
+
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from commlib.exceptions import RPCClientTimeoutError
+
+try:
+    from commlib.transports import kafka
+except ImportError:
+    kafka = None
+
+
+@unittest.skipIf(kafka is None, "confluent_kafka is not installed")
+class TestRPCClient(unittest.TestCase):
+    """Tests for `commlib.transports.kafka.RPCClient`."""
+
+    def test_wait_for_response(self):
+        client = SimpleNamespace(_response_event=threading.Event(), _response=None)
+
+        def respond():
+            client._response = {"c": 3}
+            client._response_event.set()
+
+        threading.Timer(0.05, respond).start()
+        self.assertEqual(
+            kafka.RPCClient._wait_for_response(client, timeout=2), {"c": 3}
+        )
+        client._response_event.clear()
+        with self.assertRaises(RPCClientTimeoutError):
+            kafka.RPCClient._wait_for_response(client, timeout=0.05)
+
+
+@unittest.skipIf(kafka is None, "confluent_kafka is not installed")
+class TestSubscriber(unittest.TestCase):
+    """Tests for `commlib.transports.kafka.Subscriber`."""
+
+    def message(self, value=None, code=None):
+        msg = mock.Mock()
+        if code is None:
+            msg.error.return_value = None
+        else:
+            msg.error.return_value.code.return_value = code
+        msg.value.return_value = value
+        return msg
+
+    def test_on_messages_error(self):
+        batches = []
+        sub = SimpleNamespace(
+            log=mock.Mock(),
+            _unpack_comm_msg=lambda msg: (msg.value(), None, None, None),
+            _batch_item=lambda data, topic, key, ts: data,
+            _on_batch=batches.append,
+        )
+        msgs = [
+            self.message(1),
+            self.message(code=kafka.KafkaError._PARTITION_EOF),
+            self.message(code=kafka.KafkaError._TRANSPORT),
+            self.message(2),
+        ]
+        # A consumer error does not lose the rest of the batch
+        kafka.Subscriber._on_messages(sub, msgs)
+        self.assertEqual(batches, [[1, 2]])
+        sub.log.error.assert_called_once()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.transports.mqtt` module."""
+
+import queue
+import random
+import socket
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from commlib.exceptions import RPCClientError, RPCClientTimeoutError
+from commlib.framing import FrameCodec
+from commlib.transports import mqtt
+
+
+class FakeTransport:
+    """Records subscriptions and published messages, and delivers messages
+    from a single network loop thread."""
+
+    def __init__(self, *args, **kwargs):
+        self.subscriptions = {}
+        self.published = queue.Queue()
+        self.v5 = False
+        self._deliveries = queue.Queue()
+        self.loop_thread = threading.Thread(target=self._run, daemon=True)
+        self.loop_thread.start()
+
+    def _run(self):
+        while True:
+            delivery = self._deliveries.get()
+            if delivery is None:
+                return
+            delivery()
+
+    def subscribe(self, topic, callback, qos=0):
+        self.subscriptions.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, payload, qos=0, retain=False, properties=None):
+        self.published.put((topic, payload, properties))
+
+    def rpc_properties(self, corr_id, response_topic=None):
+        if not self.v5:
+            return None
+        return SimpleNamespace(CorrelationData=corr_id.encode())
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self._deliveries.put(None)
+
+    def reply(self, request, data):
+        topic, payload, properties = request
+        header = {
+            "correlation_id": None if self.v5 else payload["header"]["correlation_id"]
+        }
+        msg = SimpleNamespace(
+            topic=payload["header"]["reply_to"],
+            payload=FrameCodec().encode({"header": header, "data": data}),
+            properties=properties,
+        )
+        for callback in self.subscriptions[msg.topic]:
+            self._deliveries.put(lambda cb=callback: cb(None, None, msg))
+
+
+class TestRPCClient(unittest.TestCase):
+    """Tests for `commlib.transports.mqtt.RPCClient`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(mqtt, "MQTTTransport", FakeTransport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = mqtt.RPCClient(rpc_name="add")
+        self.transport = self.client._transport
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.client.stop()
+
+    def requests(self, n):
+        return [self.transport.published.get(timeout=1) for _ in range(n)]
+
+    def serve(self, batch=1, shuffle=False):
+        def _serve():
+            while True:
+                try:
+                    requests = self.requests(batch)
+                except queue.Empty:
+                    return
+                if shuffle:
+                    random.shuffle(requests)
+                for request in requests:
+                    self.transport.reply(request, {"c": request[1]["data"]["a"] * 2})
+
+        threading.Thread(target=_serve, daemon=True).start()
+
+    def test_response_topic(self):
+        self.serve(batch=8, shuffle=True)
+        futures = [self.client.call_async({"a": a}) for a in range(8)]
+        self.assertEqual(
+            [f.result(2) for f in futures], [{"c": a * 2} for a in range(8)]
+        )
+        # One response topic, subscribed once
+        self.assertEqual(len(self.transport.subscriptions), 1)
+        self.assertEqual(len(self.client._pending_calls), 0)
+
+    def test_v5_correlation_data(self):
+        self.transport.v5 = True
+        self.serve(batch=4, shuffle=True)
+        futures = [self.client.call_async({"a": a}) for a in range(4)]
+        self.assertEqual(
+            [f.result(2) for f in futures], [{"c": a * 2} for a in range(4)]
+        )
+
+    def test_callback_on_executor(self):
+        self.serve()
+        responses = queue.Queue()
+
+        def on_response(resp):
+            nested = self.client.call({"a": 10}, timeout=2)
+            responses.put((resp, nested, threading.current_thread()))
+
+        self.client.call_async({"a": 1}, on_response=on_response)
+        resp, nested, thread = responses.get(timeout=2)
+        self.assertEqual((resp, nested), ({"c": 2}, {"c": 20}))
+        self.assertIsNot(thread, self.transport.loop_thread)
+
+    def test_expiry(self):
+        future = self.client.call_async({"a": 1}, timeout=0.05)
+        with self.assertRaises(RPCClientTimeoutError):
+            future.result(2)
+        with self.assertRaises(RPCClientTimeoutError):
+            self.client.call({"a": 2}, timeout=0.05)
+        self.assertEqual(len(self.client._pending_calls), 0)
+        # Deadlines of completed calls are dropped
+        self.serve()
+        for a in range(100):
+            self.client.call_async({"a": a}, timeout=30).result(2)
+        self.assertLess(len(self.client._pending_calls._deadlines), 20)
+
+    def test_stop(self):
+        future = self.client.call_async({"a": 1}, timeout=30)
+        timer = self.client._pending_calls._timer
+        self.assertTrue(timer.is_alive())
+        self.client.stop()
+        self.assertFalse(timer.is_alive())
+        with self.assertRaises(RPCClientError):
+            future.result(2)
+
+
+class TestConnection(unittest.TestCase):
+    """Tests for `commlib.transports.mqtt.Connection`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(mqtt.mqtt, "Client")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = mqtt.Connection(mqtt.ConnectionParameters())
+        self.client = self.conn.client
+        self.received = []
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def callback(self, name):
+        def _callback(client, userdata, msg):
+            self.received.append((name, msg.topic))
+
+        return _callback
+
+    def deliver(self, topic_filter, topic):
+        # The network loop calls the callback added for the matching filter
+        callbacks = dict(
+            c.args for c in self.client.message_callback_add.call_args_list
+        )
+        callbacks[topic_filter](self.client, None, SimpleNamespace(topic=topic))
+
+    def test_routing(self):
+        front, rear, other = (
+            self.callback("front"),
+            self.callback("rear"),
+            self.callback("other"),
+        )
+        self.conn.subscribe("sonar/front", front, 0)
+        self.conn.subscribe("sonar/+", rear, 0)
+        self.conn.subscribe("sonar/+", other, 0)
+        # One broker subscription per filter
+        self.assertEqual(self.client.subscribe.call_count, 2)
+        self.deliver("sonar/+", "sonar/rear")
+        self.deliver("sonar/front", "sonar/front")
+        self.assertEqual(
+            self.received,
+            [("rear", "sonar/rear"), ("other", "sonar/rear"), ("front", "sonar/front")],
+        )
+        # A higher QoS upgrades the subscription, and is restored on reconnect
+        self.conn.subscribe("sonar/+", self.callback("qos"), 1)
+        self.assertEqual(self.client.subscribe.call_count, 3)
+        self.client.subscribe.reset_mock()
+        self.conn._on_connect(self.client, None, {}, 0)
+        self.assertEqual(
+            [(c.args[0], c.kwargs["qos"]) for c in self.client.subscribe.mock_calls],
+            [("sonar/front", 0), ("sonar/+", 1)],
+        )
+
+    def test_unsubscribe(self):
+        rear, other = self.callback("rear"), self.callback("other")
+        self.conn.subscribe("sonar/+", rear, 0)
+        self.conn.subscribe("sonar/+", other, 0)
+        self.conn.unsubscribe("sonar/+", rear)
+        self.client.unsubscribe.assert_not_called()
+        self.deliver("sonar/+", "sonar/rear")
+        self.assertEqual(self.received, [("other", "sonar/rear")])
+        self.conn.unsubscribe("sonar/+", other)
+        self.client.message_callback_remove.assert_called_once_with("sonar/+")
+        self.client.unsubscribe.assert_called_once_with("sonar/+")
+
+    def test_start(self):
+        self.conn.start()
+        self.conn.start()
+        # One network loop for all endpoints
+        self.client.loop_start.assert_called_once()
+        self.conn.close()
+        self.client.disconnect.assert_called_once()
+        self.client.loop_stop.assert_called_once()
+
+
+class TestStopEvent(unittest.TestCase):
+    """Tests for stopping endpoints before run_forever() waits."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(mqtt, "MQTTTransport", FakeTransport)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def run_forever(self, endpoint):
+        thread = threading.Thread(target=endpoint.run_forever, daemon=True)
+        thread.start()
+        thread.join(2)
+        return thread.is_alive()
+
+    def test_rpc_service(self):
+        service = mqtt.RPCService(rpc_name="add", on_request=print)
+        service.stop()
+        self.assertFalse(self.run_forever(service))
+
+    def test_rpc_server(self):
+        server = mqtt.RPCServer(base_uri="math", svc_map={"add": (print, None)})
+        server.stop()
+        self.assertFalse(self.run_forever(server))
+
+
+class FakeClient:
+    """A paho client, connected to the peer end of a socket pair."""
+
+    def __init__(self):
+        self.sock = self.peer = None
+        self.reads = queue.Queue()
+        self.writes = queue.Queue()
+        self.reconnects = 0
+        self.misc = threading.Event()
+        self._want_write = False
+        self._connect()
+
+    def _connect(self):
+        self.close()
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+
+    def close(self):
+        for sock in (self.sock, self.peer):
+            if sock is not None:
+                sock.close()
+
+    def socket(self):
+        return self.sock
+
+    def want_write(self):
+        return self._want_write
+
+    def request_write(self):
+        # Called by paho when a packet is queued, from any thread
+        self._want_write = True
+        self.on_socket_register_write(self, None, self.sock)
+
+    def loop_read(self):
+        data = self.sock.recv(4096)
+        if data == b"":
+            # Connection lost
+            sock, self.sock = self.sock, None
+            self.on_socket_close(self, None, sock)
+            sock.close()
+            return
+        self.reads.put(data)
+
+    def loop_write(self):
+        self._want_write = False
+        self.writes.put(True)
+        self.on_socket_unregister_write(self, None, self.sock)
+
+    def loop_misc(self):
+        self.misc.set()
+
+    def reconnect(self):
+        self.reconnects += 1
+        self._connect()
+        self.on_socket_open(self, None, self.sock)
+
+
+def close_reactor(reactor):
+    reactor.stop()
+    # Reactors live as long as the process: their wakeup sockets are not
+    # closed on stop()
+    reactor._selector.close()
+    reactor._wakeup_r.close()
+    reactor._wakeup_w.close()
+
+
+class TestMQTTReactor(unittest.TestCase):
+    """Tests for `commlib.transports.mqtt.MQTTReactor`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.reactor = mqtt.MQTTReactor(misc_interval=0.05, reconnect_delay=0.05)
+        self.client = FakeClient()
+        self.reactor.add(self.client)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        close_reactor(self.reactor)
+        self.client.close()
+
+    def test_register(self):
+        self.assertEqual(self.reactor.clients, 1)
+        self.client.peer.send(b"\x30")
+        self.assertEqual(self.client.reads.get(timeout=2), b"\x30")
+        # Keepalive handling
+        self.assertTrue(self.client.misc.wait(2))
+
+    def test_wakeup(self):
+        reactor = mqtt.MQTTReactor(misc_interval=30)
+        client = FakeClient()
+        reactor.add(client)
+        self.addCleanup(client.close)
+        self.addCleanup(close_reactor, reactor)
+        time.sleep(0.05)
+        # Writes are picked up at once, not on the next keepalive round
+        client.request_write()
+        self.assertTrue(client.writes.get(timeout=1))
+        self.assertFalse(client.want_write())
+
+    def test_unregister(self):
+        self.client._want_write = True
+        self.reactor.remove(self.client)
+        # Pending packets are flushed first
+        self.assertTrue(self.client.writes.get(timeout=2))
+        time.sleep(0.05)
+        self.assertEqual(self.reactor.clients, 0)
+        self.client.peer.send(b"\x30")
+        time.sleep(0.1)
+        self.assertTrue(self.client.reads.empty())
+
+    def test_reconnect(self):
+        self.client.peer.close()
+        for _ in range(200):
+            if self.client.reconnects > 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.client.reconnects, 1)
+        # The new socket is served
+        self.client.peer.send(b"\x30")
+        self.assertEqual(self.client.reads.get(timeout=2), b"\x30")
+
+    def test_shutdown(self):
+        thread = self.reactor._thread
+        self.reactor.stop()
+        self.assertFalse(thread.is_alive())
+        self.client.peer.send(b"\x30")
+        time.sleep(0.1)
+        self.assertTrue(self.client.reads.empty())
+
+    def test_get_reactor(self):
+        with mock.patch.object(mqtt, "_reactor", None):
+            reactor = mqtt.get_reactor()
+            self.assertIs(mqtt.get_reactor(), reactor)
+        close_reactor(reactor)
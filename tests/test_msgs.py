@@ -2,11 +2,21 @@
 
 """Tests for `commlib` package."""
 
+import json
+import threading
 import time
 import unittest
 from typing import Optional
 
-from commlib.msg import Message, MessageHeader, PubSubMessage, RPCMessage
+from commlib.endpoints import BaseEndpoint
+from commlib.msg import (
+    LazyMessage,
+    Message,
+    MessageHeader,
+    PubSubMessage,
+    RPCMessage,
+    construct_message,
+)
 from commlib.timer import Timer
 
 
@@ -85,3 +95,73 @@ class TestMessages(unittest.TestCase):
 
         resp = TestRPCMessage.Response(**resp_d)
         assert resp == TestRPCMessage.Response(c=3, d=4)
+
+    def test_lazy_message(self):
+        class TestObject(Message):
+            c: Optional[int] = 1
+
+        class TestPubSubMessage(PubSubMessage):
+            a: int
+            b: TestObject = TestObject()
+            e: int = 5
+
+        _msg = LazyMessage(TestPubSubMessage, {'a': '3', 'b': {'c': 2}, 'e': 'x'})
+        # Invalid fields are only validated on access
+        self.assertEqual(_msg.a, 3)
+        self.assertEqual(_msg.b, TestObject(c=2))
+        with self.assertRaises(Exception):
+            _msg.e
+
+        _msg = LazyMessage(TestPubSubMessage, {'a': 1, 'e': 'x'}, projection=['a'])
+        self.assertEqual(_msg.a, 1)
+        with self.assertRaises(AttributeError):
+            _msg.e
+        self.assertEqual(_msg.to_message(), TestPubSubMessage(a=1))
+
+    def test_lazy_message_methods(self):
+        class TestPubSubMessage(PubSubMessage):
+            a: int
+            e: int = 5
+
+        _msg = LazyMessage(TestPubSubMessage, {'a': '3'})
+        # Methods of the message type are forwarded to the message
+        self.assertEqual(_msg.model_dump(), {'a': 3, 'e': 5})
+        self.assertEqual(_msg.dict(), {'a': 3, 'e': 5})
+        self.assertEqual(json.loads(_msg.json()), {'a': 3, 'e': 5})
+        with self.assertRaises(AttributeError):
+            _msg.missing
+        # Fields left out of a projection get their defaults
+        _msg = LazyMessage(TestPubSubMessage, {'a': 1, 'e': 2}, projection=['a'])
+        self.assertEqual(_msg.model_dump(), {'a': 1, 'e': 5})
+
+    def test_construct_message(self):
+        class TestObject(Message):
+            c: Optional[int] = 1
+            d: Optional[int] = 2
+
+        class TestPubSubMessage(PubSubMessage):
+            a: Optional[int] = 1
+            b: Optional[TestObject] = TestObject()
+
+        _msg = construct_message(TestPubSubMessage, {'b': {'c': 2, 'd': 3}})
+        assert _msg == TestPubSubMessage(a=1, b=TestObject(c=2, d=3))
+
+    def test_schema_drift(self):
+        class TestPubSubMessage(PubSubMessage):
+            a: int = 1
+
+        endpoint = BaseEndpoint(trusted=True, validate_rate=1.0)
+
+        def receive():
+            for _ in range(200):
+                with self.assertRaises(Exception):
+                    endpoint._build_msg(TestPubSubMessage, {'a': 'x'})
+
+        with self.assertLogs('commlib.endpoints', level='WARNING'):
+            receivers = [threading.Thread(target=receive) for _ in range(4)]
+            for receiver in receivers:
+                receiver.start()
+            for receiver in receivers:
+                receiver.join()
+        # No increments are lost across threads
+        self.assertEqual(endpoint.schema_drift, 800)
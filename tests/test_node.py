@@ -2,12 +2,13 @@
 
 """Tests for `commlib` package."""
 
+import threading
 import time
 import unittest
 from typing import Optional
 
 from commlib.msg import MessageHeader, PubSubMessage, RPCMessage
-from commlib.node import Node, TransportType
+from commlib.node import Node, NodeState, TransportType
 from commlib.transports.mock import ConnectionParameters
 
 
@@ -55,3 +56,66 @@ class TestNode(unittest.TestCase):
         node.create_publisher(msg_type=SonarMessage,
                               topic='sensors.sonar.front')
         self.assertTrue(len(node._publishers), 1)
+
+    def test_node_shared_executor(self):
+        node = Node(node_name='sensors.sonar.front',
+                    connection_params=self.connparams,
+                    executor_workers=4)
+        sub = node.create_subscriber(topic='sensors.sonar.front')
+        isolated = node.create_subscriber(topic='sensors.sonar.rear',
+                                          isolated=True)
+        self.assertIs(sub.executor, node.executor)
+        self.assertIsNot(isolated.executor, node.executor)
+
+    def test_node_isolated_rpc(self):
+        from commlib.transports import redis
+
+        node = Node(node_name='math',
+                    connection_params=redis.ConnectionParameters(),
+                    heartbeats=False, workers_rpc=2)
+        isolated = node.create_rpc(rpc_name='add', on_request=print,
+                                   isolated=True)
+        sized = node.create_rpc(rpc_name='sub', on_request=print,
+                                workers=3, isolated=True)
+        with self.assertLogs('commlib.node', level='WARNING'):
+            shared = node.create_rpc(rpc_name='mul', on_request=print,
+                                     workers=3)
+        self.assertEqual(isolated._executor._max_workers, 2)
+        self.assertEqual(sized._executor._max_workers, 3)
+        self.assertIs(shared._executor, node.executor)
+        node.stop()
+        # The shared executor is shut down with the Node
+        with self.assertRaises(RuntimeError):
+            node.executor.submit(print)
+
+    def test_node_shared_connection(self):
+        from commlib.transports import redis
+
+        node = Node(node_name='sensors.sonar.front',
+                    connection_params=redis.ConnectionParameters(),
+                    heartbeats=False)
+        pub = node.create_publisher(topic='sensors.sonar.front')
+        sub = node.create_subscriber(topic='sensors.sonar.front')
+        isolated = node.create_publisher(topic='sensors.sonar.rear',
+                                         isolated=True)
+        self.assertIsInstance(node.connection, redis.Connection)
+        self.assertIs(pub._transport._redis, node.connection)
+        self.assertIs(sub._transport._redis, node.connection)
+        self.assertIsNot(isolated._transport._redis, node.connection)
+        # The mock transport has no connection to share
+        node = Node(node_name='sensors.sonar.front',
+                    connection_params=self.connparams)
+        node.create_publisher(topic='sensors.sonar.front')
+        self.assertIsNone(node.connection)
+
+    def test_node_run_forever(self):
+        node = Node(node_name='sensors.sonar.front',
+                    connection_params=self.connparams,
+                    heartbeats=False)
+        node.state = NodeState.RUNNING
+        exit_t = threading.Timer(
+            0.05, lambda: setattr(node, 'state', NodeState.EXITED))
+        exit_t.start()
+        # Woken up by the state change
+        node.run_forever()
+        self.assertEqual(node.state, NodeState.EXITED)
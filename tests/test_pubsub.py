@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.pubsub` module."""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from commlib.framing import FrameCodec
+from commlib.msg import PubSubMessage
+from commlib.pubsub import (
+    BaseSubscriber,
+    ConflatingInbox,
+    Dispatcher,
+    DispatchPolicy,
+    Inbox,
+    InboxPolicy,
+    MicroBatcher,
+)
+from commlib.transports import redis
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Tests for `commlib.pubsub.MicroBatcher`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.batches = []
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def flush(self, batch):
+        self.batches.append(list(batch))
+
+    def test_batch_size(self):
+        batcher = MicroBatcher(self.flush, max_batch=10, max_delay_ms=1000)
+        producers = [
+            threading.Thread(target=lambda: [batcher.add(i) for i in range(50)])
+            for _ in range(4)
+        ]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        batcher.stop()
+        self.assertEqual(sum(len(batch) for batch in self.batches), 200)
+        self.assertTrue(all(len(batch) <= 10 for batch in self.batches))
+        stats = batcher.stats
+        self.assertEqual(stats.messages, 200)
+        self.assertEqual(sum(stats.batch_sizes.values()), stats.batches)
+        with self.assertRaises(RuntimeError):
+            batcher.add(0)
+
+    def test_max_delay(self):
+        batcher = MicroBatcher(self.flush, max_batch=100, max_delay_ms=20)
+        batcher.add(1)
+        batcher.add(2)
+        time.sleep(0.5)
+        self.assertEqual(self.batches, [[1, 2]])
+        self.assertEqual(batcher.stats.flushed_delay, 1)
+        batcher.stop()
+
+    def test_leftover_deadline(self):
+        flushed = {}
+
+        def flush(batch):
+            if batch == [0, 1]:
+                time.sleep(0.15)
+            flushed.update((i, time.monotonic()) for i in batch)
+
+        batcher = MicroBatcher(flush, max_batch=2, max_delay_ms=200)
+        start = time.monotonic()
+        # 2, 3 and 4 wait while the first batch is flushed
+        for i in range(5):
+            batcher.add(i)
+        time.sleep(0.5)
+        # The leftover message is flushed max_delay_ms after it was added,
+        # not max_delay_ms after the batch before it
+        self.assertLess(flushed[4] - start, 0.28)
+        batcher.stop()
+
+
+class TestBatchSubscriber(unittest.TestCase):
+    """Tests for `commlib.pubsub.BaseSubscriber` batch delivery."""
+
+    def test_on_messages(self):
+        batches = []
+        sub = BaseSubscriber(
+            topic="sensors", on_messages=batches.append, max_batch=5, max_wait=0.02
+        )
+        for i in range(12):
+            sub._batcher.add(sub._make_msg({"i": i}))
+        time.sleep(0.5)
+        self.assertEqual([len(batch) for batch in batches], [5, 5, 2])
+        self.assertEqual(batches[0][0], {"i": 0})
+        sub._batcher.stop()
+
+    def test_keyword_only(self):
+        # Extra positional arguments still go to BaseEndpoint
+        sub = BaseSubscriber("sensors", None, None, True)
+        self.assertTrue(sub.debug)
+        self.assertFalse(sub._lazy)
+
+
+class TestInbox(unittest.TestCase):
+    """Tests for `commlib.pubsub.Inbox`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.handled = []
+        self.gate = threading.Event()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def handler(self, i):
+        self.gate.wait()
+        self.handled.append(i)
+
+    def fill(self, policy):
+        inbox = Inbox(3, policy)
+        # The first message is taken by the worker, which waits on the gate
+        inbox.put(self.handler, 0)
+        while inbox.stats.depth > 0:
+            time.sleep(0.001)
+        for i in range(1, 7):
+            inbox.put(self.handler, i)
+        self.gate.set()
+        while inbox.stats.depth > 0:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        inbox.stop()
+        return inbox.stats
+
+    def test_drop_oldest(self):
+        stats = self.fill(InboxPolicy.DROP_OLDEST)
+        self.assertEqual(self.handled, [0, 4, 5, 6])
+        self.assertEqual(stats.dropped, 3)
+        self.assertEqual(stats.max_depth, 3)
+
+    def test_drop_newest(self):
+        stats = self.fill(InboxPolicy.DROP_NEWEST)
+        self.assertEqual(self.handled, [0, 1, 2, 3])
+        self.assertEqual(stats.dropped, 3)
+
+    def test_keep_latest(self):
+        stats = self.fill("keep_latest")
+        self.assertEqual(self.handled, [0, 4, 5, 6])
+        self.assertEqual(stats.received, 7)
+
+    def test_block(self):
+        inbox = Inbox(2, InboxPolicy.BLOCK)
+        producer = threading.Thread(
+            target=lambda: [inbox.put(self.handler, i) for i in range(10)]
+        )
+        producer.start()
+        time.sleep(0.1)
+        # The producer waits for room
+        self.assertTrue(producer.is_alive())
+        self.assertLessEqual(inbox.stats.depth, 2)
+        self.gate.set()
+        producer.join()
+        while len(self.handled) < 10:
+            time.sleep(0.001)
+        self.assertEqual(self.handled, list(range(10)))
+        self.assertEqual(inbox.stats.dropped, 0)
+        inbox.stop()
+
+    def test_conflation(self):
+        decoded = []
+
+        def handler(topic, i):
+            self.gate.wait()
+            decoded.append((topic, i))
+
+        inbox = ConflatingInbox(lambda topic, i: topic)
+        inbox.put(handler, "a", 0)
+        while inbox.stats.depth > 0:
+            time.sleep(0.001)
+        for i in range(1, 11):
+            inbox.put(handler, "a" if i % 2 else "b", i)
+        self.assertEqual(inbox.stats.depth, 2)
+        self.gate.set()
+        while len(decoded) < 3:
+            time.sleep(0.001)
+        # Only the latest message of each topic is handled, in order of
+        # their first arrival
+        self.assertEqual(decoded, [("a", 0), ("a", 9), ("b", 10)])
+        self.assertEqual(inbox.stats.dropped, 8)
+        inbox.stop()
+
+
+class TestDispatcher(unittest.TestCase):
+    """Tests for `commlib.pubsub.Dispatcher`."""
+
+    def test_ordered_by_key(self):
+        received = {}
+        threads = set()
+        done = threading.Semaphore(0)
+
+        def on_message(msg, topic):
+            time.sleep(0.001)
+            received.setdefault(topic, []).append(msg["seq"])
+            threads.add(threading.current_thread().name)
+            done.release()
+
+        dispatcher = Dispatcher(DispatchPolicy.ORDERED, workers=4)
+        callback = dispatcher.wrap(on_message)
+        for seq in range(50):
+            for device in range(8):
+                callback({"seq": seq}, f"devices.{device}")
+        for _ in range(400):
+            done.acquire()
+        # Order is kept per key, and keys are spread across workers
+        for device in range(8):
+            self.assertEqual(received[f"devices.{device}"], list(range(50)))
+        self.assertGreater(len(threads), 1)
+        dispatcher.shutdown()
+
+    def test_field_key(self):
+        dispatcher = Dispatcher("pooled-ordered-by-key", workers=2, key="device")
+        self.assertEqual(dispatcher._get_key(({"device": "d1"},)), "d1")
+        self.assertIs(Dispatcher().wrap(print), print)
+        dispatcher.shutdown()
+
+    def test_shutdown_discards_pending(self):
+        started = threading.Event()
+        gate = threading.Event()
+        received = []
+
+        def on_message(msg):
+            started.set()
+            gate.wait()
+            received.append(msg)
+
+        # A shared executor is not shut down with the dispatcher
+        executor = ThreadPoolExecutor(max_workers=1)
+        dispatcher = Dispatcher(DispatchPolicy.POOLED, executor=executor)
+        callback = dispatcher.wrap(on_message)
+        for i in range(3):
+            callback(i)
+        started.wait(2)
+        dispatcher.shutdown()
+        gate.set()
+        executor.shutdown(wait=True)
+        # Only the callback already running completes
+        self.assertEqual(received, [0])
+        self.assertEqual(dispatcher._slots._value, 4)
+
+
+class SonarMessage(PubSubMessage):
+    range: float = -1
+
+
+class TestPublisher(unittest.TestCase):
+    """Tests for batched and multi-topic publishing."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(redis, "RedisConnection")
+        self.conn = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.pipe = self.conn.pipeline.return_value
+        self.conn_params = redis.ConnectionParameters()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def published(self):
+        return [
+            (c.args[0], FrameCodec().decode(c.args[1]))
+            for c in self.pipe.publish.call_args_list
+        ]
+
+    def test_publish_batch(self):
+        pub = redis.Publisher(
+            topic="sonar", msg_type=SonarMessage, conn_params=self.conn_params
+        )
+        pub.publish_batch([SonarMessage(range=r) for r in range(3)])
+        # One round trip, in order
+        self.pipe.execute.assert_called_once()
+        self.conn.publish.assert_not_called()
+        self.assertEqual(self.published(), [("sonar", {"range": r}) for r in range(3)])
+        with self.assertRaises(ValueError):
+            pub.publish_batch([{"range": 1}])
+
+    def test_publish_to_many(self):
+        pub = redis.MPublisher(conn_params=self.conn_params)
+        with mock.patch.object(pub._codec, "encode", wraps=pub._codec.encode) as encode:
+            pub.publish_to_many({"range": 1}, ["sonar.front", "sonar.rear"])
+        # Encoded once, sent to every topic in one round trip
+        encode.assert_called_once()
+        self.pipe.execute.assert_called_once()
+        self.assertEqual(
+            self.published(),
+            [("sonar.front", {"range": 1}), ("sonar.rear", {"range": 1})],
+        )
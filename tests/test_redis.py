@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.transports.redis` module."""
+
+import collections
+import queue
+import threading
+import time
+import unittest
+from unittest import mock
+
+from commlib.exceptions import RPCClientTimeoutError
+from commlib.framing import FrameCodec
+from commlib.transports import redis
+
+
+class FakeServer:
+    """In-memory lists, with blocking pops."""
+
+    def __init__(self):
+        self.lists = collections.defaultdict(collections.deque)
+        self.ttls = {}
+        # Threads blocked in BLPOP
+        self.poppers = set()
+        self.cond = threading.Condition()
+
+
+class FakeRedis:
+    """A client of the current FakeServer. Clients of earlier tests keep
+    their own server."""
+
+    server = FakeServer()
+
+    def __init__(self, *args, **kwargs):
+        self.connection_pool = mock.Mock()
+        self.lists = self.server.lists
+        self.ttls = self.server.ttls
+        self.poppers = self.server.poppers
+        self.cond = self.server.cond
+
+    def pubsub(self):
+        return mock.Mock()
+
+    def rpush(self, key, value):
+        with self.cond:
+            self.lists[key].append(value)
+            self.cond.notify_all()
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def blpop(self, key, timeout=0):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            self.poppers.add(threading.current_thread())
+            self.cond.notify_all()
+            try:
+                while len(self.lists[key]) == 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self.cond.wait(remaining)
+                return key, self.lists[key].popleft()
+            finally:
+                self.poppers.discard(threading.current_thread())
+
+    def delete(self, key):
+        with self.cond:
+            return 1 if self.lists.pop(key, None) else 0
+
+    def exists(self, key):
+        return 1 if self.lists.get(key) else 0
+
+    def pipeline(self, transaction=False):
+        pipe = mock.Mock()
+        pipe.rpush.side_effect = self.rpush
+        pipe.expire.side_effect = self.expire
+        return pipe
+
+
+class TestRPCClient(unittest.TestCase):
+    """Tests for `commlib.transports.redis.RPCClient`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(redis, "RedisConnection", FakeRedis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        FakeRedis.server = self.server = FakeServer()
+        self.conn_params = redis.ConnectionParameters()
+        self.service = redis.RPCService(
+            rpc_name="add",
+            conn_params=self.conn_params,
+            on_request=self.on_request,
+            workers=8,
+        )
+        self.service.run()
+        # The service drops the requests queued before it starts
+        with self.server.cond:
+            self.server.cond.wait_for(
+                lambda: self.service._main_thread in self.server.poppers, 2
+            )
+        self.client = redis.RPCClient(
+            rpc_name="add", conn_params=self.conn_params, persistent_reply=True
+        )
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.client.stop()
+        self.service.stop()
+
+    def on_request(self, msg):
+        # Later requests complete first
+        time.sleep(0.02 * (3 - msg["a"] % 4))
+        return {"c": msg["a"] * 2}
+
+    def test_positional_rpc_name(self):
+        client = redis.RPCClient("add", conn_params=self.conn_params)
+        self.assertEqual(client._rpc_name, "add")
+        self.assertFalse(client._persistent_reply)
+        self.assertEqual(client.call({"a": 1}, timeout=2), {"c": 2})
+
+    def test_correlation(self):
+        futures = [self.client.call_async({"a": a}, timeout=2) for a in range(8)]
+        results = {}
+
+        def call(a):
+            results[a] = self.client.call({"a": a}, timeout=2)
+
+        callers = [threading.Thread(target=call, args=(a,)) for a in range(4)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        self.assertEqual(
+            [f.result(2) for f in futures], [{"c": a * 2} for a in range(8)]
+        )
+        self.assertEqual(results, {a: {"c": a * 2} for a in range(4)})
+        # All responses went through one reply queue, with a TTL
+        self.assertEqual(
+            self.server.ttls, {self.client._reply_to: redis.RPCService.REPLY_TTL}
+        )
+
+    def test_callback_on_executor(self):
+        responses = queue.Queue()
+
+        def on_response(resp):
+            nested = self.client.call({"a": 10}, timeout=2)
+            responses.put((resp, nested, threading.current_thread()))
+
+        self.client.call_async({"a": 1}, on_response=on_response)
+        resp, nested, thread = responses.get(timeout=2)
+        self.assertEqual((resp, nested), ({"c": 2}, {"c": 20}))
+        self.assertIsNot(thread, self.client._receiver)
+
+    def test_expiry(self):
+        client = redis.RPCClient(
+            rpc_name="missing", conn_params=self.conn_params, persistent_reply=True
+        )
+        start = time.monotonic()
+        future = client.call_async({"a": 1}, timeout=0.05)
+        with self.assertRaises(RPCClientTimeoutError):
+            future.result(2)
+        # Not bound to the BLPOP timeout of the receiver
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertIsNone(client.call({"a": 1}, timeout=0.05))
+        self.assertEqual(len(client._pending_calls), 0)
+        client.stop()
+
+
+class TestConnection(unittest.TestCase):
+    """Tests for `commlib.transports.redis.Connection`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(redis.Connection, "pubsub")
+        self.pubsub = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.conn = redis.Connection(redis.ConnectionParameters())
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def deliver(self, pattern, topic, data):
+        # The subscriptions thread calls the handler of the matching pattern
+        handlers = {}
+        for c in self.pubsub.psubscribe.call_args_list:
+            handlers.update(c.kwargs)
+        payload = FrameCodec().encode(data)
+        handlers[pattern]({"channel": topic, "data": payload})
+
+    def test_shared_pubsub(self):
+        received = []
+        front = redis.Subscriber(
+            topic="sonar.front",
+            connection=self.conn,
+            on_message=lambda msg: received.append(("front", msg)),
+        )
+        both = redis.PSubscriber(
+            topic="sonar.*",
+            connection=self.conn,
+            on_message=lambda msg, topic: received.append(("both", topic)),
+        )
+        other = redis.PSubscriber(
+            topic="sonar.*",
+            connection=self.conn,
+            on_message=lambda msg, topic: received.append(("other", topic)),
+        )
+        for sub in (front, both, other):
+            sub.run()
+        # One pubsub connection and thread, one subscription per pattern
+        self.assertEqual(self.pubsub.psubscribe.call_count, 2)
+        self.pubsub.run_in_thread.assert_called_once()
+        self.deliver("sonar.front", "sonar.front", {"range": 1})
+        self.deliver("sonar.*", "sonar.rear", {"range": 2})
+        self.assertEqual(
+            received,
+            [
+                ("front", {"range": 1}),
+                ("both", "sonar.rear"),
+                ("other", "sonar.rear"),
+            ],
+        )
+        both.stop()
+        self.pubsub.punsubscribe.assert_not_called()
+        other.stop()
+        self.pubsub.punsubscribe.assert_called_once_with("sonar.*")
+        self.conn.close()
+        self.pubsub.run_in_thread.return_value.stop.assert_called_once()
+
+
+class TestStopEvent(unittest.TestCase):
+    """Tests for stopping endpoints before run_forever() waits."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        patcher = mock.patch.object(redis, "RedisConnection", FakeRedis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def run_forever(self, endpoint):
+        thread = threading.Thread(target=endpoint.run_forever, daemon=True)
+        thread.start()
+        thread.join(2)
+        return thread.is_alive()
+
+    def test_subscriber(self):
+        sub = redis.Subscriber(
+            topic="sonar.front",
+            conn_params=redis.ConnectionParameters(),
+            on_message=print,
+        )
+        sub.stop()
+        self.assertFalse(self.run_forever(sub))
+
+    def test_rpc_service(self):
+        service = redis.RPCService(
+            rpc_name="add",
+            conn_params=redis.ConnectionParameters(),
+            on_request=print,
+        )
+        service.stop()
+        self.assertFalse(self.run_forever(service))
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+"""Tests for `commlib.serializer` module."""
+
+import json
+import threading
+import time
+import unittest
+from decimal import Decimal
+from typing import Any, List, Optional
+from unittest import mock
+
+from pydantic import BaseModel
+
+from commlib import serializer
+from commlib.exceptions import SerializationError
+from commlib.framing import FrameCodec
+from commlib.msg import NDArray
+from commlib.serializer import (
+    JSONSerializer,
+    MsgPackSerializer,
+    SerializationTypes,
+    Serializer,
+    _mp_pack,
+    _mp_unpack,
+    compile_encoder,
+    get_serializer,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class TestSerializer(unittest.TestCase):
+    """Tests for `commlib.serializer` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.data = {
+            "a": 1,
+            "b": -3,
+            "c": 2.5,
+            "d": "text",
+            "e": [1, 2, {"f": None}],
+            "g": True,
+            "h": {"i": 70000, "j": -70000, "k": 2**40},
+        }
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_json_roundtrip(self):
+        payload = JSONSerializer.serialize(dict(self.data, b=3))
+        self.assertEqual(JSONSerializer.deserialize(payload), dict(self.data, b=3))
+
+    def test_msgpack_roundtrip(self):
+        payload = MsgPackSerializer.serialize(dict(self.data, b=3))
+        self.assertIsInstance(payload, bytes)
+        self.assertEqual(MsgPackSerializer.deserialize(payload), dict(self.data, b=3))
+
+    def test_pure_python_msgpack(self):
+        data = dict(self.data, raw=b"\x00\x01", long="x" * 300)
+        buf = bytearray()
+        _mp_pack(data, buf)
+        self.assertEqual(_mp_unpack(bytes(buf))[0], data)
+        self.assertEqual(_mp_unpack(memoryview(buf))[0], data)
+
+    def test_get_serializer(self):
+        self.assertIs(get_serializer("msgpack"), MsgPackSerializer)
+        self.assertIs(get_serializer(SerializationTypes.JSON), JSONSerializer)
+        self.assertIs(get_serializer(JSONSerializer), JSONSerializer)
+        with self.assertRaises(SerializationError):
+            get_serializer("yaml")
+
+    def test_legacy_serializer(self):
+        class LegacySerializer(Serializer):
+            CONTENT_TYPE = "application/json"
+            CONTENT_ENCODING = "utf8"
+
+            @staticmethod
+            def serialize(data):
+                return json.dumps(data)
+
+            @staticmethod
+            def deserialize(data):
+                return json.loads(data)
+
+        # Serializers that only implement serialize() and deserialize()
+        codec = FrameCodec(serializer=LegacySerializer)
+        payload = codec.encode({"a": 1, "b": [1.5, "x"]})
+        self.assertEqual(payload, b'{"a": 1, "b": [1.5, "x"]}')
+        self.assertEqual(codec.decode(memoryview(payload)), {"a": 1, "b": [1.5, "x"]})
+
+    def test_compiled_encoder(self):
+        class Point(BaseModel):
+            x: float = 0.0
+            y: float = 0.0
+
+        class Pose(BaseModel):
+            seq: int = 0
+            frame: Optional[str] = None
+            position: Point = Point()
+            path: List[Point] = []
+            extra: Any = None
+
+        msg = Pose(
+            seq=-3, position=Point(x=1.5), path=[Point(y=2)], extra=Decimal("2.5")
+        )
+        encoder = compile_encoder(Pose)
+        self.assertIs(compile_encoder(Pose), encoder)
+        self.assertEqual(
+            encoder(msg.model_dump()),
+            {
+                "seq": -3,
+                "frame": None,
+                "position": {"x": 1.5, "y": 0.0},
+                "path": [{"x": 0.0, "y": 2.0}],
+                "extra": 2.5,
+            },
+        )
+        self.assertEqual(
+            JSONSerializer.deserialize(JSONSerializer.serialize(msg)),
+            encoder(msg.model_dump()),
+        )
+
+    def test_concurrent_compile(self):
+        class Point(BaseModel):
+            x: Decimal = Decimal(0)
+
+        class Path(BaseModel):
+            start: Point = Point()
+            points: List[Point] = []
+            parent: Optional["Path"] = None
+
+        model_type_of = serializer.model_type_of
+
+        def slow_model_type_of(annotation):
+            time.sleep(0.01)
+            return model_type_of(annotation)
+
+        plans = []
+
+        def compile_plan():
+            plans.append(list(serializer._compile_plan(Path)))
+
+        with mock.patch.object(serializer, "model_type_of", slow_model_type_of):
+            threads = [threading.Thread(target=compile_plan) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # Threads never see a plan that is being compiled
+        for plan in plans:
+            self.assertEqual(
+                [name for name, _, _ in plan], ["start", "points", "parent"]
+            )
+        plan = serializer._compile_plan(Path)
+        self.assertIs(plan[2][2], plan)
+        self.assertEqual(len(serializer._building), 0)
+
+    def test_bytes_roundtrip(self):
+        for serializer in (JSONSerializer, MsgPackSerializer):
+            payload = serializer.serialize_bytes(dict(self.data, b=3))
+            self.assertIsInstance(payload, bytes)
+            self.assertEqual(
+                serializer.deserialize_bytes(memoryview(payload)),
+                dict(self.data, b=3),
+            )
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_ndarray_out_of_band(self):
+        class Frame(BaseModel):
+            image: NDArray
+            layers: List[NDArray] = []
+            name: str = ""
+
+        image = np.arange(24, dtype=np.float32).reshape(2, 3, 4)
+        msg = Frame(image=image, layers=[image[:, 0], np.zeros(0)], name="f0")
+        for serializer in (JSONSerializer, MsgPackSerializer):
+            payload = serializer.serialize_bytes(msg)
+            frame = Frame(**serializer.deserialize_bytes(payload))
+            self.assertTrue(np.array_equal(frame.image, image))
+            self.assertEqual(frame.image.dtype, image.dtype)
+            # Rebuilt on top of the payload, without copying
+            self.assertFalse(frame.image.flags.owndata)
+            self.assertTrue(np.array_equal(frame.layers[0], image[:, 0]))
+            self.assertEqual(frame.layers[1].shape, (0,))
+            self.assertEqual(frame.name, "f0")
+            with self.assertRaises(SerializationError):
+                serializer.deserialize_bytes(payload[:-16])
+        # Text serialization falls back to nested lists
+        self.assertEqual(
+            JSONSerializer.deserialize(JSONSerializer.serialize(msg))["image"],
+            image.tolist(),
+        )